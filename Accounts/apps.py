@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class AccountsConfig(AppConfig):
     name = 'Accounts'
+
+    def ready(self):
+        # Registers the user-cache invalidation signals
+        from . import authentication  # noqa: F401
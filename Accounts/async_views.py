@@ -0,0 +1,150 @@
+# Accounts/async_views.py
+"""
+ASGI (async) versions of the logins that mostly wait on Google/Firebase.
+
+Same request/response contract (JSON or form bodies) as ``GoogleAuthView``
+and ``FirebasePhoneAuthView``; routed instead of them when
+``settings.ASYNC_OUTBOUND_VIEWS`` is on and the app runs under an ASGI
+server (see deploy/). The network wait happens on the event loop, so one
+worker can hold many logins in flight.
+"""
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views import View
+from firebase_admin import auth as firebase_auth
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.tokens import RefreshToken
+
+import outbound
+from .google import GOOGLE_ERRORS, InvalidGoogleToken, agoogle_identity
+from .serializers import user_payload
+from .throttling import IPThrottle, check_throttles
+
+User = get_user_model()
+
+BLOCKED = {"error": "Your account has been blocked by the administrator."}
+
+
+def respond(data, status=200):
+    # DRF's encoder, so Decimals etc. render exactly like the sync views
+    return JsonResponse(data, status=status, encoder=JSONEncoder)
+
+
+async def throttled(request, scope, throttle_classes):
+    """Same limits as the DRF views; returns a 429 response or None."""
+    wait = await sync_to_async(check_throttles)(request, scope, throttle_classes)
+    if wait is None:
+        return None
+    response = respond({"detail": "Request was throttled."}, status=429)
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+def read_data(request):
+    """The POSTed fields, from a JSON or form body (DRF's default parsers accept both)."""
+    if request.content_type in ("application/x-www-form-urlencoded", "multipart/form-data"):
+        return request.POST
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+@sync_to_async
+def login_payload(user, request):
+    # Outstanding-token insert + user serializer: short DB work, done in the
+    # sync thread so the ORM stays in one connection.
+    refresh = RefreshToken.for_user(user)
+    return {
+        "access": str(refresh.access_token),
+        "refresh": str(refresh),
+        "user": user_payload(user, request),
+    }
+
+
+# ==========================================
+# 1. Google Login (Async)
+# ==========================================
+class AsyncGoogleAuthView(View):
+    throttle_classes = [IPThrottle]
+
+    async def post(self, request):
+        if rejected := await throttled(request, 'google', self.throttle_classes):
+            return rejected
+
+        data = read_data(request)
+        token = data.get("token") or data.get("access_token") or data.get("credential")
+
+        if not token:
+            return respond({"error": "Token missing"}, status=400)
+
+        try:
+            user_data_google = await agoogle_identity(token)
+        except InvalidGoogleToken as e:
+            return respond({"error": "Failed to validate token with Google", "details": str(e)}, status=400)
+        except (*GOOGLE_ERRORS, outbound.OutboundError):
+            return respond({"error": "Google sign-in is temporarily unavailable"}, status=503)
+
+        email = user_data_google.get("email")
+        if not email:
+            return respond({"error": "Google account has no email"}, status=400)
+
+        user, created = await User.objects.aget_or_create(
+            email=email,
+            defaults={
+                "first_name": user_data_google.get("given_name", ""),
+                "last_name": user_data_google.get("family_name", ""),
+                "is_active": True
+            }
+        )
+
+        if user.is_blocked or not user.is_active:
+            return respond(BLOCKED, status=403)
+
+        return respond(await login_payload(user, request))
+
+
+# ==========================================
+# 2. Firebase Phone Login (Async)
+# ==========================================
+class AsyncFirebasePhoneAuthView(View):
+    throttle_classes = [IPThrottle]
+
+    async def post(self, request):
+        if rejected := await throttled(request, 'firebase', self.throttle_classes):
+            return rejected
+
+        id_token = read_data(request).get('id_token')
+        if not id_token:
+            return respond({'error': 'No token provided'}, status=400)
+
+        try:
+            # firebase_admin is sync-only; verify in a worker thread
+            decoded_token = await sync_to_async(firebase_auth.verify_id_token, thread_sensitive=False)(id_token)
+            phone_number = decoded_token.get('phone_number')
+
+            if not phone_number:
+                return respond({'error': 'Invalid Token: No phone number found'}, status=400)
+
+            user, created = await User.objects.aget_or_create(
+                phone_number=phone_number,
+                defaults={
+                    'email': f"{phone_number.strip('+')}@mobile.login",
+                    'first_name': 'Mobile',
+                    'last_name': 'User',
+                    'is_active': True
+                }
+            )
+
+            if user.is_blocked or not user.is_active:
+                return respond(BLOCKED, status=403)
+
+            return respond(await login_payload(user, request))
+
+        except Exception as e:
+            return respond({'error': str(e)}, status=400)
@@ -0,0 +1,149 @@
+# Accounts/authentication.py
+"""
+JWT authentication with an in-process user cache.
+
+simplejwt's ``JWTAuthentication`` loads the user row on every request. Here
+the row is kept in a small per-process TTL/LRU cache instead, so a cache
+hit costs no query at all. Saving or deleting a user drops it from this
+process's cache at once; other processes poll the ``updated_at`` of the
+users they hold every ``AUTH_USER_CACHE_POLL_SECONDS`` (one query for the
+whole cache) and drop the ones that changed or no longer exist, so a
+role change reaches every process within that interval. Blocks also move
+the revocation watermark (Accounts/revocation.py), which makes every
+process poll as soon as it next reads it: a blocked user is refused
+everywhere within ``TOKEN_REVOCATION_WATERMARK_SECONDS``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .revocation import revocation_watermark
+
+
+class UserCache:
+    """Thread-safe LRU of user field values with a per-entry expiry."""
+
+    def __init__(self, max_size, ttl, poll_seconds):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.poll_seconds = poll_seconds
+        self._entries = OrderedDict()  # user_id -> (expires, updated_at, field values)
+        self._next_poll = time.monotonic() + poll_seconds
+        self._watermark = None
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires, _, values = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return values
+
+    def put(self, user_id, updated_at, values):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, updated_at, values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def poll(self, load_updated_at, watermark=None):
+        """
+        Drop entries whose row changed or went away.
+
+        ``load_updated_at(ids)`` returns ``{id: updated_at}`` for the rows
+        that still exist. Runs at most once per ``poll_seconds``, or at once
+        when ``watermark`` differs from the last poll's; requests that
+        arrive while another thread polls don't wait for it.
+        """
+        due = time.monotonic() >= self._next_poll or watermark != self._watermark
+        if not due or not self._poll_lock.acquire(blocking=False):
+            return
+        try:
+            with self._lock:
+                seen = {user_id: entry[1] for user_id, entry in self._entries.items()}
+            current = load_updated_at(list(seen)) if seen else {}
+            with self._lock:
+                for user_id, updated_at in seen.items():
+                    entry = self._entries.get(user_id)
+                    # Skip entries re-cached while we were querying
+                    if entry is not None and entry[1] == updated_at and current.get(user_id) != updated_at:
+                        del self._entries[user_id]
+            self._next_poll = time.monotonic() + self.poll_seconds
+            self._watermark = watermark
+        finally:
+            self._poll_lock.release()
+
+
+_users = UserCache(
+    settings.AUTH_USER_CACHE_SIZE, settings.AUTH_USER_CACHE_TTL, settings.AUTH_USER_CACHE_POLL_SECONDS,
+)
+
+
+def _load_updated_at(user_ids):
+    return dict(get_user_model().objects.filter(pk__in=user_ids).values_list("pk", "updated_at"))
+
+
+def invalidate_user(user_id):
+    """Drop a user from this process's cache; other processes notice on their next poll."""
+    _users.discard(user_id)
+
+
+def invalidate_users(user_ids):
+    """``invalidate_user`` for many users at once (bulk updates skip signals, so set ``updated_at``)."""
+    for user_id in user_ids:
+        _users.discard(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """Drop-in for ``JWTAuthentication`` that skips the user query on cache hits."""
+
+    def get_user(self, validated_token):
+        User = get_user_model()
+        try:
+            # The claim is a string; key entries by pk so saves can find them
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError):
+            return super().get_user(validated_token)
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Password-hash revocation needs the live row
+            return super().get_user(validated_token)
+
+        names = [field.attname for field in User._meta.concrete_fields]
+        _users.poll(_load_updated_at, revocation_watermark.get())
+
+        values = _users.get(user_id)
+        if values is not None:
+            # A fresh instance per request, so views can't leak changes
+            # (or related-object caches) into the shared entry.
+            user = User.from_db(None, names, values)
+            if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+                return super().get_user(validated_token)  # raises "user_inactive"
+            return user
+
+        user = super().get_user(validated_token)
+        _users.put(user_id, user.updated_at, [getattr(user, name) for name in names])
+        return user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def _user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
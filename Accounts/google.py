@@ -0,0 +1,115 @@
+# Accounts/google.py
+"""
+Google sign-in token checks.
+
+ID tokens (the ``credential`` from Google Identity Services) are verified
+locally against Google's signing certificates. The certificates are fetched
+over a pooled session behind an HTTP cache, so they are only re-downloaded
+when their ``Cache-Control`` max-age runs out. Anything that isn't a JWT is
+treated as an OAuth access token and checked against the userinfo endpoint.
+"""
+import os
+import threading
+
+import requests
+from asgiref.sync import sync_to_async
+from cachecontrol import CacheControlAdapter
+from django.conf import settings
+from google.auth import exceptions as google_exceptions
+from google.auth.transport.requests import Request
+from google.oauth2 import id_token as google_id_token
+
+import outbound
+
+USER_INFO_URL = os.getenv('GOOGLE_USER_INFO_URL', "https://www.googleapis.com/oauth2/v3/userinfo")
+GOOGLE_ERRORS = (*outbound.NETWORK_ERRORS, google_exceptions.TransportError)
+
+
+class InvalidGoogleToken(Exception):
+    """The token was checked and rejected (bad signature, expired, wrong audience...)."""
+
+
+_certs_session = None
+_certs_session_lock = threading.Lock()
+
+
+def _session():
+    global _certs_session
+    if _certs_session is None:
+        with _certs_session_lock:
+            if _certs_session is None:
+                pool_size = outbound.get_provider('google').config['pool_size']
+                session = requests.Session()
+                session.mount('https://', CacheControlAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+                _certs_session = session
+    return _certs_session
+
+
+class _Request(Request):
+    """google-auth transport with the provider's timeout instead of its 120s default."""
+
+    def __call__(self, url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+        timeout = timeout or outbound.get_provider('google').timeout
+        return super().__call__(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+
+def _audiences():
+    return [client_id.strip() for client_id in settings.GOOGLE_CLIENT_ID.split(',') if client_id.strip()]
+
+
+def verify_id_token(token):
+    """Return the verified claims of a Google ID token."""
+    google = outbound.get_provider('google')
+    try:
+        claims = google.call(
+            lambda: google_id_token.verify_oauth2_token(token, _Request(session=_session()), audience=_audiences()),
+            errors=GOOGLE_ERRORS,
+        )
+    except google_exceptions.TransportError:
+        raise
+    except (ValueError, google_exceptions.GoogleAuthError) as e:
+        # Wrong issuer is a GoogleAuthError, not a ValueError
+        raise InvalidGoogleToken(str(e))
+
+    if not claims.get('email_verified'):
+        raise InvalidGoogleToken("Google account email is not verified")
+    return claims
+
+
+def fetch_userinfo(token):
+    """Fallback for OAuth access tokens: ask Google's userinfo endpoint."""
+    google = outbound.get_provider('google')
+    response = google.call(
+        lambda: google.session.get(USER_INFO_URL, params={"access_token": token}, timeout=google.timeout)
+    )
+    if not response.ok:
+        raise InvalidGoogleToken(response.text)
+    return response.json()
+
+
+def google_identity(token):
+    """
+    Claims (email, given_name, family_name, ...) for a Google ID or access token.
+
+    Raises ``InvalidGoogleToken`` for rejected tokens and ``GOOGLE_ERRORS`` /
+    ``outbound.OutboundError`` when Google can't be reached.
+    """
+    # ID tokens are JWTs (header.payload.signature); access tokens are opaque
+    if _audiences() and token.count('.') == 2:
+        return verify_id_token(token)
+    return fetch_userinfo(token)
+
+
+async def agoogle_identity(token):
+    """Async ``google_identity`` for the ASGI login view."""
+    if _audiences() and token.count('.') == 2:
+        # Local check (certs are almost always cached); run it off the loop
+        return await sync_to_async(verify_id_token, thread_sensitive=False)(token)
+
+    google = outbound.get_provider('google')
+    response = await google.acall(
+        lambda: google.async_client().get(USER_INFO_URL, params={"access_token": token})
+    )
+    if not response.is_success:
+        raise InvalidGoogleToken(response.text)
+    return response.json()
@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from Accounts.views import LoginView
+from cart.stores import get_cart_store
+from products.models import Product
+
+PASSWORD = "bench-password-1"
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark password login (LoginView, throttles off) for users with different cart sizes. "
+        "Works inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cart-items", type=int, nargs="+", default=[0, 50], help="Cart sizes to measure.")
+        parser.add_argument("--repeat", type=int, default=20, help="Logins per cart size.")
+        parser.add_argument(
+            "--fast-hasher", action="store_true",
+            help="Hash with MD5 so the per-login work around the password check stands out.",
+        )
+
+    def handle(self, *args, **options):
+        if options["fast_hasher"]:
+            from django.test import override_settings
+
+            hasher = override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+            hasher.enable()
+        try:
+            with transaction.atomic():
+                products = Product.objects.bulk_create(
+                    Product(name=f"Bench watch {n}", price=100 + n, stock=1_000, category="men",
+                            brand="Rolex", image="products/sample")
+                    for n in range(max(options["cart_items"]))
+                )
+                for items in options["cart_items"]:
+                    self.measure(products[:items], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            if options["fast_hasher"]:
+                hasher.disable()
+
+    def measure(self, products, repeat):
+        email = f"login-bench-{len(products)}@example.com"
+        user = get_user_model().objects.create_user(email=email, password=PASSWORD)
+        store = get_cart_store()
+        for product in products:
+            store.set_quantity(user, product.id, 1)
+
+        view = LoginView.as_view(throttle_classes=[])
+        body = json.dumps({"email": email, "password": PASSWORD})
+        factory = RequestFactory()
+
+        started = time.monotonic()
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as captured:
+                response = view(factory.post("/api/auth/login/", body, content_type="application/json"))
+            assert response.status_code == 200, response.data
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(
+            f"{len(products):>4} cart item(s): {repeat / elapsed:7.1f} logins/s, "
+            f"{elapsed / repeat * 1000:6.1f} ms each, {len(captured)} queries"
+        )
@@ -0,0 +1,137 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from contextlib import ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import AsyncRequestFactory, override_settings
+from rest_framework.test import APIRequestFactory
+
+from Accounts import google
+from Accounts.async_views import AsyncFirebasePhoneAuthView, AsyncGoogleAuthView
+from Accounts.views import FirebasePhoneAuthView, GoogleAuthView
+
+
+class Rollback(Exception):
+    pass
+
+
+class StubUserInfo(BaseHTTPRequestHandler):
+    """Answers Google's userinfo endpoint after ``server.latency`` seconds; the token names the user."""
+
+    def do_GET(self):
+        token = parse_qs(urlsplit(self.path).query)["access_token"][0]
+        time.sleep(self.server.latency)
+        body = json.dumps({"email": f"{token}@example.com", "given_name": "Bench", "family_name": "User"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connects under load (1s SYN retry)
+    request_queue_size = 128
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync (DRF) and async Google/Firebase login views (throttles off). Google's "
+        "userinfo endpoint is a local stub and Firebase's verify_id_token sleeps for the same "
+        "latency. Works inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Logins per view.")
+        parser.add_argument("--concurrency", type=int, default=10, help="Async logins in flight at once.")
+        parser.add_argument("--latency", type=float, default=0.2, help="Stub verifier response time, in seconds.")
+
+    def handle(self, *args, **options):
+        server = StubServer(("127.0.0.1", 0), StubUserInfo)
+        server.latency = options["latency"]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def verify_id_token(token):
+            # Tokens are distinct numbers, one phone number each
+            time.sleep(options["latency"])
+            return {"phone_number": f"+1555{token}"}
+
+        try:
+            with ExitStack() as stubs, transaction.atomic():
+                # No client id: every Google token goes to the (stubbed) userinfo endpoint
+                stubs.enter_context(override_settings(GOOGLE_CLIENT_ID=""))
+                stubs.enter_context(mock.patch.object(
+                    google, "USER_INFO_URL", f"http://127.0.0.1:{server.server_address[1]}/userinfo",
+                ))
+                stubs.enter_context(mock.patch("firebase_admin.auth.verify_id_token", verify_id_token))
+
+                count, concurrency = options["requests"], options["concurrency"]
+                for name, sync_view, async_view, url, field in (
+                    ("google", GoogleAuthView, AsyncGoogleAuthView, "/api/auth/google/", "token"),
+                    ("firebase", FirebasePhoneAuthView, AsyncFirebasePhoneAuthView, "/api/auth/firebase/", "id_token"),
+                ):
+                    # New users throughout, so each login also creates its account
+                    self.measure_sync(name, sync_view, url, [{field: str(1_000_000 + n)} for n in range(count)])
+                    self.measure_async(name, async_view, url, [{field: str(2_000_000 + n)} for n in range(count)],
+                                       concurrency)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def measure_sync(self, name, view_class, url, bodies):
+        view = view_class.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        timings, statuses = [], []
+
+        for body in bodies:
+            request = factory.post(url, body, format="json")
+            started = time.monotonic()
+            statuses.append(view(request).status_code)
+            timings.append(time.monotonic() - started)
+
+        self.report(f"{name} sync, 1 worker", timings, sum(timings), statuses)
+
+    def measure_async(self, name, view_class, url, bodies, concurrency):
+        view = view_class.as_view(throttle_classes=[])
+        factory = AsyncRequestFactory()
+
+        async def run():
+            slots = asyncio.Semaphore(concurrency)
+
+            async def one(body):
+                async with slots:
+                    request = factory.post(url, body, content_type="application/json")
+                    started = time.monotonic()
+                    response = await view(request)
+                    return time.monotonic() - started, response.status_code
+
+            started = time.monotonic()
+            results = await asyncio.gather(*(one(body) for body in bodies))
+            return time.monotonic() - started, results
+
+        elapsed, results = async_to_sync(run)()
+        self.report(f"{name} async, {concurrency} in flight", [t for t, _ in results], elapsed,
+                    [code for _, code in results])
+
+    def report(self, label, timings, elapsed, statuses):
+        quantiles = statistics.quantiles(timings, n=20) if len(timings) > 1 else timings * 19
+        codes = ", ".join(f"{code}x{statuses.count(code)}" for code in sorted(set(statuses)))
+        self.stdout.write(
+            f"{label:>28}: {len(timings) / elapsed:7.1f} logins/s, p50 {statistics.median(timings) * 1000:6.1f} ms, "
+            f"p95 {quantiles[18] * 1000:6.1f} ms ({codes})"
+        )
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from Accounts.revocation import announce_revocations
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired outstanding/blacklisted JWTs in small batches "
+        "(a batched alternative to simplejwt's flushexpiredtokens; schedule it daily)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Outstanding tokens deleted per batch.")
+        parser.add_argument("--sleep", type=float, default=0.0, help="Pause between batches, in seconds.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        started = time.monotonic()
+        last_id = 0
+        outstanding_deleted = blacklisted_deleted = 0
+
+        while True:
+            # Walk the primary key: short index-driven deletes, no long table lock
+            ids = list(
+                OutstandingToken.objects.filter(id__gt=last_id, expires_at__lt=now)
+                .order_by("id")
+                .values_list("id", flat=True)[:options["batch_size"]]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            # Blacklist rows go with their token (FK cascade)
+            _, per_model = OutstandingToken.objects.filter(id__in=ids).delete()
+            outstanding_deleted += per_model.get("token_blacklist.OutstandingToken", 0)
+            blacklisted_deleted += per_model.get("token_blacklist.BlacklistedToken", 0)
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(
+                f"Deleted {outstanding_deleted} outstanding / {blacklisted_deleted} blacklisted "
+                f"({(outstanding_deleted + blacklisted_deleted) / elapsed:.0f} rows/s)"
+            )
+
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        if blacklisted_deleted:
+            announce_revocations()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Compacted token blacklist: {outstanding_deleted} outstanding and "
+            f"{blacklisted_deleted} blacklisted token(s) removed in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from Accounts.models import ThrottleCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete rate-limit counters whose windows have passed "
+        "(THROTTLE_STORE = 'database'; schedule it hourly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Counters deleted per statement.")
+        parser.add_argument("--sleep", type=float, default=0.0, help="Pause between batches, in seconds.")
+
+    def handle(self, *args, **options):
+        table = connection.ops.quote_name(ThrottleCounter._meta.db_table)
+        cutoff = timezone.now()
+        started = time.monotonic()
+        deleted = 0
+
+        while True:
+            # Short statements on the expires_at index; a counter written
+            # again meanwhile has a new expiry and is kept
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    DELETE FROM {table} WHERE key IN (
+                        SELECT key FROM {table} WHERE expires_at < %s LIMIT %s
+                    ) AND expires_at < %s
+                    """,
+                    [cutoff, options["batch_size"], cutoff],
+                )
+                batch = cursor.rowcount
+            deleted += batch
+            if batch < options["batch_size"]:
+                break
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} throttle counter(s) in {elapsed:.1f}s"))
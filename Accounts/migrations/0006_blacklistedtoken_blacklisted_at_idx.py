@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """Index simplejwt's blacklist by time for the incremental revoked-token loads (Accounts/revocation.py)."""
+
+    dependencies = [
+        ('Accounts', '0005_user_updated_at'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS blacklistedtoken_blacklisted_at_idx '
+            'ON token_blacklist_blacklistedtoken (blacklisted_at)',
+            'DROP INDEX IF EXISTS blacklistedtoken_blacklisted_at_idx',
+        ),
+    ]
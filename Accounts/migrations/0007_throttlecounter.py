@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Accounts', '0006_blacklistedtoken_blacklisted_at_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleCounter',
+            fields=[
+                ('key', models.CharField(max_length=200, primary_key=True, serialize=False)),
+                ('bucket', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('previous', models.PositiveIntegerField(default=0)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        # Counters are disposable: skip the WAL (a crash just resets them)
+        migrations.RunSQL(
+            'ALTER TABLE "Accounts_throttlecounter" SET UNLOGGED',
+            'ALTER TABLE "Accounts_throttlecounter" SET LOGGED',
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Accounts', '0007_throttlecounter'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_created_at_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_order_count_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_lifetime_value_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_last_order_at_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['created_at', 'id'], name='user_created_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['order_count', 'id'], name='user_order_count_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['lifetime_value', 'id'], name='user_lifetime_value_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['last_order_at', 'id'], name='user_last_order_at_id_idx'),
+        ),
+    ]
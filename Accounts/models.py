@@ -1,4 +1,6 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
 
 
@@ -39,11 +41,47 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every save() (not by last_login-only saves or queryset
+    # updates); the per-process JWT user caches poll it to drop stale users
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Order aggregates for the admin user list, kept current by checkout and
+    # cancellation (orders/rollups.py); cancelled orders don't count
+    order_count = models.PositiveIntegerField(default=0)
+    lifetime_value = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_order_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []  # You can add 'phone_number' here if you want it required for superusers
 
+    class Meta:
+        indexes = [
+            # Admin search: `icontains` compiles to UPPER(col) LIKE UPPER(%term%)
+            GinIndex(OpClass(Upper('email'), name='gin_trgm_ops'), name='user_email_trgm_idx'),
+            GinIndex(OpClass(Upper('first_name'), name='gin_trgm_ops'), name='user_first_name_trgm_idx'),
+            GinIndex(OpClass(Upper('last_name'), name='gin_trgm_ops'), name='user_last_name_trgm_idx'),
+            GinIndex(OpClass(Upper('phone_number'), name='gin_trgm_ops'), name='user_phone_trgm_idx'),
+            # Admin list sorts, with the id tie-breaker of its keyset pagination
+            models.Index(fields=['created_at', 'id'], name='user_created_at_id_idx'),
+            models.Index(fields=['order_count', 'id'], name='user_order_count_id_idx'),
+            models.Index(fields=['lifetime_value', 'id'], name='user_lifetime_value_id_idx'),
+            models.Index(fields=['last_order_at', 'id'], name='user_last_order_at_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.email
+
+
+class ThrottleCounter(models.Model):
+    """Request count of one throttle identity in its current and previous window (Accounts/throttling.py)."""
+    key = models.CharField(max_length=200, primary_key=True)
+    bucket = models.BigIntegerField()  # window number: unix time // period
+    count = models.PositiveIntegerField(default=0)
+    previous = models.PositiveIntegerField(default=0)
+    # Removed by `manage.py purge_throttle_counters` once past
+    expires_at = models.DateTimeField(db_index=True)
+
     def __str__(self):
-        return self.email
\ No newline at end of file
+        return f"{self.key}: {self.count}"
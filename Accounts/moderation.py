@@ -0,0 +1,116 @@
+# Accounts/moderation.py
+"""
+Bulk block/unblock and role changes for the admin panel.
+
+Each action is one ``UPDATE ... RETURNING id`` over the selected users
+(minus the acting admin). Users who get blocked also have every unexpired
+refresh token blacklisted with one ``INSERT ... SELECT``, and all changed
+users are dropped from the per-process auth caches once the transaction
+commits. A block also moves the revocation watermark, so every process
+refuses the blocked users within ``TOKEN_REVOCATION_WATERMARK_SECONDS``
+rather than on its next ``AUTH_USER_CACHE_POLL_SECONDS`` poll.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from Horo_BackEnd.params import parse_moment
+from .authentication import invalidate_users
+from .revocation import announce_revocations
+
+User = get_user_model()
+
+# action -> (columns to set, condition that means "not already in that state")
+ACTIONS = {
+    'block': ({'is_blocked': True, 'is_active': False}, "(NOT is_blocked OR is_active)"),
+    'unblock': ({'is_blocked': False, 'is_active': True}, "(is_blocked OR NOT is_active)"),
+    'make_admin': ({'is_staff': True}, "NOT is_staff"),
+    'make_user': ({'is_staff': False, 'is_superuser': False}, "(is_staff OR is_superuser)"),
+}
+
+MAX_IDS = 10000
+FILTER_KEYS = ('email_contains', 'email_domain', 'created_after', 'created_before', 'max_order_count')
+
+
+def select_users(ids=None, filters=None):
+    """
+    Users targeted by a bulk action: an explicit id list, or a filter using
+    any of ``FILTER_KEYS``. Returns ``(queryset, requested ids or None)``.
+    """
+    if ids is not None:
+        if not isinstance(ids, list) or not ids:
+            raise ValidationError({"ids": "Provide a non-empty list of user ids."})
+        if len(ids) > MAX_IDS:
+            raise ValidationError({"ids": f"At most {MAX_IDS} ids per request."})
+        try:
+            ids = [int(user_id) for user_id in ids]
+        except (TypeError, ValueError):
+            raise ValidationError({"ids": "Ids must be integers."})
+        return User.objects.filter(id__in=ids), ids
+
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValidationError({"filter": "Must be an object."})
+    queryset = User.objects.all()
+    if filters.get('email_contains'):
+        queryset = queryset.filter(email__icontains=filters['email_contains'])
+    if filters.get('email_domain'):
+        queryset = queryset.filter(email__iendswith=f"@{filters['email_domain'].lstrip('@')}")
+    if filters.get('created_after'):
+        queryset = queryset.filter(created_at__gte=parse_moment('created_after', filters['created_after'])[0])
+    if filters.get('created_before'):
+        queryset = queryset.filter(created_at__lt=parse_moment('created_before', filters['created_before'])[0])
+    if filters.get('max_order_count') not in (None, ''):
+        try:
+            queryset = queryset.filter(order_count__lte=int(filters['max_order_count']))
+        except (TypeError, ValueError):
+            raise ValidationError({"max_order_count": "Must be an integer."})
+
+    if not any(filters.get(key) not in (None, '') for key in FILTER_KEYS):
+        raise ValidationError({"filter": "Refusing to apply a bulk action to every user; add a filter."})
+    return queryset, None
+
+
+def moderate_users(action, queryset, acting_user):
+    """Apply ``action`` to ``queryset`` (minus ``acting_user``). Returns the changed user ids."""
+    if action not in ACTIONS:
+        raise ValidationError({"action": f"One of: {', '.join(ACTIONS)}"})
+    columns, pending = ACTIONS[action]
+
+    quote = connection.ops.quote_name
+    # updated_at tells the other processes' auth caches to reload these users
+    assignments = ", ".join([*(f"{quote(column)} = %s" for column in columns), "updated_at = now()"])
+    subquery, sub_params = queryset.values('id').query.sql_with_params()
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {quote(User._meta.db_table)}
+                SET {assignments}
+                WHERE id IN ({subquery}) AND id <> %s AND {pending}
+                RETURNING id
+                """,
+                [*columns.values(), *sub_params, acting_user.pk],
+            )
+            changed = [row[0] for row in cursor.fetchall()]
+
+            if action == 'block' and changed:
+                # Refresh tokens die with the account; access tokens are
+                # refused once the auth cache drops the user (is_active=False),
+                # which the watermark makes every process do on its next read.
+                cursor.execute(
+                    f"""
+                    INSERT INTO {quote(BlacklistedToken._meta.db_table)} (token_id, blacklisted_at)
+                    SELECT id, now() FROM {quote(OutstandingToken._meta.db_table)}
+                    WHERE user_id = ANY(%s) AND expires_at > now()
+                    ON CONFLICT (token_id) DO NOTHING
+                    """,
+                    [changed],
+                )
+                transaction.on_commit(announce_revocations)
+
+        transaction.on_commit(lambda: invalidate_users(changed))
+
+    return changed
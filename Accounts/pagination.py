@@ -0,0 +1,150 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import F, Func, Value
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class Row(Func):
+    """``ROW(a, b)``, compared as a tuple: ``(a, b) < (x, y)``."""
+    function = 'ROW'
+    output_field = models.Field()
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on ``(sort column, id)``.
+
+    The cursor is the last row's sort value and id, and the next page is
+    ``WHERE (col, id) < (value, id)`` (``>`` for ascending sorts), so
+    ties in the sort column never skip or repeat rows however many there
+    are. DRF's ``CursorPagination`` keeps only the column value plus an
+    offset into the rows sharing it, which breaks down on columns full of
+    ties such as ``order_count``. The sort column is the first ordering on
+    the queryset (e.g. from ``OrderingFilter``), else ``ordering``.
+
+    NULLs in a nullable sort column come last in either direction, ordered
+    by id. They are read as a separate ``col IS NULL`` query once the
+    non-NULL rows run out, so both parts still walk an index on
+    ``(col, id)``.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    ordering = '-created_at'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = next(iter(queryset.query.order_by), self.ordering)
+        self.field = ordering.lstrip('-')
+        field = queryset.model._meta.get_field(self.field)
+        cursor = self.decode_cursor(request, field)
+
+        # Previous pages walk backwards from the cursor (NULLs first), then flip the rows
+        backwards = cursor is not None and cursor['reverse']
+        descending = ordering.startswith('-') != backwards
+        # Each part of the walk: None (column not nullable), False (non-NULL rows), True (NULL rows)
+        parts = [False, True] if field.null else [None]
+        if backwards:
+            parts.reverse()
+        if cursor is not None and field.null:
+            parts = parts[parts.index(cursor['value'] is None):]
+
+        rows = []
+        for index, isnull in enumerate(parts):
+            part = self.part(queryset, isnull, descending, cursor if index == 0 else None)
+            rows += list(part[:page_size + 1 - len(rows)])
+            if len(rows) > page_size:
+                break
+
+        more = len(rows) > page_size
+        self.page = rows[:page_size]
+        if backwards:
+            self.page.reverse()
+        self.has_next = cursor is not None if backwards else more
+        self.has_previous = more if backwards else cursor is not None
+        return self.page
+
+    def part(self, queryset, isnull, descending, cursor):
+        """The rows of one part of the walk, after ``cursor`` if it points into this part."""
+        sign = '-' if descending else ''
+        if isnull:
+            queryset = queryset.filter(**{f'{self.field}__isnull': True}).order_by(f'{sign}id')
+            if cursor is not None:
+                queryset = queryset.filter(**{'id__lt' if descending else 'id__gt': cursor['id']})
+            return queryset
+
+        if isnull is False:
+            queryset = queryset.filter(**{f'{self.field}__isnull': False})
+        queryset = queryset.order_by(f'{sign}{self.field}', f'{sign}id')
+        if cursor is not None:
+            lookup = '_keyset__lt' if descending else '_keyset__gt'
+            queryset = queryset.alias(_keyset=Row(F(self.field), F('id'))).filter(
+                **{lookup: Row(Value(cursor['value']), Value(cursor['id']))}
+            )
+        return queryset
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def decode_cursor(self, request, field):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if data['v'] is None and not field.null:
+                raise ValueError
+            value = None if data['v'] is None else field.to_python(data['v'])
+            return {'value': value, 'id': int(data['id']), 'reverse': bool(data.get('r'))}
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse):
+        # str() keeps datetimes to the microsecond (DjangoJSONEncoder rounds to ms)
+        data = {'v': getattr(row, self.field), 'id': row.id, 'r': int(reverse)}
+        encoded = base64.urlsafe_b64encode(json.dumps(data, default=str).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return CursorPagination.get_paginated_response_schema(self, schema)
+
+
+class UserKeysetPagination(KeysetPagination):
+    """Newest first by default; `?ordering=` (OrderingFilter) picks another sort column."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = '-created_at'
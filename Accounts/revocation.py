@@ -0,0 +1,139 @@
+# Accounts/revocation.py
+"""
+Revoked refresh tokens, checked from memory.
+
+The ``token_blacklist`` tables stay the source of truth; each process keeps
+the JTIs of blacklisted, not-yet-expired tokens in a dict and tops it up
+incrementally (rows blacklisted since its last load, minus an overlap for
+rows that commit late). A logout bumps a watermark in the shared cache;
+each process reads it at most every ``TOKEN_REVOCATION_WATERMARK_SECONDS``
+and reloads when it moved, so a check between reads costs no query even
+on the database cache. Otherwise processes poll every
+``TOKEN_REVOCATION_REFRESH_SECONDS``, and rebuild the set from scratch
+every ``TOKEN_REVOCATION_FULL_RELOAD_SECONDS`` in case a row committed
+later than the overlap allows.
+
+Expired rows are removed by ``manage.py compact_token_blacklist``.
+"""
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+WATERMARK_KEY = "auth_revoked:watermark"
+
+# blacklisted_at is stamped before the row commits (and bulk blocks use
+# the transaction's start time), so each incremental load re-reads rows
+# blacklisted this long before the previous load started. Ids are no
+# use here: bulk inserts take ids early and can commit well after
+# smaller and larger ids from other transactions.
+TIME_OVERLAP = timedelta(minutes=1)
+
+
+class SharedWatermark:
+    """A shared-cache value that each process re-reads at most once per ``poll_seconds``."""
+
+    def __init__(self, key, poll_seconds):
+        self.key = key
+        self.poll_seconds = poll_seconds
+        self._value = None
+        self._next_read = 0
+
+    def get(self):
+        # Unlocked: two threads racing past the deadline just both read it
+        now = time.monotonic()
+        if now >= self._next_read:
+            self._value = cache.get(self.key)
+            self._next_read = now + self.poll_seconds
+        return self._value
+
+    def bump(self):
+        self._value = uuid.uuid4().hex
+        cache.set(self.key, self._value, None)
+
+
+class RevokedTokens:
+    """Per-process ``{jti: expires_at}`` of blacklisted refresh tokens."""
+
+    def __init__(self, refresh_seconds, full_reload_seconds, watermark):
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.watermark = watermark
+        self._expiry = {}
+        self._loaded_at = None
+        self._watermark = None
+        self._next_poll = 0
+        self._next_full_reload = 0
+        self._lock = threading.Lock()
+
+    def _load(self, full):
+        now = timezone.now()
+        rows = BlacklistedToken.objects.filter(token__expires_at__gt=now)
+        if full:
+            expiry = {}
+        else:
+            rows = rows.filter(blacklisted_at__gte=self._loaded_at - TIME_OVERLAP)
+            # Expired tokens fail verification anyway; keep the dict small
+            expiry = {jti: expires for jti, expires in self._expiry.items() if expires > now}
+
+        expiry.update(rows.values_list("token__jti", "token__expires_at"))
+        self._expiry = expiry
+        self._loaded_at = now
+
+    def contains(self, jti):
+        watermark = self.watermark.get()
+        with self._lock:
+            now = time.monotonic()
+            if watermark != self._watermark or now >= self._next_poll:
+                full = self._loaded_at is None or now >= self._next_full_reload
+                self._load(full)
+                self._watermark = watermark
+                self._next_poll = now + self.refresh_seconds
+                if full:
+                    self._next_full_reload = now + self.full_reload_seconds
+            return jti in self._expiry
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expiry[jti] = expires_at
+
+
+revocation_watermark = SharedWatermark(WATERMARK_KEY, settings.TOKEN_REVOCATION_WATERMARK_SECONDS)
+
+revoked_tokens = RevokedTokens(
+    settings.TOKEN_REVOCATION_REFRESH_SECONDS, settings.TOKEN_REVOCATION_FULL_RELOAD_SECONDS,
+    revocation_watermark,
+)
+
+
+def announce_revocations():
+    """Tell every process to reload the revoked set once it next reads the watermark."""
+    revocation_watermark.bump()
+
+
+class RevocableRefreshToken(RefreshToken):
+    """``RefreshToken`` whose blacklist check reads the in-memory set."""
+
+    def check_blacklist(self):
+        if revoked_tokens.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        revoked_tokens.add(self.payload[api_settings.JTI_CLAIM], result[0].token.expires_at)
+        announce_revocations()
+        return result
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
@@ -7,23 +7,39 @@ User = get_user_model()
 # ... [Keep UserSerializer, RegisterSerializer, AdminUserSerializer exactly as they were] ...
 
 class UserSerializer(serializers.ModelSerializer):
-    cart = serializers.SerializerMethodField()
+    """
+    Lean user payload for login/profile: the cart is only a count and
+    subtotal. Pass ``context={"include_cart": True}`` for the full cart.
+    """
+    cart_summary = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = (
             "id", "email", "phone_number", "first_name", "last_name",
-            "is_staff", "is_superuser", "is_active", "cart",
+            "is_staff", "is_superuser", "is_active", "cart_summary",
         )
 
-    def get_cart(self, obj):
+    def get_cart_summary(self, obj):
         try:
-            from cart.serializers import CartSerializer
-            if hasattr(obj, 'cart'):
-                return CartSerializer(obj.cart).data
+            from cart.stores import get_cart_store
         except ImportError:
             return None
-        return None
+        return get_cart_store().summary(obj)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if self.context.get("include_cart"):
+            from cart.stores import get_cart_store
+            data["cart"] = get_cart_store().render(instance)
+        return data
+
+
+def user_payload(user, request=None):
+    """User data for login/profile responses; ``?include=cart`` adds the full cart."""
+    params = getattr(request, "query_params", None) or getattr(request, "GET", {})
+    include = params.get("include", "")
+    return UserSerializer(user, context={"include_cart": "cart" in include.split(",")}).data
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -42,7 +58,10 @@ class AdminUserSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = User
-        fields = ['id', 'name', 'email', 'role', 'is_blocked', 'date_joined']
+        fields = [
+            'id', 'name', 'email', 'phone_number', 'role', 'is_blocked', 'date_joined',
+            'order_count', 'lifetime_value', 'last_order_at',
+        ]
 
     def get_role(self, obj):
         return "Admin" if obj.is_staff else "User"
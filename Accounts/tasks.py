@@ -0,0 +1,19 @@
+# Accounts/tasks.py
+from django.core.cache import cache
+
+from jobs.queue import register
+from jobs.tasks import deliver
+from .utils import otp_message
+
+
+@register('otp_email')
+def send_otp_emails(jobs):
+    """Send queued password-reset codes; codes that expired (or were used) are dropped."""
+    def render(job):
+        email = job.payload['email']
+        otp_code = cache.get(f'otp_{email}')
+        if otp_code is None:
+            return None
+        return otp_message(email, otp_code)
+
+    return deliver(jobs, render)
@@ -1,3 +1,554 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from email.utils import formatdate
+from unittest import mock
 
-# Create your tests here.
+import cloudinary
+import requests
+import urllib3
+from asgiref.sync import async_to_sync
+from cachecontrol import CacheControlAdapter
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import update_last_login
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, models
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from google.auth import crypt, jwt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+import outbound
+from cart.stores import get_cart_store
+from jobs.models import Job
+from products.models import Product
+from jobs.worker import run_batch
+from .async_views import AsyncFirebasePhoneAuthView
+from .authentication import CachedJWTAuthentication, _users
+from .models import ThrottleCounter
+from .moderation import moderate_users
+from .revocation import (
+    TIME_OVERLAP, WATERMARK_KEY, RevokedTokens, SharedWatermark, announce_revocations, revocation_watermark,
+)
+from .throttling import IPThrottle
+from .utils import send_otp_email
+
+User = get_user_model()
+
+
+class OTPEmailJobTests(TestCase):
+
+    def test_code_is_not_stored_in_the_job(self):
+        send_otp_email('reset@example.com')
+        code = cache.get('otp_reset@example.com')
+
+        job = Job.objects.get(kind='otp_email')
+        self.assertEqual(job.payload, {'email': 'reset@example.com'})
+        self.assertEqual(job.max_attempts, 3)
+
+        self.assertEqual(run_batch(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn(code, mail.outbox[0].body)
+
+    def test_expired_code_is_not_sent(self):
+        send_otp_email('reset@example.com')
+        cache.delete('otp_reset@example.com')
+
+        self.assertEqual(run_batch(), (1, 0))
+        self.assertEqual(mail.outbox, [])
+        self.assertFalse(Job.objects.exists())
+
+
+class BulkModerationTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def moderate(self, **body):
+        return self.client.post('/api/auth/admin/users/bulk/', body, format='json')
+
+    def test_filter_by_domain_and_date(self):
+        spammer = User.objects.create_user(email='bot@spam.io', password='x')
+        response = self.moderate(action='block', filter={'email_domain': 'spam.io', 'created_after': '2020-01-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 1)
+        spammer.refresh_from_db()
+        self.assertTrue(spammer.is_blocked)
+
+    def test_results_list_each_requested_id(self):
+        user = User.objects.create_user(email='user@example.com', password='x')
+        blocked = User.objects.create_user(email='blocked@example.com', password='x', is_blocked=True, is_active=False)
+        response = self.moderate(action='block', ids=[user.pk, blocked.pk, self.admin.pk, 999999, user.pk])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['results'], [
+            {'id': user.pk, 'result': 'updated'},
+            {'id': blocked.pk, 'result': 'unchanged'},
+            {'id': self.admin.pk, 'result': 'skipped_self'},
+            {'id': 999999, 'result': 'not_found'},
+        ])
+
+    def test_impossible_dates_are_a_bad_request(self):
+        for value in ('2026-02-30', '2026-02-30T10:00:00', 'yesterday'):
+            response = self.moderate(action='block', filter={'created_after': value})
+            self.assertEqual(response.status_code, 400, value)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginCartSizeTests(TestCase):
+    """Login and profile cost the same whatever is in the cart."""
+
+    def setUp(self):
+        self.products = Product.objects.bulk_create(
+            Product(name=f'Watch {n}', price='100.00', stock=10, category='men', brand='Rolex',
+                    image='products/sample')
+            for n in range(50)
+        )
+        self.client = APIClient()
+
+    def user_with_cart(self, email, items):
+        user = User.objects.create_user(email=email, password='password-1')
+        for product in self.products[:items]:
+            get_cart_store().set_quantity(user, product.id, 1)
+        return user
+
+    def login(self, email):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post('/api/auth/login/', {'email': email, 'password': 'password-1'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['user'], len(captured)
+
+    def test_login_queries_do_not_grow_with_the_cart(self):
+        self.user_with_cart('empty@example.com', 0)
+        self.user_with_cart('full@example.com', 50)
+
+        empty, empty_queries = self.login('empty@example.com')
+        full, full_queries = self.login('full@example.com')
+
+        self.assertEqual(full_queries, empty_queries)
+        self.assertEqual((empty['cart_summary']['count'], full['cart_summary']['count']), (0, 50))
+        self.assertNotIn('cart', full)
+
+    def test_full_cart_is_opt_in_on_the_profile(self):
+        # The full cart renders image URLs, which need a cloud name
+        config = cloudinary.config()
+        self.addCleanup(setattr, config, 'cloud_name', config.cloud_name)
+        config.cloud_name = config.cloud_name or 'test'
+
+        user = self.user_with_cart('full@example.com', 3)
+        self.client.force_authenticate(user)
+
+        self.assertNotIn('cart', self.client.get('/api/auth/profile/').data)
+        self.assertEqual(len(self.client.get('/api/auth/profile/?include=cart').data['cart']['items']), 3)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Cache hits run no query; other processes' changes land on the next poll."""
+
+    def setUp(self):
+        _users._entries.clear()
+        self.addCleanup(_users._entries.clear)
+        # Hold the revocation watermark still unless a test moves it
+        patcher = mock.patch.object(revocation_watermark, 'get', return_value=_users._watermark)
+        self.watermark = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='cached@example.com', password='x')
+        self.admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        self.token = str(AccessToken.for_user(self.user))
+
+    def authenticate(self):
+        request = RequestFactory().get('/api/auth/profile/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def poll_now(self):
+        _users._next_poll = 0
+
+    def test_cache_hit_runs_no_query(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().email, 'cached@example.com')
+
+        self.poll_now()
+        with self.assertNumQueries(1):  # one poll covers every cached user
+            self.authenticate()
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_block_in_another_process_lands_on_the_next_poll(self):
+        self.authenticate()
+        # No on_commit here, so this process isn't told directly, like any other process
+        moderate_users('block', User.objects.filter(pk=self.user.pk), self.admin)
+
+        self.assertEqual(self.authenticate().pk, self.user.pk)  # until the poll
+        self.poll_now()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_block_in_another_process_lands_once_the_watermark_moves(self):
+        self.authenticate()
+        moderate_users('block', User.objects.filter(pk=self.user.pk), self.admin)
+
+        self.watermark.return_value = 'moved'  # read by this process after the block committed
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_block_view_revokes_everywhere(self):
+        refresh = RefreshToken.for_user(self.user)
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch('Accounts.moderation.announce_revocations') as announce:
+            response = client.patch(f'/api/auth/admin/users/{self.user.pk}/block/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_blocked'])
+        self.assertTrue(BlacklistedToken.objects.filter(token__jti=refresh['jti']).exists())
+        announce.assert_called_once_with()
+
+        response = client.patch(f'/api/auth/admin/users/{self.user.pk}/block/')
+        self.assertFalse(response.data['is_blocked'])
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_active)
+
+    def test_deleted_user_is_dropped_on_the_next_poll(self):
+        self.authenticate()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(User._meta.db_table)} WHERE id = %s', [self.user.pk])
+
+        self.poll_now()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_save_drops_the_user_in_this_process(self):
+        self.authenticate()
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertEqual(self.authenticate().first_name, 'Renamed')
+
+    def test_last_login_does_not_bump_updated_at(self):
+        updated_at = self.user.updated_at
+        update_last_login(None, self.user)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.updated_at, updated_at)
+
+
+class RevokedTokensTests(TestCase):
+    """Late-committing blacklist rows are still picked up."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='revoked@example.com', password='x')
+        # Reads the watermark on every check, as if its interval had always just passed
+        self.revoked = RevokedTokens(
+            refresh_seconds=30, full_reload_seconds=600, watermark=SharedWatermark(WATERMARK_KEY, 0),
+        )
+        self.assertFalse(self.revoked.contains('unknown'))  # initial full load
+
+    def blacklist(self, jti, age):
+        token = OutstandingToken.objects.create(
+            user=self.user, jti=jti, token='x', expires_at=timezone.now() + timedelta(days=1),
+        )
+        row = BlacklistedToken.objects.create(token=token)
+        # Stamped when the transaction started, committed just now
+        BlacklistedToken.objects.filter(pk=row.pk).update(blacklisted_at=timezone.now() - age)
+        announce_revocations()
+
+    def test_row_stamped_before_the_last_load_is_found(self):
+        self.blacklist('late', age=timedelta(seconds=20))
+        self.assertTrue(self.revoked.contains('late'))
+
+    def test_full_reload_catches_rows_older_than_the_overlap(self):
+        self.blacklist('very-late', age=TIME_OVERLAP * 10)
+        self.assertFalse(self.revoked.contains('very-late'))
+
+        self.revoked._next_full_reload = 0
+        announce_revocations()
+        self.assertTrue(self.revoked.contains('very-late'))
+
+    def test_warm_checks_skip_the_shared_cache(self):
+        revoked = RevokedTokens(
+            refresh_seconds=30, full_reload_seconds=600, watermark=SharedWatermark(WATERMARK_KEY, 60),
+        )
+        revoked.contains('unknown')  # watermark read + initial full load
+        self.blacklist('logged-out', age=timedelta(0))
+        # The cache here is the database cache: a watermark read is a query
+        with self.assertNumQueries(0):
+            self.assertFalse(revoked.contains('logged-out'))
+
+        revoked.watermark._next_read = 0  # the interval passed
+        self.assertTrue(revoked.contains('logged-out'))
+
+
+class AsyncLoginBodyTests(TestCase):
+    """The async logins read JSON and form bodies, like the DRF views they replace."""
+
+    def login(self, data, content_type):
+        view = AsyncFirebasePhoneAuthView.as_view(throttle_classes=[])
+        request = AsyncRequestFactory().post('/api/auth/firebase/', data, content_type=content_type)
+        with mock.patch('firebase_admin.auth.verify_id_token', return_value={'phone_number': '+15550100'}) as verify:
+            response = async_to_sync(view)(request)
+        return response, verify
+
+    def test_json_and_form_bodies(self):
+        bodies = {
+            'application/json': {'id_token': 'token'},
+            'application/x-www-form-urlencoded': 'id_token=token',
+            MULTIPART_CONTENT: encode_multipart(BOUNDARY, {'id_token': 'token'}),
+        }
+        for content_type, data in bodies.items():
+            with self.subTest(content_type):
+                if content_type == MULTIPART_CONTENT:
+                    content_type = f'{MULTIPART_CONTENT}; boundary={BOUNDARY}'
+                response, verify = self.login(data, content_type)
+                self.assertEqual(response.status_code, 200, response.content)
+                verify.assert_called_once_with('token')
+
+    def test_missing_token(self):
+        response, _ = self.login('', 'application/x-www-form-urlencoded')
+        self.assertEqual(response.status_code, 400)
+
+
+class GoogleIdTokenTests(TestCase):
+    """ID tokens signed with a local key, verified against locally served certs."""
+
+    KID = 'test-key'
+    CLIENT_ID = 'web-client.apps.googleusercontent.com'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        cls.signer = crypt.RSASigner.from_string(
+            key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                              serialization.NoEncryption()),
+            key_id=cls.KID,
+        )
+        cls.public_pem = key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+        ).decode()
+
+    def setUp(self):
+        # Google's certs endpoint, served from memory through the real HTTP cache
+        self.certs = FakeCertsPool({self.KID: self.public_pem})
+        session = requests.Session()
+        session.mount('https://', FakeCertsAdapter(self.certs))
+        patcher = mock.patch('Accounts.google._certs_session', session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(outbound.get_provider('google').breaker.record_success)
+
+    def id_token(self, **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com', 'aud': self.CLIENT_ID, 'sub': '1234567890',
+            'email': 'googler@example.com', 'email_verified': True, 'given_name': 'Ada',
+            'iat': now, 'exp': now + 3600, **claims,
+        }
+        return jwt.encode(self.signer, payload).decode()
+
+    def login(self, token):
+        with override_settings(GOOGLE_CLIENT_ID=self.CLIENT_ID):
+            return APIClient().post('/api/auth/google/', {'credential': token}, format='json')
+
+    def test_valid_token_signs_the_user_in(self):
+        response = self.login(self.id_token())
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['user']['email'], 'googler@example.com')
+        self.assertEqual(User.objects.get(email='googler@example.com').first_name, 'Ada')
+
+    def test_certs_are_fetched_once_while_cached(self):
+        for _ in range(3):
+            self.assertEqual(self.login(self.id_token()).status_code, 200)
+        self.assertEqual(self.certs.hits, 1)
+
+    def test_rejected_tokens(self):
+        other_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        forged = jwt.encode(
+            crypt.RSASigner.from_string(
+                other_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                        serialization.NoEncryption()),
+                key_id=self.KID,
+            ),
+            {'iss': 'https://accounts.google.com', 'aud': self.CLIENT_ID, 'email': 'googler@example.com',
+             'email_verified': True, 'iat': int(time.time()), 'exp': int(time.time()) + 3600},
+        ).decode()
+        tokens = {
+            'forged signature': forged,
+            'wrong audience': self.id_token(aud='someone-else.apps.googleusercontent.com'),
+            'wrong issuer': self.id_token(iss='https://evil.example.com'),
+            'expired': self.id_token(iat=int(time.time()) - 7200, exp=int(time.time()) - 3600),
+            'unverified email': self.id_token(email_verified=False),
+        }
+        for reason, token in tokens.items():
+            response = self.login(token)
+            self.assertEqual(response.status_code, 400, reason)
+        self.assertFalse(User.objects.filter(email='googler@example.com').exists())
+
+
+class FakeCertsPool:
+    """Stands in for urllib3's connection pool; answers with the certs JSON, cacheable for an hour."""
+
+    def __init__(self, certs):
+        self.body = json.dumps(certs).encode()
+        self.hits = 0
+
+    def urlopen(self, method, url, **kwargs):
+        self.hits += 1
+        return urllib3.HTTPResponse(
+            body=SocketBody(self.body), status=200, preload_content=False, decode_content=False,
+            request_method=method,
+            headers={'Content-Type': 'application/json', 'Content-Length': str(len(self.body)),
+                     'Cache-Control': 'public, max-age=3600', 'Date': formatdate(usegmt=True)},
+        )
+
+
+class SocketBody(io.BytesIO):
+    """Body that reports ``fp = None`` once drained, as http.client does; CacheControl stores the response then."""
+
+    @property
+    def fp(self):
+        return None if self.tell() == len(self.getbuffer()) else self
+
+
+class FakeCertsAdapter(CacheControlAdapter):
+
+    def __init__(self, pool):
+        super().__init__()
+        self.pool = pool
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        return self.pool
+
+
+@override_settings(THROTTLE_STORE='database', REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'login_ip': '1000/min'},
+})
+class ThrottleCounterTests(TransactionTestCase):
+    """Database throttle counters are exact under concurrency and cost one query."""
+
+    def hit(self, ip='10.0.0.1'):
+        request = RequestFactory().post('/api/auth/login/', REMOTE_ADDR=ip, HTTP_X_FORWARDED_FOR=ip)
+        view = type('View', (), {'throttle_scope': 'login'})()
+        return IPThrottle().allow_request(request, view)
+
+    def test_concurrent_requests_are_all_counted(self):
+        def worker():
+            try:
+                for _ in range(25):
+                    self.hit()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        counter = ThrottleCounter.objects.get()
+        self.assertEqual(counter.count + counter.previous, 200)
+
+    def test_limit_is_enforced(self):
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK,
+                                               'DEFAULT_THROTTLE_RATES': {'login_ip': '3/min'}}):
+            self.assertEqual([self.hit() for _ in range(4)], [True, True, True, False])
+            self.assertTrue(self.hit(ip='10.0.0.2'))
+
+    def test_one_query_per_check(self):
+        with self.assertNumQueries(1):
+            self.hit()
+
+    def test_window_rolls_over(self):
+        self.hit()
+        ThrottleCounter.objects.update(bucket=models.F('bucket') - 1, count=7)
+        self.hit()
+        counter = ThrottleCounter.objects.get()
+        self.assertEqual((counter.count, counter.previous), (1, 7))
+
+        ThrottleCounter.objects.update(bucket=models.F('bucket') - 5)
+        self.hit()
+        counter = ThrottleCounter.objects.get()
+        self.assertEqual((counter.count, counter.previous), (1, 0))
+
+    def test_purge_removes_expired_counters(self):
+        self.hit()
+        self.hit(ip='10.0.0.2')
+        ThrottleCounter.objects.filter(key__endswith='10.0.0.1').update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_throttle_counters', stdout=io.StringIO())
+        self.assertEqual(list(ThrottleCounter.objects.values_list('key', flat=True)), ['throttle:login_ip:10.0.0.2'])
+
+
+class AdminUserListPaginationTests(TestCase):
+    """Keyset pages on (sort column, id) neither skip nor repeat tied rows."""
+
+    def setUp(self):
+        admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        now = timezone.now()
+        User.objects.bulk_create(
+            User(email=f'customer{n}@example.com', order_count=n % 3, lifetime_value=Decimal(n % 2) * 100,
+                 last_order_at=now - timedelta(days=n % 4) if n % 3 else None)
+            for n in range(120)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [user['id'] for user in response.data['results']]
+            url, pages = response.data['next'], pages + 1
+        return ids, pages, response.data['previous']
+
+    def test_every_sort_visits_each_user_once_in_order(self):
+        for ordering, key in (('-order_count', lambda u: (-u.order_count, -u.id)),
+                              ('lifetime_value', lambda u: (u.lifetime_value, u.id)),
+                              ('-created_at', lambda u: (-u.created_at.timestamp(), -u.id))):
+            ids, pages, _ = self.walk(f'/api/auth/admin/users/?ordering={ordering}&page_size=25')
+            expected = [user.id for user in sorted(User.objects.all(), key=key)]
+            self.assertEqual(ids, expected, ordering)
+            self.assertEqual(pages, 5, ordering)
+
+    def test_users_without_orders_come_last_either_way(self):
+        for ordering, sign in (('last_order_at', 1), ('-last_order_at', -1)):
+            ids, pages, _ = self.walk(f'/api/auth/admin/users/?ordering={ordering}&page_size=25')
+            users = User.objects.all()
+            dated = sorted((u for u in users if u.last_order_at),
+                           key=lambda u: (sign * u.last_order_at.timestamp(), sign * u.id))
+            undated = sorted((u for u in users if not u.last_order_at), key=lambda u: sign * u.id)
+            self.assertEqual(ids, [user.id for user in dated + undated], ordering)
+            self.assertEqual(pages, 5, ordering)
+
+    def test_previous_links_walk_back_over_the_same_pages(self):
+        for ordering in ('-order_count', 'last_order_at', '-last_order_at'):
+            url = f'/api/auth/admin/users/?ordering={ordering}&page_size=25'
+            forward = []
+            while url:
+                response = self.client.get(url)
+                forward.append([user['id'] for user in response.data['results']])
+                url = response.data['next']
+
+            backward, url = [], response.data['previous']
+            while url:
+                response = self.client.get(url)
+                backward.append([user['id'] for user in response.data['results']])
+                url = response.data['previous']
+            self.assertEqual(backward[::-1], forward[:-1], ordering)
+
+    def test_bad_cursor_is_not_found(self):
+        response = self.client.get('/api/auth/admin/users/?cursor=bm9wZQ')
+        self.assertEqual(response.status_code, 404)
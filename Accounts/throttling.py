@@ -0,0 +1,156 @@
+# Accounts/throttling.py
+"""
+Sliding-window rate limits shared by every worker.
+
+Each throttle counts requests per identity (client IP, user id or submitted
+email) in fixed windows and estimates the sliding window as
+``previous * overlap + current``. Counting must be atomic, so with
+``THROTTLE_STORE = "database"`` each check is one
+``INSERT ... ON CONFLICT DO UPDATE SET count = count + 1 ... RETURNING``
+on the ``ThrottleCounter`` row of that identity (which also rolls the
+window over), and with ``"cache"`` (Redis) it is ``INCR`` on ``throttle:``
+keys. The database cache's ``incr`` is a read followed by a write, so it
+is not used for this.
+
+Rates are configured per view scope in
+``REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]`` as ``"<scope>_<kind>"``, e.g.
+``"login_ip": "30/min"``. A scope/kind without a rate is not limited.
+DRF checks throttles before the handler runs, so throttled logins never
+reach password hashing or an outbound call.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .models import ThrottleCounter
+
+
+def _count_in_database(key, bucket, period):
+    """Count one request; returns ``(current, previous)`` window counts."""
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {quote(ThrottleCounter._meta.db_table)} AS c (key, bucket, count, previous, expires_at)
+            VALUES (%s, %s, 1, 0, now() + %s * interval '1 second')
+            ON CONFLICT (key) DO UPDATE SET
+                count = CASE WHEN c.bucket = EXCLUDED.bucket THEN c.count + 1 ELSE 1 END,
+                previous = CASE WHEN c.bucket = EXCLUDED.bucket THEN c.previous
+                                WHEN c.bucket = EXCLUDED.bucket - 1 THEN c.count
+                                ELSE 0 END,
+                bucket = EXCLUDED.bucket,
+                expires_at = EXCLUDED.expires_at
+            RETURNING count, previous
+            """,
+            [key, bucket, period * 2],
+        )
+        return cursor.fetchone()
+
+
+def _count_in_cache(key, bucket, period):
+    current_key = f"{key}:{bucket}"
+    cache.add(current_key, 0, period * 2)
+    try:
+        current = cache.incr(current_key)
+    except ValueError:  # expired between add and incr
+        cache.set(current_key, 1, period * 2)
+        current = 1
+    return current, cache.get(f"{key}:{bucket - 1}", 0)
+
+
+COUNTERS = {"database": _count_in_database, "cache": _count_in_cache}
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    kind = None
+
+    def get_identity(self, request):
+        """Return the string to count against, or None to skip this throttle."""
+        raise NotImplementedError
+
+    def get_rate(self, view):
+        scope = getattr(view, "throttle_scope", None)
+        if not scope:
+            return None, None
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(f"{scope}_{self.kind}")
+        if not rate:
+            return None, None
+        num, period = rate.split("/")
+        seconds = {"s": 1, "m": 60, "h": 3600, "d": 86400}[period[0]]
+        return f"{scope}_{self.kind}", (int(num), seconds)
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        name, rate = self.get_rate(view)
+        identity = self.get_identity(request) if rate else None
+        if identity is None:
+            return True
+
+        limit, period = rate
+        now = time.time()
+        count = COUNTERS[settings.THROTTLE_STORE]
+        current, previous = count(f"throttle:{name}:{identity}", int(now // period), period)
+
+        overlap = 1 - (now % period) / period
+        if previous * overlap + current <= limit:
+            return True
+
+        self.wait_seconds = period - (now % period)
+        return False
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class IPThrottle(SlidingWindowThrottle):
+    """Per client IP (honours REST_FRAMEWORK["NUM_PROXIES"])."""
+    kind = "ip"
+
+    def get_identity(self, request):
+        return self.get_ident(request)
+
+
+class UserThrottle(SlidingWindowThrottle):
+    """Per authenticated user; anonymous requests are left to IPThrottle."""
+    kind = "user"
+
+    def get_identity(self, request):
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            return None
+        return str(user.pk)
+
+
+class EmailThrottle(SlidingWindowThrottle):
+    """Per email in the request body, so one account can't be hammered from many IPs."""
+    kind = "email"
+
+    def get_identity(self, request):
+        data = getattr(request, "data", None) or {}
+        email = str(data.get("email") or "").strip().lower()
+        if not email:
+            return None
+        return hashlib.sha256(email.encode()).hexdigest()[:32]
+
+
+class _ScopedView:
+    def __init__(self, scope):
+        self.throttle_scope = scope
+
+
+def check_throttles(request, scope, throttle_classes):
+    """
+    Run throttles outside DRF (the async views). Returns None when allowed,
+    otherwise the seconds to wait (possibly None).
+    """
+    view = _ScopedView(scope)
+    for throttle_class in throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            return throttle.wait() or 0
+    return None
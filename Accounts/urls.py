@@ -1,4 +1,7 @@
+from django.conf import settings
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     RegisterView, 
     LoginView, 
@@ -10,20 +13,32 @@ from .views import (
     AdminUserListView,
     AdminBlockUserView,
     AdminUpdateRoleView,
+    AdminBulkModerateUsersView,
     PasswordResetRequestView,
     PasswordResetConfirmView
     
 )
+from .async_views import AsyncGoogleAuthView, AsyncFirebasePhoneAuthView
+
+# ASGI deployments serve the Google/Firebase logins natively async (Accounts/async_views.py)
+if settings.ASYNC_OUTBOUND_VIEWS:
+    google_view = csrf_exempt(AsyncGoogleAuthView.as_view())
+    firebase_view = csrf_exempt(AsyncFirebasePhoneAuthView.as_view())
+else:
+    google_view = GoogleAuthView.as_view()
+    firebase_view = FirebasePhoneAuthView.as_view()
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    # Uses SIMPLE_JWT["TOKEN_REFRESH_SERIALIZER"] (in-memory revocation check)
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     
     # REFRESH LOGIC
     path('profile/', UserProfileView.as_view(), name='user-profile'),
-    path('google/', GoogleAuthView.as_view(), name='google-auth'),
-    path('firebase/', FirebasePhoneAuthView.as_view(), name='firebase_auth'),
+    path('google/', google_view, name='google-auth'),
+    path('firebase/', firebase_view, name='firebase_auth'),
     path('admin/stats/', AdminDashboardStatsView.as_view(), name='admin-stats'),
     
     path('password-reset-request/', PasswordResetRequestView.as_view(), name='password-reset-request'),
@@ -32,4 +47,5 @@ urlpatterns = [
     path('admin/users/', AdminUserListView.as_view(), name='admin-users-list'),
     path('admin/users/<int:pk>/block/', AdminBlockUserView.as_view(), name='admin-user-block'),
     path('admin/users/<int:pk>/role/', AdminUpdateRoleView.as_view(), name='admin-user-role'),
+    path('admin/users/bulk/', AdminBulkModerateUsersView.as_view(), name='admin-users-bulk'),
 ]
\ No newline at end of file
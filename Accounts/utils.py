@@ -1,17 +1,28 @@
 # Accounts/utils.py
 import random
-from django.core.mail import EmailMessage
 from django.core.cache import cache
-from django.conf import settings
+from jobs.queue import enqueue
+
+OTP_TIMEOUT = 300
+
+# A code that can't reach the user within its lifetime is useless, so OTP
+# mails get few retries (the worker also drops them once the code expired)
+OTP_MAX_ATTEMPTS = 3
+
 
 def send_otp_email(email):
     # 1. Generate a random 6-digit number
     otp_code = str(random.randint(100000, 999999))
     
     # 2. Store in Cache (Key: "otp_user@email.com", Value: "123456", Timeout: 300s)
-    cache.set(f'otp_{email}', otp_code, timeout=300)
+    cache.set(f'otp_{email}', otp_code, timeout=OTP_TIMEOUT)
     
-    # 3. Send the Email
+    # 3. Queue the Email (sent by `manage.py run_worker`). Only the address is
+    # stored in the job; the worker reads the code from the cache when it sends.
+    enqueue('otp_email', {'email': email}, max_attempts=OTP_MAX_ATTEMPTS)
+
+
+def otp_message(email, otp_code):
     subject = "Reset Your Password - Horologie"
     message = f"""
     Hi there,
@@ -23,11 +34,4 @@ def send_otp_email(email):
     This code expires in 5 minutes.
     If you did not request this, please ignore this email.
     """
-    
-    email_msg = EmailMessage(
-        subject=subject,
-        body=message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        to=[email]
-    )
-    email_msg.send()
\ No newline at end of file
+    return {'subject': subject, 'body': message, 'to': [email]}
@@ -1,9 +1,7 @@
-import os
-import requests 
+import outbound
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
 from django.shortcuts import get_object_or_404
-from rest_framework import status, permissions, generics
+from rest_framework import status, permissions, generics, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
@@ -18,12 +16,18 @@ from firebase_admin import auth as firebase_auth
 # Import Serializers
 from .serializers import (
     RegisterSerializer, 
-    UserSerializer, 
+    user_payload,
     AdminUserSerializer,
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer
 )
 
+from .google import GOOGLE_ERRORS, InvalidGoogleToken, google_identity
+from .moderation import moderate_users, select_users
+from .pagination import UserKeysetPagination
+from .revocation import RevocableRefreshToken
+from .throttling import EmailThrottle, IPThrottle
+
 # Import Utils for OTP Email
 from .utils import send_otp_email
 
@@ -35,6 +39,7 @@ except ImportError:
 
 try:
     from orders.models import Order
+    from orders.rollups import totals
 except ImportError:
     Order = None
 
@@ -58,16 +63,16 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         if not self.user.is_active:
             raise AuthenticationFailed("This account is inactive.")
 
-        # 3. Add User Data to Response
-        user_data = UserSerializer(self.user).data
-        user_data['is_staff'] = self.user.is_staff
-        user_data['is_superuser'] = self.user.is_superuser
-        data["user"] = user_data
+        # 3. Add User Data to Response (lean: cart summary only)
+        data["user"] = user_payload(self.user, self.context.get('request'))
 
         return data
 
 class LoginView(TokenObtainPairView):
     permission_classes = [AllowAny]
+    # Checked before the serializer runs, i.e. before any password hashing
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'login'
     serializer_class = CustomTokenObtainPairSerializer
 
 
@@ -76,6 +81,8 @@ class LoginView(TokenObtainPairView):
 # ==========================================
 class GoogleAuthView(APIView):
     permission_classes = [AllowAny] 
+    throttle_classes = [IPThrottle]
+    throttle_scope = 'google'
 
     def post(self, request):
         data = request.data
@@ -84,19 +91,24 @@ class GoogleAuthView(APIView):
         if not token:
             return Response({"error": "Token missing"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Validate with Google
-        user_info_url = os.getenv('GOOGLE_USER_INFO_URL', "https://www.googleapis.com/oauth2/v3/userinfo")
-        response = requests.get(user_info_url, params={"access_token": token})
-
-        if not response.ok:
+        # Verify locally (ID token) or via userinfo (access token), see Accounts/google.py
+        try:
+            user_data_google = google_identity(token)
+        except InvalidGoogleToken as e:
             return Response(
-                {"error": "Failed to validate token with Google", "details": response.json()},
+                {"error": "Failed to validate token with Google", "details": str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        except (*GOOGLE_ERRORS, outbound.OutboundError):
+            return Response(
+                {"error": "Google sign-in is temporarily unavailable"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
 
-        user_data_google = response.json()
         email = user_data_google.get("email")
-        
+        if not email:
+            return Response({"error": "Google account has no email"}, status=status.HTTP_400_BAD_REQUEST)
+
         # Get or Create User
         user, created = User.objects.get_or_create(
             email=email,
@@ -116,9 +128,7 @@ class GoogleAuthView(APIView):
         
         # Generate Token
         refresh = RefreshToken.for_user(user)
-        serialized_user = UserSerializer(user).data
-        serialized_user['is_staff'] = user.is_staff
-        serialized_user['is_superuser'] = user.is_superuser
+        serialized_user = user_payload(user, request)
 
         return Response({
             "access": str(refresh.access_token),
@@ -132,6 +142,8 @@ class GoogleAuthView(APIView):
 # ==========================================
 class FirebasePhoneAuthView(APIView):
     permission_classes = [AllowAny]
+    throttle_classes = [IPThrottle]
+    throttle_scope = 'firebase'
 
     def post(self, request):
         id_token = request.data.get('id_token')
@@ -165,9 +177,7 @@ class FirebasePhoneAuthView(APIView):
 
             # Generate Token
             refresh = RefreshToken.for_user(user)
-            serialized_user = UserSerializer(user).data
-            serialized_user['is_staff'] = user.is_staff
-            serialized_user['is_superuser'] = user.is_superuser
+            serialized_user = user_payload(user, request)
             
             return Response({
                 'access': str(refresh.access_token),
@@ -209,8 +219,7 @@ class UserProfileView(APIView):
                  status=status.HTTP_403_FORBIDDEN
              )
              
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        return Response(user_payload(request.user, request))
 
 
 # ==========================================
@@ -225,7 +234,8 @@ class LogoutView(APIView):
             if not refresh_token:
                 raise AuthenticationFailed("Refresh token is required")
 
-            token = RefreshToken(refresh_token)
+            # Blacklists in the DB and updates the in-memory revoked set
+            token = RevocableRefreshToken(refresh_token)
             token.blacklist()
 
             return Response({"message": "Logged out successfully"}, status=status.HTTP_200_OK)
@@ -239,6 +249,9 @@ class LogoutView(APIView):
 class PasswordResetRequestView(generics.GenericAPIView):
     serializer_class = PasswordResetRequestSerializer
     permission_classes = [AllowAny]
+    # Each accepted call sends an email
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'password_reset'
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -256,6 +269,9 @@ class PasswordResetRequestView(generics.GenericAPIView):
 class PasswordResetConfirmView(generics.GenericAPIView):
     serializer_class = PasswordResetConfirmSerializer
     permission_classes = [AllowAny]
+    # Caps OTP guessing per email
+    throttle_classes = [IPThrottle, EmailThrottle]
+    throttle_scope = 'password_reset_confirm'
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -273,12 +289,8 @@ class AdminDashboardStatsView(APIView):
     def get(self, request):
         total_users = User.objects.filter(is_staff=False).count()
         total_products = Product.objects.count() if Product else 0
-        total_orders = Order.objects.count() if Order else 0
-        
-        total_revenue = 0
-        if Order:
-            revenue_data = Order.objects.aggregate(Sum('total_price'))
-            total_revenue = revenue_data.get('total_price__sum') or 0
+        # Order totals come from the daily rollups, not a scan of every order
+        total_orders, total_revenue = totals() if Order else (0, 0)
 
         return Response({
             "total_users": total_users,
@@ -292,12 +304,29 @@ class AdminDashboardStatsView(APIView):
 # 9. ADMIN: User Management
 # ==========================================
 class AdminUserListView(generics.ListAPIView):
+    """
+    ?search=  email / first name / last name / phone (trigram indexed)
+    ?ordering=  order_count, lifetime_value, last_order_at, created_at (prefix - for desc)
+    """
     permission_classes = [IsAdminUser]
     serializer_class = AdminUserSerializer
-    # Using 'created_at' as per your custom user model
-    queryset = User.objects.all().order_by('-created_at')
+    pagination_class = UserKeysetPagination
+    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    search_fields = ['email', 'first_name', 'last_name', 'phone_number']
+    ordering_fields = ['order_count', 'lifetime_value', 'last_order_at', 'created_at']
+    ordering = ('-created_at',)  # ties are broken by id in UserKeysetPagination
+
+    def get_queryset(self):
+        # Using 'created_at' as per your custom user model; users without
+        # orders (last_order_at NULL) come last in that sort
+        return User.objects.all()
 
 class AdminBlockUserView(APIView):
+    """
+    Toggle a user's blocked state. A blocked user's refresh tokens are
+    blacklisted and their access tokens refused by every server process
+    within TOKEN_REVOCATION_WATERMARK_SECONDS (1s by default).
+    """
     permission_classes = [IsAdminUser]
 
     def patch(self, request, pk):
@@ -306,11 +335,11 @@ class AdminBlockUserView(APIView):
         if user == request.user:
             return Response({"error": "You cannot block yourself"}, status=400)
 
-        # Toggle Blocked State
-        user.is_blocked = not user.is_blocked
-        # Sync is_active to immediately kill standard sessions
-        user.is_active = not user.is_blocked 
-        user.save()
+        # Toggle Blocked State (is_active follows it); same path as bulk
+        # moderation, so tokens are revoked everywhere too
+        action = 'unblock' if user.is_blocked else 'block'
+        moderate_users(action, User.objects.filter(pk=user.pk), request.user)
+        user.refresh_from_db()
         
         return Response(AdminUserSerializer(user).data)
 
@@ -331,4 +360,48 @@ class AdminUpdateRoleView(APIView):
             user.is_superuser = False
         
         user.save()
-        return Response(AdminUserSerializer(user).data)
\ No newline at end of file
+        return Response(AdminUserSerializer(user).data)
+
+
+# ==========================================
+# 10. ADMIN: Bulk User Moderation
+# ==========================================
+class AdminBulkModerateUsersView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        """
+        {"action": "block" | "unblock" | "make_admin" | "make_user",
+         "ids": [1, 2, 3]}                        -- or --
+         "filter": {"email_domain": "spam.io", "created_after": "2026-10-18"}}
+
+        -> {"action": ..., "updated": 2, "results": [{"id": 1, "result": "updated"}, ...]}
+           result: updated | unchanged | not_found | skipped_self (ids requests
+           list each id once, in request order; filters list the updated users)
+
+        Blocked users are refused by every server process within
+        TOKEN_REVOCATION_WATERMARK_SECONDS (1s by default).
+        """
+        action = request.data.get("action")
+        queryset, ids = select_users(request.data.get("ids"), request.data.get("filter"))
+        existing = set(queryset.values_list("id", flat=True)) if ids is not None else None
+
+        changed = moderate_users(action, queryset, request.user)
+
+        if ids is None:
+            results = [{"id": user_id, "result": "updated"} for user_id in changed]
+            return Response({"action": action, "updated": len(changed), "results": results})
+
+        changed = set(changed)
+        results = []
+        for user_id in dict.fromkeys(ids):
+            if user_id not in existing:
+                result = "not_found"
+            elif user_id == request.user.pk:
+                result = "skipped_self"
+            elif user_id in changed:
+                result = "updated"
+            else:
+                result = "unchanged"
+            results.append({"id": user_id, "result": result})
+        return Response({"action": action, "updated": len(changed), "results": results})
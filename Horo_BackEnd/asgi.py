@@ -2,6 +2,8 @@
 ASGI config for Horo_BackEnd project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; the `/ws/orders/` WebSocket (live order status) is
+handled by ``orders.consumers``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -13,4 +15,23 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Horo_BackEnd.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up (it touches models)
+from orders.consumers import order_events  # noqa: E402
+
+WEBSOCKET_ROUTES = {
+    '/ws/orders/': order_events,
+}
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        handler = WEBSOCKET_ROUTES.get(scope['path'])
+        if handler is None:
+            await receive()  # websocket.connect
+            await send({'type': 'websocket.close', 'code': 4404})
+            return
+        return await handler(scope, receive, send)
+
+    return await django_application(scope, receive, send)
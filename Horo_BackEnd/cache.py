@@ -0,0 +1,240 @@
+# Horo_BackEnd/cache.py
+"""
+Two-level cache backend.
+
+``TieredCache`` puts a small per-process ``LocMemCache`` (L1, short TTL) in
+front of a cache shared by every worker and node (L2: the database cache
+table, or Redis when ``REDIS_URL`` is set). Reads are served from L1 when
+possible, so a value written by another process can be up to
+``L1_TIMEOUT`` seconds stale there.
+
+Keys that must be consistent everywhere (OTPs, throttles, the revocation
+watermark, read-modify-write data such as carts) are listed in
+``BYPASS_PREFIXES`` and always go straight to L2.
+
+``ROUTES`` sends key prefixes to other L2 aliases. The database cache
+culls in key order once it is full, so a flood of throttle keys would
+evict OTPs, carts and the revocation watermark if they shared a table;
+those live in a ``DurableDatabaseCache`` instead, and throttles in a table
+of their own.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'Horo_BackEnd.cache.TieredCache',
+            'OPTIONS': {
+                'SHARED': 'shared',           # alias of the L2 cache
+                'ROUTES': {'otp_': 'state'},  # prefix -> alias, instead of SHARED
+                'L1_TIMEOUT': 5,
+                'L1_MAX_ENTRIES': 1000,
+                'BYPASS_PREFIXES': ['otp_'],
+            },
+        },
+        'shared': {...},
+        'state': {'BACKEND': 'Horo_BackEnd.cache.DurableDatabaseCache', ...},
+    }
+"""
+import base64
+import pickle
+from collections import defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.db import connections, router
+
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        self.routes = tuple(options.get('ROUTES', {}).items())
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.bypass_prefixes = tuple(options.get('BYPASS_PREFIXES', ()))
+        self.l1 = LocMemCache(
+            f'tiered-l1-{id(self)}',
+            {'TIMEOUT': self.l1_timeout, 'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)}},
+        )
+
+    @property
+    def l2(self):
+        return caches[self.shared_alias]
+
+    def _l2(self, key):
+        key = str(key)
+        for prefix, alias in self.routes:
+            if key.startswith(prefix):
+                return caches[alias]
+        return self.l2
+
+    def _l2_groups(self, keys):
+        groups = defaultdict(list)
+        for key in keys:
+            groups[self._l2(key)].append(key)
+        return groups.items()
+
+    def _all_l2(self):
+        return {self.l2, *(caches[alias] for _, alias in self.routes)}
+
+    def _local(self, key):
+        return not str(key).startswith(self.bypass_prefixes)
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    # ---- reads ----
+    def get(self, key, default=None, version=None):
+        if not self._local(key):
+            return self._l2(key).get(key, default, version=version)
+
+        value = self.l1.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            return value
+
+        value = self._l2(key).get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self.l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = self.l1.get(key, _MISSING, version=version) if self._local(key) else _MISSING
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+
+        for l2, keys in self._l2_groups(remaining):
+            fetched = l2.get_many(keys, version=version)
+            for key, value in fetched.items():
+                if self._local(key):
+                    self.l1.set(key, value, self.l1_timeout, version=version)
+            found.update(fetched)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    # ---- writes (L2 first, then refresh or drop the local copy) ----
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l2(key).set(key, value, timeout, version=version)
+        if self._local(key) and timeout != 0:
+            self.l1.set(key, value, self._l1_timeout(timeout), version=version)
+        else:
+            self.l1.delete(key, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self._l2(key).add(key, value, timeout, version=version)
+        self.l1.delete(key, version=version)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = []
+        for l2, keys in self._l2_groups(data):
+            failed += l2.set_many({key: data[key] for key in keys}, timeout, version=version)
+        for key, value in data.items():
+            if self._local(key) and key not in failed and timeout != 0:
+                self.l1.set(key, value, self._l1_timeout(timeout), version=version)
+            else:
+                self.l1.delete(key, version=version)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2(key).touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(key, version=version)
+        return self._l2(key).delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l1.delete_many(keys, version=version)
+        for l2, routed in self._l2_groups(keys):
+            l2.delete_many(routed, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(key, version=version)
+        return self._l2(key).incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self.l1.delete(key, version=version)
+        return self._l2(key).decr(key, delta, version=version)
+
+    def clear(self):
+        self.l1.clear()
+        for l2 in self._all_l2():
+            l2.clear()
+
+    def close(self, **kwargs):
+        for l2 in self._all_l2():
+            l2.close(**kwargs)
+
+
+class DurableDatabaseCache(DatabaseCache):
+    """
+    ``DatabaseCache`` that never evicts live entries: once over
+    ``MAX_ENTRIES`` it only deletes expired rows, where the stock backend
+    goes on to drop a slice of keys in key order.
+    """
+
+    def _cull(self, db, cursor, now, num):
+        connection = connections[db]
+        cursor.execute(
+            f"DELETE FROM {connection.ops.quote_name(self._table)} WHERE {connection.ops.quote_name('expires')} < %s",
+            [connection.ops.adapt_datetimefield_value(now)],
+        )
+
+
+_REDIS_DELETE_IF_EQUAL = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def delete_if_equal(cache, key, value, version=None):
+    """
+    Delete ``key`` only while it still holds ``value``; returns whether it
+    did. Used to release locks taken with ``add``: a holder whose lock has
+    expired must not delete the one another request took since.
+
+    Atomic on the database cache (one conditional DELETE) and on Redis (a
+    Lua script); other backends fall back to get-then-delete.
+    """
+    if isinstance(cache, TieredCache):
+        cache.l1.delete(key, version=version)
+        return delete_if_equal(cache._l2(key), key, value, version=version)
+
+    if isinstance(cache, DatabaseCache):
+        key = cache.make_and_validate_key(key, version=version)
+        connection = connections[router.db_for_write(cache.cache_model_class)]
+        quote_name = connection.ops.quote_name
+        # Stored the way DatabaseCache._base_set encodes values
+        encoded = base64.b64encode(pickle.dumps(value, cache.pickle_protocol)).decode('latin1')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {quote_name(cache._table)} "
+                f"WHERE {quote_name('cache_key')} = %s AND {quote_name('value')} = %s",
+                [key, encoded],
+            )
+            return bool(cursor.rowcount)
+
+    if isinstance(cache, RedisCache):
+        key = cache.make_and_validate_key(key, version=version)
+        client = cache._cache.get_client(key, write=True)
+        return bool(client.eval(_REDIS_DELETE_IF_EQUAL, 1, key, cache._cache._serializer.dumps(value)))
+
+    if cache.get(key, version=version) != value:
+        return False
+    return cache.delete(key, version=version)
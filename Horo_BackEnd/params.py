@@ -0,0 +1,29 @@
+# Horo_BackEnd/params.py
+"""Request parameter parsing shared by the apps' list filters."""
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def parse_moment(name, value):
+    """
+    Accept `2026-01-31` or a full ISO datetime (naive ones are in the current
+    time zone). Returns (datetime, is_date); malformed or impossible values
+    (2026-02-30) raise a ValidationError on ``name``.
+    """
+    # Both parsers raise ValueError for well-formed but impossible values
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError
+            return timezone.make_aware(datetime.combine(day, time.min)), True
+    except ValueError:
+        raise ValidationError({name: "Use YYYY-MM-DD or an ISO 8601 datetime."})
+
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment, False
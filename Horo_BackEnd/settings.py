@@ -7,6 +7,7 @@ Generated by 'django-admin startproject' using Django 6.0.
 from pathlib import Path
 import os
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv # Import dotenv
 
 # Load environment variables from .env file
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
 
     # Third-party
     'corsheaders',
@@ -55,6 +57,8 @@ INSTALLED_APPS = [
     'wishlist',
     'drf_yasg',
     'orders',
+    'jobs',
+    'outbound',
     "cloudinary",
     "cloudinary_storage",
 ]
@@ -63,6 +67,12 @@ INSTALLED_APPS = [
 # Stripe Settings
 STRIPE_PUBLIC_KEY = os.getenv('STRIPE_PUBLIC_KEY')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
+# Signing secret of the /api/orders/webhooks/stripe/ endpoint
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET')
+# Point at a local stub (e.g. stripe-mock) for development and tests
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE')
+# An unchanged cart reuses its open PaymentIntent without calling Stripe for this long
+PAYMENT_INTENT_REUSE_SECONDS = 60 * 60
 
 # Cloudinary Settings
 CLOUDINARY_STORAGE = {
@@ -94,6 +104,9 @@ MIDDLEWARE = [
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
+# Checkout retries send an Idempotency-Key header (see orders/idempotency.py)
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 
 ROOT_URLCONF = 'Horo_BackEnd.urls'
 
@@ -175,21 +188,144 @@ AUTHENTICATION_BACKENDS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWTAuthentication + per-process user cache (see Accounts/authentication.py)
+        "Accounts.authentication.CachedJWTAuthentication",
     ),
+    # Sliding-window limits per view scope and identity (Accounts/throttling.py)
+    "DEFAULT_THROTTLE_RATES": {
+        "login_ip": "30/min",
+        "login_email": "10/min",
+        "google_ip": "30/min",
+        "firebase_ip": "30/min",
+        "password_reset_ip": "10/hour",
+        "password_reset_email": "3/hour",
+        "password_reset_confirm_ip": "30/hour",
+        "password_reset_confirm_email": "10/hour",
+        "payment_intent_user": "20/min",
+        "payment_intent_ip": "60/min",
+    },
+    # Client IP = last X-Forwarded-For hop added by our proxy (nginx)
+    "NUM_PROXIES": int(os.getenv('NUM_PROXIES', '1')),
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
+    # Revoked refresh tokens are checked in memory (see Accounts/revocation.py)
+    "TOKEN_REFRESH_SERIALIZER": "Accounts.revocation.RevocableTokenRefreshSerializer",
 }
+# How often each process reads the shared-cache revocation watermark: logouts
+# reach the other processes within this, and checks in between cost nothing
+TOKEN_REVOCATION_WATERMARK_SECONDS = 1
+# Upper bound on how stale another process's revoked-token set can get if
+# the shared-cache watermark is lost
+TOKEN_REVOCATION_REFRESH_SECONDS = 30
+# Backstop for blacklist rows that commit too late for the incremental load
+TOKEN_REVOCATION_FULL_RELOAD_SECONDS = 600
+
+# Authenticated users cached per process (Accounts/authentication.py). A
+# save drops the user in the saving process at once; other processes see
+# blocks/role changes within AUTH_USER_CACHE_POLL_SECONDS. The TTL only
+# bounds memory/staleness of fields that don't bump User.updated_at.
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 300
+AUTH_USER_CACHE_POLL_SECONDS = 2
 
 # CACHE SETTINGS
+# 'default' is a small per-process L1 in front of the shared cache below
+# (see Horo_BackEnd/cache.py). Keys with these prefixes must look the same
+# in every worker, so they skip L1 and always hit the shared cache.
+CACHE_BYPASS_L1_PREFIXES = [
+    'otp_',             # password reset OTPs (Accounts/utils.py)
+    'throttle:',        # rate limit counters when THROTTLE_STORE = 'cache'
+    'auth_revoked:',    # revoked-token watermark (Accounts/revocation.py)
+    'cart:',            # CacheCartStore carts + per-cart locks
+]
+
+# Keys that must never be evicted go to 'state', away from whatever fills
+# 'shared' (DatabaseCache culls in key order once MAX_ENTRIES is reached).
+CACHE_ROUTES = {
+    'otp_': 'state',
+    'auth_revoked:': 'state',
+    'cart:': 'state',
+}
+
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+    # A Redis that evicts under memory pressure (allkeys-*/volatile-*) would
+    # drop these too; point REDIS_STATE_URL at one with maxmemory-policy noeviction
+    STATE_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_STATE_URL', REDIS_URL),
+    }
+else:
+    # Needs `python manage.py createcachetable` (run by the deploy workflow)
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+    # Only expired rows are ever deleted once MAX_ENTRIES is passed
+    STATE_CACHE = {
+        'BACKEND': 'Horo_BackEnd.cache.DurableDatabaseCache',
+        'LOCATION': 'django_cache_state',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'Horo_BackEnd.cache.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'ROUTES': CACHE_ROUTES,
+            'L1_TIMEOUT': 5,
+            'L1_MAX_ENTRIES': 1000,
+            'BYPASS_PREFIXES': CACHE_BYPASS_L1_PREFIXES,
+        },
+    },
+    'shared': SHARED_CACHE,
+    'state': STATE_CACHE,
 }
 
+# Where rate-limit counters live (Accounts/throttling.py): Redis INCR when
+# there is a Redis, else an upserted row per identity in Accounts_throttlecounter
+# (purge it with `manage.py purge_throttle_counters`)
+THROTTLE_STORE = 'cache' if REDIS_URL else 'database'
+
+# Cart Storage
+# 'cart.stores.CacheCartStore' keeps carts in the cache below and needs a cache
+# shared by every worker; run `manage.py flush_carts --loop` alongside it.
+CART_STORE = os.getenv('CART_STORE', 'cart.stores.ORMCartStore')
+CART_CACHE_ALIAS = 'default'
+CART_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+# Carts idle longer than this are removed by `manage.py purge_carts`
+CART_RETENTION_DAYS = int(os.getenv('CART_RETENTION_DAYS', '30'))
+
+# Idempotency-Key responses are replayed for this long, then removed by
+# `manage.py purge_idempotency_keys` (Stripe keeps its own keys for 24 hours)
+IDEMPOTENCY_KEY_RETENTION_HOURS = int(os.getenv('IDEMPOTENCY_KEY_RETENTION_HOURS', '24'))
+
+# Live Order Updates (`/ws/orders/`, served by Horo_BackEnd/asgi.py)
+# LocalBroker only reaches sockets in the same process (dev/tests)
+ORDER_EVENTS_BROKER = 'orders.events.LocalBroker'
+
+# Outbound Calls (see outbound/client.py)
+# Per-provider timeout, retries, bulkhead size and circuit breaker settings
+OUTBOUND_PROVIDERS = {
+    'stripe': {'timeout': 10, 'retries': 0, 'max_concurrent': 10},  # stripe-python retries itself
+    'cloudinary': {'timeout': 30, 'retries': 0, 'max_concurrent': 4},
+    'smtp': {'timeout': 10, 'retries': 0, 'max_concurrent': 2},  # the job queue retries mail
+    'google': {'timeout': 5, 'retries': 2, 'max_concurrent': 10},
+}
+
+# Serve the Google/Firebase logins and PaymentIntent creation from async
+# views. Only worth it under an ASGI server (see deploy/); under WSGI each
+# async view just runs in its own event loop.
+ASYNC_OUTBOUND_VIEWS = os.getenv('ASYNC_OUTBOUND_VIEWS', 'False') == 'True'
+
 # Email Settings
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -198,9 +334,17 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = 'Horologie@horo.com'
+EMAIL_TIMEOUT = OUTBOUND_PROVIDERS['smtp']['timeout']
+
+# Background Jobs (`manage.py run_worker`)
+# Failed jobs are retried after base * 2^(attempt - 1) seconds (with jitter), capped at max
+JOBS_RETRY_BASE_SECONDS = 30
+JOBS_RETRY_MAX_SECONDS = 60 * 60
 
 
-# GOOGLE_CLIENT_ID = "..." (Ideally move this to .env as well if you uncomment it)
+# Google Sign-In: OAuth client id(s), comma separated (web, iOS, Android).
+# ID tokens for these audiences are verified locally; unset = userinfo only
+GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID', '')
 
 # Firebase Settings (Commented out)
 # import firebase_admin
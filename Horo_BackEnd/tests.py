@@ -0,0 +1,178 @@
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+
+from Accounts.serializers import PasswordResetConfirmSerializer
+from Accounts.utils import send_otp_email
+from .cache import TieredCache, delete_if_equal
+
+
+def rows(alias):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(caches[alias]._table)}")
+        return cursor.fetchone()[0]
+
+
+def tiered(l1_timeout=5):
+    """A TieredCache as another worker process would build it from settings."""
+    options = dict(settings.CACHES['default']['OPTIONS'], L1_TIMEOUT=l1_timeout)
+    return TieredCache('', {'OPTIONS': options})
+
+
+def in_workers(target, *args, count=1):
+    """
+    Run ``target(*args)`` in ``count`` forked processes at once, like gunicorn
+    workers: each opens its own database connection. Returns their results.
+    """
+    connections.close_all()  # a connection must not be shared across a fork
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+
+    def work():
+        try:
+            results.put(target(*args))
+        except BaseException as e:
+            results.put(e)
+        finally:
+            connections.close_all()
+
+    workers = [context.Process(target=work) for _ in range(count)]
+    for worker in workers:
+        worker.start()
+    outcome = [results.get(timeout=30) for _ in workers]
+    for worker in workers:
+        worker.join(30)
+    for result in outcome:
+        if isinstance(result, BaseException):
+            raise result
+    return outcome
+
+
+def request_otp(email):
+    send_otp_email(email)
+    return cache.get(f'otp_{email}')
+
+
+def confirm_otp(email, otp):
+    serializer = PasswordResetConfirmSerializer(data={'email': email, 'otp': otp, 'new_password': 'new-password-1'})
+    return serializer.is_valid()
+
+
+def add_lock(barrier):
+    token = f'worker-{os.getpid()}'
+    barrier.wait(10)
+    return token, tiered().add('cart:lock:7', token, 30)
+
+
+class CrossProcessCacheTests(TransactionTestCase):
+    """Real worker processes sharing the database cache."""
+
+    def setUp(self):
+        self.addCleanup(caches['default'].clear)
+
+    def test_otp_requested_in_one_worker_is_accepted_by_another(self):
+        [otp] = in_workers(request_otp, 'reset@example.com')
+        self.assertEqual(in_workers(confirm_otp, 'reset@example.com', otp), [True])
+        wrong = '000000' if otp != '000000' else '111111'
+        self.assertEqual(in_workers(confirm_otp, 'reset@example.com', wrong), [False])
+
+    def test_add_is_won_by_exactly_one_worker(self):
+        workers = 4
+        barrier = multiprocessing.get_context('fork').Barrier(workers)
+        results = in_workers(add_lock, barrier, count=workers)
+
+        winners = [token for token, added in results if added]
+        self.assertEqual(len(winners), 1, results)
+        self.assertEqual(caches['state'].get('cart:lock:7'), winners[0])
+
+
+class TieredCacheConsistencyTests(TestCase):
+    """Two TieredCache instances over one L2 stand in for two worker processes."""
+
+    def setUp(self):
+        self.a, self.b = tiered(l1_timeout=1), tiered(l1_timeout=1)
+        self.addCleanup(self.a.clear)
+
+    def test_bypassed_keys_are_seen_at_once_by_the_other_process(self):
+        for key in ('otp_user@example.com', 'cart:7', 'auth_revoked:watermark', 'throttle:login:1.2.3.4'):
+            self.a.set(key, 'first')
+            self.assertEqual(self.b.get(key), 'first', key)
+            self.a.set(key, 'second')
+            self.assertEqual(self.b.get(key), 'second', key)
+            self.a.delete(key)
+            self.assertIsNone(self.b.get(key), key)
+
+    def test_add_is_decided_by_the_shared_cache(self):
+        self.assertTrue(self.a.add('cart:lock:7', 'a', 30))
+        self.assertFalse(self.b.add('cart:lock:7', 'b', 30))
+        self.assertEqual(self.b.get('cart:lock:7'), 'a')
+
+    def test_delete_if_equal_only_releases_the_holders_lock(self):
+        self.assertTrue(self.a.add('cart:lock:7', 'token-a', 30))
+        self.assertFalse(delete_if_equal(self.b, 'cart:lock:7', 'token-b'))
+        self.assertEqual(self.b.get('cart:lock:7'), 'token-a')
+
+        self.assertTrue(delete_if_equal(self.b, 'cart:lock:7', 'token-a'))
+        self.assertIsNone(self.a.get('cart:lock:7'))
+
+    def test_other_process_l1_is_stale_for_at_most_l1_timeout(self):
+        self.a.set('products:home', 'v1')
+        self.assertEqual(self.b.get('products:home'), 'v1')
+
+        self.a.set('products:home', 'v2')
+        self.assertEqual(self.a.get('products:home'), 'v2')
+        self.assertEqual(self.b.get('products:home'), 'v1')  # b's L1 copy
+
+        time.sleep(1.1)
+        self.assertEqual(self.b.get('products:home'), 'v2')
+
+    def test_get_many_and_set_many_span_routes(self):
+        data = {'otp_a@example.com': 1, 'cart:7': 2, 'products:home': 3}
+        self.assertEqual(self.a.set_many(data), [])
+        self.assertEqual(self.b.get_many(list(data)), data)
+
+        self.assertEqual(caches['state'].get_many(['otp_a@example.com', 'cart:7']), {'otp_a@example.com': 1, 'cart:7': 2})
+        self.assertEqual(caches['shared'].get('products:home'), 3)
+
+
+class CacheCullingTests(TestCase):
+    """A full shared cache doesn't evict OTPs, carts or the revocation watermark."""
+
+    def setUp(self):
+        self.addCleanup(caches['default'].clear)
+
+    def shrink(self, alias, max_entries):
+        backend = caches[alias]
+        self.addCleanup(setattr, backend, '_max_entries', backend._max_entries)
+        backend._max_entries = max_entries
+
+    def test_flood_only_culls_the_shared_table(self):
+        for alias in ('shared', 'state'):
+            self.shrink(alias, 20)
+        cache = caches['default']
+        kept = {'otp_user@example.com': '123456', 'cart:7': {'3': 1}, 'auth_revoked:watermark': 'w'}
+        cache.set_many(kept, 600)
+
+        for n in range(100):
+            cache.set(f'products:page:{n}', [n], 600)
+
+        self.assertEqual(cache.get_many(list(kept)), kept)
+        self.assertLessEqual(rows('shared'), 21)  # culled down to MAX_ENTRIES
+
+    def test_state_cache_only_drops_expired_rows(self):
+        self.shrink('state', 20)
+        state = caches['state']
+        state.set_many({f'otp_old{n}@example.com': n for n in range(10)}, 1)
+        time.sleep(2)  # the backend stores expiry to the second
+
+        live = {f'cart:{n}': n for n in range(40)}
+        for key, value in live.items():
+            state.set(key, value, 600)
+
+        self.assertEqual(state.get_many(list(live)), live)
+        self.assertEqual(rows('state'), 40)  # the expired OTPs were culled, nothing else
@@ -36,6 +36,7 @@ urlpatterns = [
     path("api/cart/", include("cart.urls")),
     path("api/wishlist/", include("wishlist.urls")),
     path("api/orders/", include("orders.urls")),
+    path("api/outbound/", include("outbound.urls")),
     path('api/accounts/', include('Accounts.urls')),
 
     # ==========================================
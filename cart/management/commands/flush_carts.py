@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cart.stores import get_cart_store
+
+
+class Command(BaseCommand):
+    help = "Write cached carts back to Cart/CartItem (write-behind worker for CacheCartStore)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep running instead of flushing once.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between flushes with --loop.")
+
+    def handle(self, *args, **options):
+        store = get_cart_store()
+        if not hasattr(store, "flush_dirty"):
+            self.stdout.write(f"{type(store).__name__} writes straight to the database; nothing to flush.")
+            return
+
+        while True:
+            flushed = store.flush_dirty()
+            if flushed:
+                self.stdout.write(f"Flushed {flushed} cart(s)")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from products.models import Product
 
 
@@ -8,6 +9,12 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Supports the idle-cart scan in `manage.py purge_carts`
+            models.Index(fields=["updated_at"], name="cart_cart_updated_at_idx"),
+        ]
+
     def __str__(self):
         return f"Cart of {self.user}"
 
@@ -31,3 +38,12 @@ class CartItem(models.Model):
     @property
     def total_price(self):
         return self.product.price * self.quantity
+
+
+class DirtyCart(models.Model):
+    """Carts changed in CacheCartStore but not yet written back (see cart/stores.py)."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    marked_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Unflushed cart of user #{self.user_id}"
@@ -0,0 +1,338 @@
+# cart/stores.py
+"""
+Pluggable cart storage.
+
+``ORMCartStore`` (the default) reads and writes ``Cart``/``CartItem`` rows
+directly. ``CacheCartStore`` keeps each cart in a shared cache as a compact
+``{product_id: quantity}`` hash and writes it back to the database later,
+either from ``manage.py flush_carts`` (write-behind) or at checkout.
+Writers of one cart are serialised with a short lock taken via the atomic
+``cache.add`` (and released only by the request holding it), and changed carts are listed in the ``DirtyCart`` table, so
+concurrent requests never drop each other's changes.
+
+Pick the backend with ``settings.CART_STORE``.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F, Sum, prefetch_related_objects
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from Horo_BackEnd.cache import delete_if_equal
+from products.models import Product
+from .models import Cart, CartItem, DirtyCart
+from .serializers import CartSerializer, ProductMiniSerializer
+
+
+def _user_id(user):
+    return getattr(user, "pk", user)
+
+
+def _touch(user):
+    # CartItem writes don't hit Cart.updated_at on their own; keep it current
+    # so `purge_carts` only sees carts that are really idle.
+    Cart.objects.filter(user_id=_user_id(user)).update(updated_at=timezone.now())
+
+
+class BaseCartStore:
+    """
+    Interface used by the cart and checkout views.
+
+    ``item_id`` is whatever the store puts in the ``id`` of a rendered cart
+    line, so the update/remove URLs keep working for every backend.
+    """
+
+    def quantities(self, user):
+        """Return the cart as ``{product_id: quantity}``."""
+        raise NotImplementedError
+
+    def resolve_item(self, user, item_id):
+        """Return the product id behind a rendered cart line, or None."""
+        raise NotImplementedError
+
+    def set_quantity(self, user, product_id, quantity):
+        raise NotImplementedError
+
+    def add(self, user, product_id, quantity, limit):
+        """
+        Add ``quantity`` to the line atomically. Returns the new quantity,
+        or None (nothing changed) if it would go over ``limit``.
+        """
+        raise NotImplementedError
+
+    def remove(self, user, product_id):
+        raise NotImplementedError
+
+    def clear(self, user):
+        raise NotImplementedError
+
+    def render(self, user):
+        """Return the cart payload sent to the client."""
+        raise NotImplementedError
+
+    def summary(self, user):
+        """Return ``{"count": total quantity, "subtotal": Decimal}`` without rendering the lines."""
+        raise NotImplementedError
+
+    def flush(self, user):
+        """Persist any pending changes to Cart/CartItem."""
+
+    def invalidate(self, user):
+        """Drop any copy held outside the database (after checkout)."""
+
+
+# ==========================================
+# 1. Database Store (Default)
+# ==========================================
+class ORMCartStore(BaseCartStore):
+
+    def quantities(self, user):
+        return dict(
+            CartItem.objects.filter(cart__user_id=_user_id(user))
+            .values_list("product_id", "quantity")
+        )
+
+    def resolve_item(self, user, item_id):
+        return (
+            CartItem.objects.filter(id=item_id, cart__user_id=_user_id(user))
+            .values_list("product_id", flat=True)
+            .first()
+        )
+
+    def set_quantity(self, user, product_id, quantity):
+        cart, _ = Cart.objects.get_or_create(user_id=_user_id(user))
+        CartItem.objects.update_or_create(
+            cart=cart, product_id=product_id, defaults={"quantity": quantity}
+        )
+        cart.save(update_fields=["updated_at"])
+
+    def add(self, user, product_id, quantity, limit):
+        cart, _ = Cart.objects.get_or_create(user_id=_user_id(user))
+        with transaction.atomic():
+            # The UPDATE row-locks the cart: concurrent adds queue up here
+            # instead of both reading the same starting quantity
+            Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+            current = (
+                CartItem.objects.filter(cart=cart, product_id=product_id)
+                .values_list("quantity", flat=True).first()
+            ) or 0
+            if current + quantity > limit:
+                return None
+            CartItem.objects.update_or_create(
+                cart=cart, product_id=product_id, defaults={"quantity": current + quantity}
+            )
+        return current + quantity
+
+    def remove(self, user, product_id):
+        CartItem.objects.filter(
+            cart__user_id=_user_id(user), product_id=product_id
+        ).delete()
+        _touch(user)
+
+    def clear(self, user):
+        CartItem.objects.filter(cart__user_id=_user_id(user)).delete()
+        _touch(user)
+
+    def render(self, user):
+        cart, _ = Cart.objects.get_or_create(user_id=_user_id(user))
+        prefetch_related_objects([cart], "items__product")
+        return CartSerializer(cart).data
+
+    def summary(self, user):
+        result = CartItem.objects.filter(cart__user_id=_user_id(user)).aggregate(
+            count=Sum("quantity"), subtotal=Sum(F("product__price") * F("quantity"))
+        )
+        return {"count": result["count"] or 0, "subtotal": result["subtotal"] or Decimal("0")}
+
+
+# ==========================================
+# 2. Cache Store (Write-Behind)
+# ==========================================
+class CacheCartStore(BaseCartStore):
+    """
+    Cart held in ``caches[settings.CART_CACHE_ALIAS]``.
+
+    Each cart is one key holding ``{"items": {product_id: quantity}, ...}``.
+    A miss is filled from the database. Every change happens under the
+    cart's lock and marks the cart in ``DirtyCart``; ``flush_carts`` drains
+    that table and checkout always flushes first. Reads never touch the
+    database on a hit.
+    """
+
+    key_prefix = "cart:"
+    lock_prefix = "cart:lock:"
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, "CART_CACHE_ALIAS", "default")]
+        self.timeout = getattr(settings, "CART_CACHE_TIMEOUT", 60 * 60 * 24 * 7)
+        # A crashed holder's lock expires after this many seconds
+        self.lock_timeout = 5
+
+    def _key(self, user):
+        return f"{self.key_prefix}{_user_id(user)}"
+
+    @contextmanager
+    def _lock(self, user):
+        key = f"{self.lock_prefix}{_user_id(user)}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.lock_timeout + 1
+        while not self.cache.add(key, token, self.lock_timeout):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Cart of user #{_user_id(user)} is locked")
+            time.sleep(0.01)
+        try:
+            yield
+        finally:
+            # If we overran lock_timeout, the lock may now be another request's
+            delete_if_equal(self.cache, key, token)
+
+    def _load(self, user):
+        data = self.cache.get(self._key(user))
+        if data is not None:
+            return data
+
+        cart = Cart.objects.filter(user_id=_user_id(user)).first()
+        data = {
+            "cart_id": cart.id if cart else None,
+            "items": {},
+            "created_at": cart.created_at if cart else timezone.now(),
+            "updated_at": cart.updated_at if cart else timezone.now(),
+        }
+        if cart:
+            data["items"] = dict(cart.items.values_list("product_id", "quantity"))
+        # add, not set: a writer may have stored a newer copy meanwhile
+        if not self.cache.add(self._key(user), data, self.timeout):
+            data = self.cache.get(self._key(user), data)
+        return data
+
+    def _save(self, user, data):
+        """Store a changed cart; call with the cart's lock held."""
+        data["updated_at"] = timezone.now()
+        self.cache.set(self._key(user), data, self.timeout)
+        DirtyCart.objects.bulk_create([DirtyCart(user_id=_user_id(user))], ignore_conflicts=True)
+
+    def quantities(self, user):
+        return dict(self._load(user)["items"])
+
+    def resolve_item(self, user, item_id):
+        # Cached lines have no CartItem row yet, so the line id is the product id.
+        return item_id if item_id in self._load(user)["items"] else None
+
+    def set_quantity(self, user, product_id, quantity):
+        with self._lock(user):
+            data = self._load(user)
+            data["items"][product_id] = quantity
+            self._save(user, data)
+
+    def add(self, user, product_id, quantity, limit):
+        with self._lock(user):
+            data = self._load(user)
+            quantity += data["items"].get(product_id, 0)
+            if quantity > limit:
+                return None
+            data["items"][product_id] = quantity
+            self._save(user, data)
+        return quantity
+
+    def remove(self, user, product_id):
+        with self._lock(user):
+            data = self._load(user)
+            if data["items"].pop(product_id, None) is not None:
+                self._save(user, data)
+
+    def clear(self, user):
+        with self._lock(user):
+            data = self._load(user)
+            if data["items"]:
+                data["items"] = {}
+                self._save(user, data)
+
+    def render(self, user):
+        data = self._load(user)
+        products = Product.objects.in_bulk(list(data["items"]))
+
+        items = []
+        for product_id, quantity in data["items"].items():
+            product = products.get(product_id)
+            if product is None:
+                continue
+            items.append({
+                "id": product_id,
+                "product": ProductMiniSerializer(product).data,
+                "quantity": quantity,
+                "total_price": product.price * quantity,
+            })
+
+        return {
+            "id": data["cart_id"],
+            "items": items,
+            "total_amount": sum(item["total_price"] for item in items),
+            "created_at": data["created_at"],
+            "updated_at": data["updated_at"],
+        }
+
+    def summary(self, user):
+        items = self._load(user)["items"]
+        prices = dict(Product.objects.filter(id__in=list(items)).values_list("id", "price"))
+        return {
+            "count": sum(qty for pid, qty in items.items() if pid in prices),
+            "subtotal": sum((prices[pid] * qty for pid, qty in items.items() if pid in prices), Decimal("0")),
+        }
+
+    def flush(self, user):
+        with self._lock(user):
+            data = self.cache.get(self._key(user))
+            with transaction.atomic():
+                marked, _ = DirtyCart.objects.filter(user_id=_user_id(user)).delete()
+                if not marked or data is None:
+                    return
+
+                cart, _ = Cart.objects.get_or_create(user_id=_user_id(user))
+                valid_ids = set(
+                    Product.objects.filter(id__in=list(data["items"]))
+                    .values_list("id", flat=True)
+                )
+                CartItem.objects.filter(cart=cart).exclude(product_id__in=valid_ids).delete()
+                CartItem.objects.bulk_create(
+                    [
+                        CartItem(cart=cart, product_id=product_id, quantity=quantity)
+                        for product_id, quantity in data["items"].items()
+                        if product_id in valid_ids
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["cart", "product"],
+                    update_fields=["quantity"],
+                )
+                cart.save(update_fields=["updated_at"])
+
+            if data["cart_id"] != cart.id:
+                data["cart_id"] = cart.id
+                self.cache.set(self._key(user), data, self.timeout)
+
+    def flush_dirty(self):
+        """Flush every cart changed before this call. Returns the count."""
+        started = timezone.now()
+        user_ids = list(
+            DirtyCart.objects.filter(marked_at__lte=started)
+            .order_by("marked_at").values_list("user_id", flat=True)
+        )
+        for user_id in user_ids:
+            self.flush(user_id)
+        return len(user_ids)
+
+    def invalidate(self, user):
+        with self._lock(user):
+            self.cache.delete(self._key(user))
+            DirtyCart.objects.filter(user_id=_user_id(user)).delete()
+
+
+@lru_cache(maxsize=None)
+def get_cart_store():
+    return import_string(settings.CART_STORE)()
@@ -1,3 +1,174 @@
-from django.test import TestCase
+import io
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from products.models import Product
+from .management.commands.purge_carts import Command as PurgeCarts
+from .models import Cart, CartItem, DirtyCart
+from .stores import CacheCartStore, ORMCartStore
+
+User = get_user_model()
+
+# A local cache stands in for the shared one
+LOCAL_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'cart-tests'},
+}
+
+
+def make_product(name='Submariner', price='100.00', stock=50):
+    return Product.objects.create(
+        name=name, price=price, stock=stock, category='men', brand='Rolex', image='products/sample',
+    )
+
+
+def run_in_threads(target, count):
+    def worker():
+        try:
+            target()
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+@override_settings(CACHES=LOCAL_CACHE, CART_CACHE_ALIAS='default')
+class CacheCartStoreTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        self.watch = make_product()
+        self.other = make_product(name='Speedmaster', price='50.00')
+
+    def tearDown(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_writes_from_two_workers_are_both_flushed(self):
+        first, second = CacheCartStore(), CacheCartStore()
+        first.set_quantity(self.user, self.watch.id, 1)
+        second.set_quantity(self.user, self.other.id, 2)
+
+        self.assertEqual(DirtyCart.objects.count(), 1)
+        self.assertEqual(first.flush_dirty(), 1)
+
+        self.assertEqual(
+            dict(CartItem.objects.filter(cart__user=self.user).values_list('product_id', 'quantity')),
+            {self.watch.id: 1, self.other.id: 2},
+        )
+        self.assertFalse(DirtyCart.objects.exists())
+        self.assertEqual(first.flush_dirty(), 0)
+
+    def test_add_respects_limit(self):
+        store = CacheCartStore()
+        self.assertEqual(store.add(self.user, self.watch.id, 3, limit=5), 3)
+        self.assertIsNone(store.add(self.user, self.watch.id, 3, limit=5))
+        self.assertEqual(store.add(self.user, self.watch.id, 2, limit=5), 5)
+
+    def test_hits_do_not_query_the_database(self):
+        store = CacheCartStore()
+        store.set_quantity(self.user, self.watch.id, 1)
+        with self.assertNumQueries(0):
+            store.quantities(self.user)
+
+    def test_an_expired_lock_does_not_release_its_successor(self):
+        from django.core.cache import cache
+        store = CacheCartStore()
+        key = f'{store.lock_prefix}{self.user.id}'
+        with store._lock(self.user):
+            # Our lock expired and another request took it
+            cache.set(key, 'other-request', store.lock_timeout)
+        self.assertEqual(cache.get(key), 'other-request')
+
+        cache.delete(key)
+        with store._lock(self.user):
+            pass
+        self.assertIsNone(cache.get(key))
+
+    def test_invalidate_drops_the_pending_flush(self):
+        store = CacheCartStore()
+        store.set_quantity(self.user, self.watch.id, 1)
+        store.invalidate(self.user)
+        self.assertFalse(DirtyCart.objects.exists())
+        self.assertEqual(store.quantities(self.user), {})
+
+
+@override_settings(CACHES=LOCAL_CACHE, CART_CACHE_ALIAS='default')
+class ConcurrentCartWriteTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        self.watch = make_product()
+
+    def tearDown(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_concurrent_adds_to_the_cache_store_all_count(self):
+        store = CacheCartStore()
+        run_in_threads(lambda: store.add(self.user.id, self.watch.id, 1, limit=50), 8)
+        self.assertEqual(store.quantities(self.user), {self.watch.id: 8})
+
+    def test_concurrent_adds_to_the_orm_store_all_count(self):
+        store = ORMCartStore()
+        store.add(self.user.id, self.watch.id, 1, limit=50)  # creates the cart row
+        run_in_threads(lambda: store.add(self.user.id, self.watch.id, 1, limit=50), 8)
+        self.assertEqual(store.quantities(self.user), {self.watch.id: 9})
+
+
+class PurgeCartsTests(TestCase):
+
+    def setUp(self):
+        self.watch = make_product()
+        self.long_ago = timezone.now() - timedelta(days=90)
+
+    def cart(self, email, added_at=None):
+        cart = Cart.objects.create(user=User.objects.create_user(email=email, password='x'))
+        if added_at is not None:
+            item = CartItem.objects.create(cart=cart, product=self.watch)
+            CartItem.objects.filter(pk=item.pk).update(added_at=added_at)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=self.long_ago)
+        return cart
+
+    def purge(self):
+        call_command('purge_carts', '--days=30', stdout=io.StringIO())
+
+    def test_only_idle_carts_are_deleted(self):
+        idle = self.cart('idle@example.com', added_at=self.long_ago)
+        in_use = self.cart('in-use@example.com', added_at=timezone.now())
+        touched = self.cart('touched@example.com')
+        Cart.objects.filter(pk=touched.pk).update(updated_at=timezone.now())
+
+        self.purge()
+
+        self.assertEqual(set(Cart.objects.values_list('id', flat=True)), {in_use.id, touched.id})
+        self.assertFalse(CartItem.objects.filter(cart=idle).exists())
+
+    def test_cart_that_gains_an_item_after_being_picked_is_kept(self):
+        cart = self.cart('buyer@example.com')
+        other = make_product(name='Speedmaster')
+        next_batch = PurgeCarts.next_batch
+
+        def pick_then_add(command, *args):
+            ids = next_batch(command, *args)
+            if ids:
+                # Added between the batch select and the delete, by a path
+                # that doesn't bump Cart.updated_at
+                CartItem.objects.create(cart=cart, product=other)
+            return ids
+
+        with mock.patch.object(PurgeCarts, 'next_batch', pick_then_add):
+            self.purge()
+
+        self.assertTrue(Cart.objects.filter(pk=cart.pk).exists())
+        self.assertEqual(CartItem.objects.filter(cart=cart).count(), 1)
@@ -2,8 +2,8 @@ from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Cart, CartItem
-from .serializers import AddToCartSerializer, CartSerializer
+from .serializers import AddToCartSerializer
+from .stores import get_cart_store
 from products.models import Product
 
 
@@ -11,9 +11,7 @@ class CartDetailAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(get_cart_store().render(request.user), status=status.HTTP_200_OK)
 
 class AddToCartAPIView(APIView):
     permission_classes = [IsAuthenticated]
@@ -41,29 +39,16 @@ class AddToCartAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get or create cart
-        cart, _ = Cart.objects.get_or_create(user=request.user)
-
-        # Get or create cart item
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            product=product
-        )
-
-        if not created:
-            if cart_item.quantity + quantity > product.stock:
-                return Response(
-                    {"detail": "Stock limit exceeded"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            cart_item.quantity += quantity
-        else:
-            cart_item.quantity = quantity
-
-        cart_item.save()
+        # Read + increment happen together in the store, so concurrent adds all count
+        store = get_cart_store()
+        if store.add(request.user, product.id, quantity, limit=product.stock) is None:
+            return Response(
+                {"detail": "Stock limit exceeded"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         return Response(
-            CartSerializer(cart).data,
+            store.render(request.user),
             status=status.HTTP_200_OK
         )
 
@@ -80,35 +65,26 @@ class UpdateCartItemAPIView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        cart = Cart.objects.filter(user=request.user).first()
-        if not cart:
-            return Response(
-                {"detail": "Cart not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        store = get_cart_store()
+        product_id = store.resolve_item(request.user, item_id)
 
-        cart_item = CartItem.objects.filter(
-            id=item_id,
-            cart=cart
-        ).first()
-
-        if not cart_item:
+        if product_id is None:
             return Response(
                 {"detail": "Cart item not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        if int(quantity) > cart_item.product.stock:
+        stock = Product.objects.filter(id=product_id).values_list("stock", flat=True).first()
+        if stock is None or int(quantity) > stock:
             return Response(
                 {"detail": "Stock limit exceeded"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        cart_item.quantity = int(quantity)
-        cart_item.save()
+        store.set_quantity(request.user, product_id, int(quantity))
 
         return Response(
-            CartSerializer(cart).data,
+            store.render(request.user),
             status=status.HTTP_200_OK
         )
 
@@ -117,28 +93,19 @@ class RemoveFromCartAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request, item_id):
-        cart = Cart.objects.filter(user=request.user).first()
-        if not cart:
-            return Response(
-                {"detail": "Cart not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
+        store = get_cart_store()
+        product_id = store.resolve_item(request.user, item_id)
 
-        cart_item = CartItem.objects.filter(
-            id=item_id,
-            cart=cart
-        ).first()
-
-        if not cart_item:
+        if product_id is None:
             return Response(
                 {"detail": "Cart item not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        cart_item.delete()
+        store.remove(request.user, product_id)
 
         return Response(
-            CartSerializer(cart).data,
+            store.render(request.user),
             status=status.HTTP_200_OK
         )
 
@@ -147,11 +114,9 @@ class ClearCartAPIView(APIView):
     permission_classes = [IsAuthenticated]
 
     def delete(self, request):
-        cart = Cart.objects.filter(user=request.user).first()
-        if cart:
-            cart.items.all().delete()
+        get_cart_store().clear(request.user)
 
         return Response(
             {"message": "Cart cleared successfully"},
             status=status.HTTP_204_NO_CONTENT
-        )
+        )
\ No newline at end of file
@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'attempts', 'run_after', 'created_at')
+    list_filter = ('kind', 'status')
+    # Payloads carry customer data (addresses, email bodies); keep them out of the admin
+    exclude = ('payload',)
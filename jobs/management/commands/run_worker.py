@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.worker import requeue_stale, run_batch
+
+
+class Command(BaseCommand):
+    help = "Process queued background jobs (emails, etc.)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Jobs claimed per batch.")
+        parser.add_argument("--interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument("--kind", action="append", dest="kinds", help="Only run jobs of this kind (repeatable).")
+        parser.add_argument("--stale-after", type=int, default=600, help="Requeue running jobs locked longer than this many seconds.")
+        parser.add_argument("--once", action="store_true", help="Drain the queue once and exit.")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Worker started")
+        while True:
+            requeue_stale(options["stale_after"])
+            succeeded, failed = run_batch(options["batch_size"], options["kinds"])
+
+            if succeeded or failed:
+                self.stdout.write(f"Processed batch: {succeeded} done, {failed} failed")
+                continue
+
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,43 @@
+# jobs/queue.py
+"""
+A small database-backed job queue.
+
+Producers call ``enqueue`` (or ``enqueue_on_commit`` from inside a
+transaction); ``manage.py run_worker`` claims due jobs in batches and hands
+each batch to the handler registered for its ``kind``.
+
+A handler receives a list of ``Job`` rows and returns ``{job.id: error}`` for
+the jobs that failed; everything else counts as done.
+"""
+from django.db import transaction
+
+from .models import Job
+
+_handlers = {}
+
+
+def register(kind):
+    """Decorator that registers a batch handler for ``kind``."""
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def get_handler(kind):
+    return _handlers.get(kind)
+
+
+def enqueue(kind, payload, run_after=None, max_attempts=None):
+    job = Job(kind=kind, payload=payload)
+    if run_after is not None:
+        job.run_after = run_after
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    job.save()
+    return job
+
+
+def enqueue_on_commit(kind, payload, **kwargs):
+    """Queue the job only once the surrounding transaction has committed."""
+    transaction.on_commit(lambda: enqueue(kind, payload, **kwargs))
@@ -0,0 +1,79 @@
+# jobs/tasks.py
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+import outbound
+from .queue import enqueue, enqueue_on_commit, register
+
+
+def enqueue_email(subject, body, to, on_commit=False):
+    """Queue a plain-text email for the worker instead of sending it inline."""
+    payload = {
+        'subject': subject,
+        'body': body,
+        'from_email': settings.DEFAULT_FROM_EMAIL,
+        'to': list(to),
+    }
+    if on_commit:
+        enqueue_on_commit('email', payload)
+    else:
+        enqueue('email', payload)
+
+
+def deliver(jobs, render):
+    """
+    Send one email per job over a single SMTP connection.
+
+    ``render(job)`` returns the message as ``{'subject', 'body', 'to'[, 'from_email']}``,
+    or None when there is nothing to send any more (the job just completes).
+    Returns ``{job.id: error}`` for the queue to retry.
+    """
+    pending = []
+    for job in jobs:
+        content = render(job)
+        if content is not None:
+            pending.append((job, content))
+    if not pending:
+        return {}
+
+    failures = {}
+    connection = get_connection()
+
+    # SMTP goes through the outbound breaker/bulkhead; the queue handles retries
+    smtp = outbound.get_provider('smtp')
+
+    try:
+        smtp.call(connection.open)
+    except Exception as e:
+        return {job.id: str(e) for job, _ in pending}
+
+    try:
+        for index, (job, content) in enumerate(pending):
+            message = EmailMessage(
+                subject=content['subject'],
+                body=content['body'],
+                from_email=content.get('from_email') or settings.DEFAULT_FROM_EMAIL,
+                to=content['to'],
+                connection=connection,
+            )
+            try:
+                smtp.call(message.send)
+            except Exception as e:
+                failures[job.id] = str(e)
+                # The session may be unusable after an SMTP error; start a fresh one
+                try:
+                    connection.close()
+                    smtp.call(connection.open)
+                except Exception as e:
+                    failures.update({rest.id: str(e) for rest, _ in pending[index + 1:]})
+                    break
+    finally:
+        connection.close()
+
+    return failures
+
+
+@register('email')
+def send_emails(jobs):
+    """Send a batch of queued emails over a single SMTP connection."""
+    return deliver(jobs, lambda job: job.payload)
@@ -0,0 +1,85 @@
+# jobs/worker.py
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .queue import get_handler
+
+
+def _backoff(attempts):
+    base = getattr(settings, 'JOBS_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'JOBS_RETRY_MAX_SECONDS', 3600)
+    delay = min(base * 2 ** (attempts - 1), cap)
+    # Jitter so a failing provider isn't hit by every retry at once
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def requeue_stale(stale_after):
+    """Put back jobs whose worker died mid-batch."""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_at=None
+    )
+
+
+def claim(batch_size, kinds=None):
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_after__lte=now)
+            .order_by('run_after', 'id')
+        )
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+
+        jobs = list(queryset[:batch_size])
+        Job.objects.filter(id__in=[job.id for job in jobs]).update(
+            status='running', locked_at=now, attempts=F('attempts') + 1
+        )
+
+    for job in jobs:
+        job.attempts += 1
+    return jobs
+
+
+def run_batch(batch_size=50, kinds=None):
+    """Claim and run one batch. Returns ``(succeeded, failed)`` counts."""
+    jobs = claim(batch_size, kinds)
+
+    by_kind = {}
+    for job in jobs:
+        by_kind.setdefault(job.kind, []).append(job)
+
+    failures = {}
+    for kind, batch in by_kind.items():
+        handler = get_handler(kind)
+        if handler is None:
+            failures.update({job.id: f"No handler registered for '{kind}'" for job in batch})
+            continue
+        try:
+            failures.update(handler(batch) or {})
+        except Exception as e:
+            failures.update({job.id: str(e) for job in batch})
+
+    done = [job.id for job in jobs if job.id not in failures]
+    Job.objects.filter(id__in=done).delete()
+
+    for job in jobs:
+        if job.id not in failures:
+            continue
+        job.last_error = failures[job.id]
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'queued'
+            job.run_after = timezone.now() + _backoff(job.attempts)
+        job.save(update_fields=['status', 'run_after', 'locked_at', 'last_error'])
+
+    return len(done), len(failures)
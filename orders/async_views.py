@@ -0,0 +1,75 @@
+# orders/async_views.py
+"""
+ASGI (async) version of ``CreatePaymentIntentView``.
+
+Routed instead of the sync view when ``settings.ASYNC_OUTBOUND_VIEWS`` is on.
+The Stripe round trip runs on the event loop; the short cart queries run in
+Django's sync thread.
+"""
+from asgiref.sync import sync_to_async
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+
+from Accounts.async_views import respond, throttled
+from Accounts.authentication import CachedJWTAuthentication
+from Accounts.throttling import IPThrottle, UserThrottle
+from cart.stores import get_cart_store
+from .idempotency import HEADER as IDEMPOTENCY_HEADER, aidempotent
+from .payments import aget_or_create_intent, cart_totals
+
+
+@sync_to_async
+def authenticate(request):
+    """Same JWT check as the DRF views; returns the user or None."""
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+@sync_to_async
+def priced_cart(user):
+    get_cart_store().flush(user)
+    return cart_totals(user)
+
+
+# ==========================================
+# 1. CUSTOMER: Initialize Stripe Payment (Async)
+# ==========================================
+class AsyncCreatePaymentIntentView(View):
+    # Every call can reach Stripe
+    throttle_classes = [UserThrottle, IPThrottle]
+
+    async def post(self, request):
+        user = await authenticate(request)
+        if user is None:
+            return respond({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+
+        request.user = user
+        if rejected := await throttled(request, 'payment_intent', self.throttle_classes):
+            return rejected
+
+        return await self.create_intent(request)
+
+    @aidempotent
+    async def create_intent(self, request):
+        user = request.user
+        try:
+            total_amount, fingerprint = await priced_cart(user)
+            if total_amount is None:
+                return respond({'error': 'Cart is empty'}, status=400)
+
+            # Let Stripe dedupe too, in case our own response was lost
+            idempotency_key = None
+            if request.headers.get(IDEMPOTENCY_HEADER):
+                idempotency_key = f"{user.id}:{request.headers[IDEMPOTENCY_HEADER]}"
+
+            _, client_secret = await aget_or_create_intent(
+                user, int(total_amount * 100), fingerprint, idempotency_key
+            )
+
+            return respond({'clientSecret': client_secret})
+
+        except Exception as e:
+            return respond({'error': str(e)}, status=500)
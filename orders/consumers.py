@@ -0,0 +1,77 @@
+# orders/consumers.py
+"""
+Raw ASGI WebSocket endpoint: `/ws/orders/?token=<access token>`.
+
+After the handshake the client receives a JSON message whenever one of its
+orders changes status, e.g.
+    {"type": "order.status", "order_id": 42, "status": "shipped", "previous": "processing"}
+Messages sent by the client are ignored (use them as keep-alive pings).
+"""
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .events import get_broker
+
+User = get_user_model()
+
+CLOSE_UNAUTHORIZED = 4401
+
+
+async def _authenticate(scope):
+    query = parse_qs(scope.get('query_string', b'').decode())
+    token = (query.get('token') or [None])[0]
+    if not token:
+        return None
+
+    try:
+        # The claim is a string; events are published under the integer pk
+        user_id = User._meta.pk.to_python(AccessToken(token)[api_settings.USER_ID_CLAIM])
+    except (TokenError, KeyError, ValidationError):
+        return None
+
+    # Blocked users lose their live feed along with everything else
+    allowed = await User.objects.filter(pk=user_id, is_active=True, is_blocked=False).aexists()
+    return user_id if allowed else None
+
+
+async def order_events(scope, receive, send):
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+
+    user_id = await _authenticate(scope)
+    if user_id is None:
+        await send({'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED})
+        return
+
+    await send({'type': 'websocket.accept'})
+
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    _, queue = subscription
+
+    receiver = asyncio.ensure_future(receive())
+    getter = asyncio.ensure_future(queue.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiver, getter}, return_when=asyncio.FIRST_COMPLETED)
+
+            if receiver in done:
+                if receiver.result()['type'] == 'websocket.disconnect':
+                    break
+                receiver = asyncio.ensure_future(receive())
+
+            if getter in done:
+                await send({'type': 'websocket.send', 'text': json.dumps(getter.result())})
+                getter = asyncio.ensure_future(queue.get())
+    finally:
+        receiver.cancel()
+        getter.cancel()
+        broker.unsubscribe(user_id, subscription)
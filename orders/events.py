@@ -0,0 +1,79 @@
+# orders/events.py
+"""
+Order status events for the `/ws/orders/` WebSocket (see orders/consumers.py).
+
+Status changes are published after their transaction commits. The default
+``LocalBroker`` only reaches sockets held by the same process, which is
+enough for development and tests; point ``settings.ORDER_EVENTS_BROKER`` at a
+broker shared between processes for production.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+def _put(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        pass  # Slow client: drop it, the next my-orders fetch catches up
+
+
+class LocalBroker:
+    """In-process pub/sub keyed by user id. Safe to publish from any thread."""
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Call from the event loop that will read the returned queue."""
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.max_queue))
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            self._subscribers[user_id].discard(subscription)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscriptions:
+            loop.call_soon_threadsafe(_put, queue, event)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.ORDER_EVENTS_BROKER)()
+
+
+def publish_status_changes(transitioned, new_status):
+    """Queue one compact event per changed order, sent once the transaction commits."""
+    events = [
+        (user_id, {
+            'type': 'order.status',
+            'order_id': order_id,
+            'status': new_status,
+            'previous': previous,
+        })
+        for order_id, user_id, previous in transitioned
+    ]
+    if not events:
+        return
+
+    def send():
+        broker = get_broker()
+        for user_id, event in events:
+            broker.publish(user_id, event)
+
+    transaction.on_commit(send)
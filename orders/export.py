@@ -0,0 +1,101 @@
+# orders/export.py
+"""
+Streaming order export.
+
+Orders are read with ``QuerySet.iterator(chunk_size=...)``; Django runs the
+``items`` prefetch once per chunk, so memory stays bounded by the chunk size
+no matter how many orders match.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_COLUMNS = [
+    'order_id', 'created_at', 'status', 'customer_email', 'full_name', 'city',
+    'state', 'zip_code', 'phone', 'total_price', 'payment_id',
+]
+ITEM_COLUMNS = [
+    'item_id', 'product_id', 'product_name', 'product_brand', 'price', 'quantity',
+]
+
+
+class Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_orders(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    items = OrderItem.objects.only(
+        'id', 'order', 'product', 'price', 'quantity', 'product_name', 'product_brand',
+    ).order_by('id')
+
+    queryset = (
+        queryset.select_related('user')
+        .only(
+            'id', 'created_at', 'status', 'user__email', 'full_name', 'city',
+            'state', 'zip_code', 'phone', 'total_price', 'payment_id',
+        )
+        .prefetch_related(Prefetch('items', queryset=items))
+    )
+    for order in queryset.iterator(chunk_size=chunk_size):
+        yield order
+        # Prefetched items point back at their order; dropping them here lets
+        # refcounting free each chunk instead of leaving it to the cycle collector
+        order._prefetched_objects_cache.clear()
+
+
+def _order_row(order):
+    return {
+        'order_id': order.id,
+        'created_at': order.created_at.isoformat(),
+        'status': order.status,
+        'customer_email': order.user.email,
+        'full_name': order.full_name,
+        'city': order.city,
+        'state': order.state,
+        'zip_code': order.zip_code,
+        'phone': order.phone,
+        'total_price': order.total_price,
+        'payment_id': order.payment_id,
+    }
+
+
+def _item_row(item):
+    return {
+        'item_id': item.id,
+        'product_id': item.product_id,
+        'product_name': item.product_name,
+        'product_brand': item.product_brand,
+        'price': item.price,
+        'quantity': item.quantity,
+    }
+
+
+def stream_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """One row per line item, order columns repeated on each."""
+    writer = csv.DictWriter(Echo(), fieldnames=ORDER_COLUMNS + ITEM_COLUMNS)
+    yield writer.writeheader()
+
+    for order in iter_orders(queryset, chunk_size):
+        row = _order_row(order)
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(row)
+        for item in items:
+            yield writer.writerow({**row, **_item_row(item)})
+
+
+def stream_jsonl(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """One JSON object per order, line items nested."""
+    for order in iter_orders(queryset, chunk_size):
+        row = _order_row(order)
+        row['items'] = [_item_row(item) for item in order.items.all()]
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
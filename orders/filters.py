@@ -0,0 +1,61 @@
+# orders/filters.py
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+from Horo_BackEnd.params import parse_moment
+from .models import Order
+
+STATUSES = {value for value, _ in Order.STATUS_CHOICES}
+
+
+def _parse_amount(name, value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "Must be a number."})
+
+
+def filter_admin_orders(queryset, params):
+    """
+    Apply the admin order list filters from query params:
+
+    ?status=processing,shipped   ?created_after=2026-01-01   ?created_before=2026-01-31
+    ?email=a@b.com   ?city=Kochi   ?min_total=1000   ?max_total=50000
+
+    Each filter maps onto one of the Order indexes (status/user/city + created_at).
+    """
+    status_param = params.get('status')
+    if status_param:
+        statuses = [s.strip() for s in status_param.split(',') if s.strip()]
+        unknown = set(statuses) - STATUSES
+        if unknown:
+            raise ValidationError({'status': f"Unknown status: {', '.join(sorted(unknown))}"})
+        queryset = queryset.filter(status__in=statuses)
+
+    if params.get('created_after'):
+        moment, _ = parse_moment('created_after', params['created_after'])
+        queryset = queryset.filter(created_at__gte=moment)
+
+    if params.get('created_before'):
+        moment, is_date = parse_moment('created_before', params['created_before'])
+        if is_date:
+            # A bare date means "up to the end of that day"
+            queryset = queryset.filter(created_at__lt=moment + timedelta(days=1))
+        else:
+            queryset = queryset.filter(created_at__lte=moment)
+
+    if params.get('email'):
+        queryset = queryset.filter(user__email__iexact=params['email'].strip())
+
+    if params.get('city'):
+        queryset = queryset.filter(city__iexact=params['city'].strip())
+
+    if params.get('min_total'):
+        queryset = queryset.filter(total_price__gte=_parse_amount('min_total', params['min_total']))
+
+    if params.get('max_total'):
+        queryset = queryset.filter(total_price__lte=_parse_amount('max_total', params['max_total']))
+
+    return queryset
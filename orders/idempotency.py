@@ -0,0 +1,159 @@
+# orders/idempotency.py
+"""
+Idempotency-Key support for POST endpoints.
+
+The first request with a given key commits an ``IdempotencyKey`` row marked
+"in progress" in a short transaction of its own, then runs the view outside
+it (the PaymentIntent view calls Stripe, and no transaction or row lock
+should stay open across a network call), and finally stores the response on
+the row. A retry of a finished request replays the stored response; a retry
+that arrives while the first is still running gets a 409 with
+``Retry-After``. A 5xx deletes the key again, so the retry runs the view
+for real, and a key left in progress by a crashed worker can be taken over
+after ``IN_PROGRESS_TIMEOUT``.
+
+``idempotent`` wraps DRF ``APIView.post`` methods; ``aidempotent`` is the
+same for async views returning JSON. Rows older than
+``IDEMPOTENCY_KEY_RETENTION_HOURS`` are removed by
+``manage.py purge_idempotency_keys``.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+# Longer than any request that calls out to Stripe can take
+IN_PROGRESS_TIMEOUT = timedelta(minutes=1)
+
+
+def _body_hash(data):
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _request_hash(request):
+    return _body_hash(request.data)
+
+
+def _stored(record, endpoint, request_hash):
+    """``(body, status, headers)`` to answer a repeated key with."""
+    if record.endpoint != endpoint or record.request_hash != request_hash:
+        return (
+            {"error": f"{HEADER} has already been used for a different request."},
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+            {},
+        )
+    return record.response_body, record.status_code, {'Idempotent-Replayed': 'true'}
+
+
+def _claim(user, key, endpoint, request_hash):
+    """
+    Commit ``key`` as in progress for ``user``. Returns ``(record, None)``
+    when the caller should run the view, else ``(None, (body, status, headers))``.
+    """
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(user=user, key=key, endpoint=endpoint, request_hash=request_hash)
+        return record, None
+    except IntegrityError:
+        record = IdempotencyKey.objects.get(user=user, key=key)
+
+    if record.status_code is not None or record.endpoint != endpoint or record.request_hash != request_hash:
+        return None, _stored(record, endpoint, request_hash)
+
+    # Still running elsewhere, unless its worker died holding the key
+    now = timezone.now()
+    taken_over = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, created_at__lt=now - IN_PROGRESS_TIMEOUT,
+    ).update(created_at=now)
+    if taken_over:
+        return record, None
+    return None, (
+        {"error": f"A request with this {HEADER} is still in progress; retry later."},
+        status.HTTP_409_CONFLICT,
+        {'Retry-After': '1'},
+    )
+
+
+def _finish(record, status_code, body):
+    if status_code >= 500:
+        record.delete()  # let the client retry for real
+    else:
+        record.status_code, record.response_body = status_code, body
+        record.save(update_fields=['status_code', 'response_body'])
+
+
+def idempotent(view_method):
+    """Decorator for APIView.post: honour the Idempotency-Key header."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response({"error": f"{HEADER} is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        record, stored = _claim(request.user, key, request.path, _request_hash(request))
+        if stored is not None:
+            body, status_code, headers = stored
+            return Response(body, status=status_code, headers=headers)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            _finish(record, status.HTTP_500_INTERNAL_SERVER_ERROR, None)
+            raise
+        _finish(record, response.status_code, response.data)
+        return response
+
+    return wrapper
+
+
+_aclaim = sync_to_async(_claim)
+_afinish = sync_to_async(_finish)
+
+
+def aidempotent(view_method):
+    """``idempotent`` for async views returning JSON; ``request.user`` must be set."""
+
+    @functools.wraps(view_method)
+    async def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return await view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return JsonResponse({"error": f"{HEADER} is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            data = {}
+        record, stored = await _aclaim(request.user, key, request.path, _body_hash(data))
+        if stored is not None:
+            body, status_code, headers = stored
+            return JsonResponse(body, status=status_code, headers=headers, encoder=JSONEncoder, safe=False)
+
+        try:
+            response = await view_method(self, request, *args, **kwargs)
+        except Exception:
+            await _afinish(record, status.HTTP_500_INTERNAL_SERVER_ERROR, None)
+            raise
+        await _afinish(record, response.status_code, json.loads(response.content))
+        return response
+
+    return wrapper
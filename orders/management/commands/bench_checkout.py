@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from cart.models import Cart, CartItem
+from orders.checkout import place_order
+from products.models import Product
+
+SHIPPING = {
+    'full_name': 'Bench Customer', 'address': 'Street', 'city': 'Kochi',
+    'state': 'Kerala', 'zip_code': '682001', 'phone': '9999999999',
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark checkout (orders.checkout.place_order) for carts of different sizes. "
+        "Works inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 100], help="Cart sizes to measure.")
+        parser.add_argument("--repeat", type=int, default=50, help="Checkouts per cart size.")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user, _ = get_user_model().objects.get_or_create(email="checkout-bench@example.com")
+                cart, _ = Cart.objects.get_or_create(user=user)
+                products = Product.objects.bulk_create(
+                    Product(name=f"Bench watch {n}", price=100 + n, stock=1_000_000, category="men",
+                            brand="Rolex", image="products/sample")
+                    for n in range(max(options["lines"]))
+                )
+                for lines in options["lines"]:
+                    self.measure(cart, products[:lines], options["repeat"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, cart, products, repeat):
+        elapsed, queries = 0.0, 0
+        for _ in range(repeat):
+            CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=2) for product in products)
+
+            started = time.monotonic()
+            with transaction.atomic(), CaptureQueriesContext(connection) as captured:
+                order = place_order(cart, SHIPPING)
+            elapsed += time.monotonic() - started
+            queries = len(captured)
+
+            assert order.items.count() == len(products)
+
+        self.stdout.write(
+            f"{len(products):>4} line(s): {elapsed / repeat * 1000:7.2f} ms per checkout, {queries} queries"
+        )
@@ -0,0 +1,87 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from orders.export import EXPORT_CHUNK_SIZE, stream_csv, stream_jsonl
+from orders.models import Order, OrderItem
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the streaming order export: seeds orders inside a transaction that is rolled back, "
+        "then reports rows/second and peak Python memory for CSV and JSON Lines."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, nargs="+", default=[1_000, 100_000], help="Order counts to measure.")
+        parser.add_argument("--lines", type=int, default=3, help="Line items per seeded order.")
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                seeded = 0
+                for count in sorted(options["orders"]):
+                    self.seed(count - seeded, options["lines"])
+                    seeded = count
+                    for name, stream in (("csv", stream_csv), ("jsonl", stream_jsonl)):
+                        self.measure(name, stream, count, options["chunk_size"])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, count, lines):
+        quote = connection.ops.quote_name
+        orders, items = quote(Order._meta.db_table), quote(OrderItem._meta.db_table)
+        user_id = self.bench_user()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH created AS (
+                    INSERT INTO {orders} (user_id, full_name, address, city, state, zip_code, phone,
+                                          total_price, status, created_at)
+                    SELECT %s, 'Customer', 'Street', 'Kochi', 'Kerala', '682001', '9999999999',
+                           %s * 100, 'delivered', now() - n * interval '1 minute'
+                    FROM generate_series(1, %s) AS n
+                    RETURNING id, created_at
+                )
+                INSERT INTO {items} (order_id, price, quantity, product_name, product_brand,
+                                     product_category, product_image, created_at)
+                SELECT created.id, 100, 1, 'Watch ' || line, 'Rolex', 'men', NULL, created.created_at
+                FROM created, generate_series(1, %s) AS line
+                """,
+                [user_id, lines, count, lines],
+            )
+            cursor.execute(f"ANALYZE {orders}")
+            cursor.execute(f"ANALYZE {items}")
+
+    def bench_user(self):
+        from django.contrib.auth import get_user_model
+
+        user, _ = get_user_model().objects.get_or_create(email="export-bench@example.com")
+        return user.id
+
+    def measure(self, name, stream, count, chunk_size):
+        queryset = Order.objects.order_by("-created_at", "-id")
+
+        started = time.monotonic()
+        rows = sum(1 for _ in stream(queryset, chunk_size=chunk_size))
+        elapsed = time.monotonic() - started
+
+        # Second pass for memory; tracemalloc would skew the timing above
+        tracemalloc.start()
+        for _ in stream(queryset, chunk_size=chunk_size):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.stdout.write(
+            f"{name:>5} {count:>9,} orders: {rows:>10,} rows in {elapsed:6.2f}s "
+            f"= {rows / elapsed:>9,.0f} rows/s, peak {peak / 2**20:5.1f} MiB"
+        )
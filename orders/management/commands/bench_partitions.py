@@ -0,0 +1,178 @@
+import re
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from orders.models import Order, OrderItem
+from orders.pagination import OrderCursorPagination
+
+from .order_partitions import add_months, month_start, q
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the order list queries on a plain vs a monthly-partitioned copy of orders_order / "
+        "orders_orderitem. Seeds synthetic rows into scratch tables inside a transaction that is rolled "
+        "back, then reports p50/p95 latency of each query on both layouts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--orders", type=int, default=10_000_000, help="Orders to seed.")
+        parser.add_argument("--lines", type=int, default=2, help="Line items per seeded order.")
+        parser.add_argument("--months", type=int, default=36, help="History the orders are spread over.")
+        parser.add_argument("--users", type=int, default=100_000, help="Customers the orders are spread over.")
+        parser.add_argument("--repeat", type=int, default=50, help="Timed runs per query and layout.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Order partitioning needs PostgreSQL.")
+
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                self.now = timezone.now()
+                started = time.monotonic()
+                self.create_plain(cursor)
+                self.create_partitioned(cursor, options["months"])
+                self.seed(cursor, options)
+                self.stdout.write(
+                    f"Seeded {options['orders']:,} orders x {options['lines']} lines over "
+                    f"{options['months']} months in {time.monotonic() - started:.0f}s\n"
+                )
+
+                self.stdout.write(f"{'query':<44} {'plain p50/p95 ms':>18} {'partitioned p50/p95 ms':>24}")
+                for title, sql, params in self.queries(cursor):
+                    plain = self.measure(cursor, sql, params, "plain", options["repeat"])
+                    partitioned = self.measure(cursor, sql, params, "part", options["repeat"])
+                    self.stdout.write(
+                        f"{title:<44} {plain[0]:>8.2f} /{plain[1]:>8.2f} {partitioned[0]:>14.2f} /{partitioned[1]:>8.2f}"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+
+    # ------------------------------------------------------------------
+    # Scratch tables
+    # ------------------------------------------------------------------
+    def scratch(self, table, layout):
+        return f"bench_{layout}_{table}"
+
+    def create_plain(self, cursor):
+        # Same columns and indexes as the live tables; LIKE leaves out the FKs
+        for table in (Order._meta.db_table, OrderItem._meta.db_table):
+            cursor.execute(f"CREATE TABLE {q(self.scratch(table, 'plain'))} (LIKE {q(table)} INCLUDING ALL)")
+
+    def create_partitioned(self, cursor, months):
+        # The layout `order_partitions convert` leaves behind: PK (id, created_at)
+        # and every other index declared on the parent
+        first = add_months(month_start(self.now), -months)
+        for table in (Order._meta.db_table, OrderItem._meta.db_table):
+            parent = self.scratch(table, "part")
+            cursor.execute(
+                f"CREATE TABLE {q(parent)} (LIKE {q(table)} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+            )
+            cursor.execute(f"ALTER TABLE {q(parent)} ADD PRIMARY KEY (id, created_at)")
+            for definition in self.index_definitions(cursor, table):
+                cursor.execute(definition.replace(f" ON public.{table} ", f" ON {q(parent)} ", 1))
+            for offset in range(months + 2):
+                start = add_months(first, offset)
+                cursor.execute(
+                    f"CREATE TABLE {q(f'{parent}_{start:%Y_%m}')} PARTITION OF {q(parent)} "
+                    f"FOR VALUES FROM (%s) TO (%s)",
+                    [start, add_months(start, 1)],
+                )
+
+    def index_definitions(self, cursor, table):
+        cursor.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(%s) AND NOT x.indisprimary
+            """,
+            [table],
+        )
+        return [
+            re.sub(r"^CREATE (UNIQUE )?INDEX \S+", lambda m: f"CREATE {m.group(1) or ''}INDEX", definition)
+            for _, definition in cursor.fetchall()
+        ]
+
+    def seed(self, cursor, options):
+        orders, items = (q(self.scratch(t, "plain")) for t in (Order._meta.db_table, OrderItem._meta.db_table))
+        # Evenly spread over the window, so every month holds the same share
+        span = f"interval '{options['months']} months'"
+        cursor.execute(
+            f"""
+            INSERT INTO {orders} (id, user_id, full_name, address, city, state, zip_code, phone,
+                                  total_price, status, created_at)
+            SELECT n, n %% %s + 1, 'Customer', 'Street', 'Kochi', 'Kerala', '682001', '9999999999', 100,
+                   (ARRAY['pending', 'processing', 'shipped', 'delivered', 'delivered', 'cancelled'])[n %% 6 + 1],
+                   %s - {span} * n / %s
+            FROM generate_series(1, %s) AS n
+            """,
+            [options["users"], self.now, options["orders"], options["orders"]],
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {items} (id, order_id, price, quantity, product_name, product_brand,
+                                 product_category, product_image, created_at)
+            SELECT (o.id - 1) * %s + line, o.id, 100, 1, 'Watch ' || line, 'Rolex', 'men', NULL, o.created_at
+            FROM {orders} AS o, generate_series(1, %s) AS line
+            """,
+            [options["lines"], options["lines"]],
+        )
+        for table in (Order._meta.db_table, OrderItem._meta.db_table):
+            plain, partitioned = q(self.scratch(table, "plain")), q(self.scratch(table, "part"))
+            cursor.execute(f"INSERT INTO {partitioned} SELECT * FROM {plain}")
+            cursor.execute(f"ANALYZE {plain}")
+            cursor.execute(f"ANALYZE {partitioned}")
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+    def queries(self, cursor):
+        """(title, sql, params) for the list views' queries, as the ORM writes them."""
+        page = OrderCursorPagination.page_size + 1
+        newest_first = OrderCursorPagination.ordering
+        year_ago = add_months(self.now, -12)
+        plans = {
+            "customer list, first page": Order.objects.filter(user_id=1),
+            "customer list, cursor 12 months back": Order.objects.filter(user_id=1, created_at__lt=year_ago),
+            "admin list, first page": Order.objects.all(),
+            "admin list, cursor 12 months back": Order.objects.filter(created_at__lt=year_ago),
+            "admin list, processing in the last month": Order.objects.filter(
+                status="processing", created_at__gte=add_months(month_start(self.now), -1)
+            ),
+        }
+        for title, queryset in plans.items():
+            sql, params = queryset.order_by(*newest_first)[:page].query.sql_with_params()
+            yield title, sql, params
+
+        # prefetch_related('items') for one admin page
+        sql, params = Order.objects.order_by(*newest_first).values("id")[:page].query.sql_with_params()
+        cursor.execute(self.rewrite(sql, "plain"), params)
+        ids = [row[0] for row in cursor.fetchall()]
+        sql, params = OrderItem.objects.filter(order__in=ids).query.sql_with_params()
+        yield "admin list, items prefetch for one page", sql, params
+
+    def rewrite(self, sql, layout):
+        for table in (OrderItem._meta.db_table, Order._meta.db_table):
+            sql = sql.replace(q(table), q(self.scratch(table, layout)))
+        return sql
+
+    def measure(self, cursor, sql, params, layout, repeat):
+        sql = self.rewrite(sql, layout)
+        cursor.execute(sql, params)  # warm the cache and the plan
+        cursor.fetchall()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), statistics.quantiles(timings, n=20)[-1]
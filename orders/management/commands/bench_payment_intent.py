@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import stripe
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import AsyncRequestFactory
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cart.models import Cart, CartItem
+from orders.async_views import AsyncCreatePaymentIntentView
+from orders.views import CreatePaymentIntentView
+from products.models import Product
+
+URL = "/api/orders/create-payment-intent/"
+
+
+class Rollback(Exception):
+    pass
+
+
+class StubStripe(BaseHTTPRequestHandler):
+    """Answers ``POST /v1/payment_intents`` like Stripe, after ``server.latency`` seconds."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        intent_id = f"pi_bench_{next(self.server.ids)}"
+        self.server.hits += 1
+        time.sleep(self.server.latency)
+        body = json.dumps({
+            "id": intent_id, "object": "payment_intent", "client_secret": f"{intent_id}_secret",
+            "status": "requires_payment_method",
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the sync and async PaymentIntent views against a local Stripe stub "
+        "(throttles off), then replay every request with its Idempotency-Key. "
+        "Works inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Requests per view.")
+        parser.add_argument("--concurrency", type=int, default=10, help="Async requests in flight at once.")
+        parser.add_argument("--latency", type=float, default=0.2, help="Stub Stripe response time, in seconds.")
+
+    def handle(self, *args, **options):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubStripe)
+        server.daemon_threads = True
+        server.latency, server.ids, server.hits = options["latency"], itertools.count(1), 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        saved = stripe.api_base, stripe.api_key
+        stripe.api_base, stripe.api_key = f"http://127.0.0.1:{server.server_address[1]}", "sk_test_bench"
+        try:
+            with transaction.atomic():
+                product = Product.objects.create(
+                    name="Bench watch", price=100, stock=1_000, category="men", brand="Rolex", image="products/sample",
+                )
+                count = options["requests"]
+                self.measure_sync(self.customers("sync", count, product))
+                self.measure_async(self.customers("async", count, product), options["concurrency"], server)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            stripe.api_base, stripe.api_key = saved
+            server.shutdown()
+            server.server_close()
+
+    def customers(self, label, count, product):
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"intent-bench-{label}-{n}@example.com") for n in range(count)
+        )
+        carts = Cart.objects.bulk_create(Cart(user=user) for user in users)
+        CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=1) for cart in carts)
+        return users
+
+    def measure_sync(self, users):
+        view = CreatePaymentIntentView.as_view(throttle_classes=[])
+        factory = APIRequestFactory()
+        timings, statuses = [], []
+
+        for user in users:
+            request = factory.post(URL, {}, format="json", HTTP_IDEMPOTENCY_KEY=f"sync-{user.id}")
+            force_authenticate(request, user)
+            started = time.monotonic()
+            statuses.append(view(request).status_code)
+            timings.append(time.monotonic() - started)
+
+        self.report("sync, 1 worker", timings, sum(timings), statuses)
+
+    def measure_async(self, users, concurrency, server):
+        view = AsyncCreatePaymentIntentView.as_view(throttle_classes=[])
+        factory = AsyncRequestFactory()
+        requests = [
+            (f"Bearer {AccessToken.for_user(user)}", f"async-{user.id}") for user in users
+        ]
+
+        async def run():
+            slots = asyncio.Semaphore(concurrency)
+
+            async def one(token, key):
+                async with slots:
+                    request = factory.post(URL, {}, content_type="application/json",
+                                           headers={"Authorization": token, "Idempotency-Key": key})
+                    started = time.monotonic()
+                    response = await view(request)
+                    return time.monotonic() - started, response
+
+            started = time.monotonic()
+            results = await asyncio.gather(*(one(token, key) for token, key in requests))
+            return time.monotonic() - started, results
+
+        hits = server.hits
+        elapsed, results = async_to_sync(run)()
+        self.report(f"async, {concurrency} in flight", [t for t, _ in results], elapsed,
+                    [response.status_code for _, response in results])
+        first_pass, hits = server.hits - hits, server.hits
+
+        # Same keys again: every answer should come from the idempotency table
+        elapsed, results = async_to_sync(run)()
+        replayed = sum(response.get("Idempotent-Replayed") == "true" for _, response in results)
+        self.report("async replay", [t for t, _ in results], elapsed,
+                    [response.status_code for _, response in results])
+        self.stdout.write(
+            f"Stripe calls: {first_pass} on the first async pass, {server.hits - hits} on the replay "
+            f"({replayed}/{len(results)} replayed from the idempotency table)"
+        )
+
+    def report(self, label, timings, elapsed, statuses):
+        quantiles = statistics.quantiles(timings, n=20) if len(timings) > 1 else timings * 19
+        codes = ", ".join(f"{code}x{statuses.count(code)}" for code in sorted(set(statuses)))
+        self.stdout.write(
+            f"{label:>22}: {len(timings) / elapsed:7.1f} req/s, p50 {statistics.median(timings) * 1000:6.1f} ms, "
+            f"p95 {quantiles[18] * 1000:6.1f} ms ({codes})"
+        )
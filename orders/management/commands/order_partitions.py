@@ -0,0 +1,314 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from orders.models import Order, OrderItem
+
+TABLES = [Order._meta.db_table, OrderItem._meta.db_table]
+ARCHIVE_SCHEMA = "orders_archive"
+
+
+def month_start(moment):
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(moment, months):
+    month = moment.month - 1 + months
+    return moment.replace(year=moment.year + month // 12, month=month % 12 + 1, day=1)
+
+
+def q(name):
+    return connection.ops.quote_name(name)
+
+
+class Command(BaseCommand):
+    help = (
+        "Monthly range partitioning of orders_order / orders_orderitem on created_at (PostgreSQL 14+).\n"
+        "  convert  one-off cutover: the existing table becomes the first partition (no data copy)\n"
+        "  ensure   create partitions for the coming months (run daily from cron)\n"
+        "  archive  detach old partitions (monthly, then *_legacy once it is all old) into the orders_archive schema\n"
+        "  explain  show query plans for the order list queries to confirm partition pruning\n"
+        "  orphans  count order items whose order is gone (--delete removes them); item -> order has\n"
+        "           no database FK since orders may be partitioned, so run it after manual SQL deletes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["convert", "ensure", "archive", "explain", "orphans"])
+        parser.add_argument("--months-ahead", type=int, default=3, help="ensure: partitions to keep ready beyond this month.")
+        parser.add_argument("--older-than-months", type=int, default=24, help="archive: detach partitions that ended this many months ago.")
+        parser.add_argument("--concurrently", action="store_true", help="archive: DETACH ... CONCURRENTLY (no long lock).")
+        parser.add_argument("--drop", action="store_true", help="archive: drop detached partitions instead of keeping them.")
+        parser.add_argument("--delete", action="store_true", help="orphans: delete the orphaned items.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="orphans: items deleted per statement.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Order partitioning needs PostgreSQL.")
+
+        if options["action"] == "convert":
+            self.convert()
+            self.ensure(options["months_ahead"])
+        elif options["action"] == "ensure":
+            self.ensure(options["months_ahead"])
+        elif options["action"] == "archive":
+            self.archive(options["older_than_months"], options["concurrently"], options["drop"])
+        elif options["action"] == "orphans":
+            self.orphans(options["delete"], options["batch_size"])
+        else:
+            self.explain()
+
+    # ------------------------------------------------------------------
+    # Catalog helpers
+    # ------------------------------------------------------------------
+    def _is_partitioned(self, cursor, table):
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+        return cursor.fetchone() is not None
+
+    def _partitions(self, cursor, table):
+        """[(name, upper bound or None)] for every attached partition."""
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [table],
+        )
+        partitions = []
+        for name, bound in cursor.fetchall():
+            match = re.search(r"TO \('([^']+)'\)", bound or "")
+            partitions.append((name, parse_datetime(match.group(1)) if match else None))
+        return partitions
+
+    # ------------------------------------------------------------------
+    # convert
+    # ------------------------------------------------------------------
+    def convert(self):
+        boundary = add_months(month_start(timezone.now()), 1)
+
+        with connection.cursor() as cursor:
+            for table in TABLES:
+                if self._is_partitioned(cursor, table):
+                    raise CommandError(f"{table} is already partitioned.")
+
+            # Online preparation: the parent's primary key must be (id, created_at),
+            # and a validated CHECK lets ATTACH skip scanning the old rows.
+            for table in TABLES:
+                self.stdout.write(f"Preparing {table} ...")
+                cursor.execute(
+                    f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {q(table + '_id_created_uniq')} "
+                    f"ON {q(table)} (id, created_at)"
+                )
+                check = q(f"{table}_legacy_range")
+                cursor.execute(f"ALTER TABLE {q(table)} DROP CONSTRAINT IF EXISTS {check}")
+                cursor.execute(f"ALTER TABLE {q(table)} ADD CONSTRAINT {check} CHECK (created_at < %s) NOT VALID", [boundary])
+                cursor.execute(f"ALTER TABLE {q(table)} VALIDATE CONSTRAINT {check}")
+
+            # The swap itself only touches the catalog, so the lock is brief
+            with transaction.atomic():
+                cursor.execute("SET LOCAL lock_timeout = '5s'")
+                for table in TABLES:
+                    self._swap(cursor, table, boundary)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Converted {', '.join(TABLES)}; existing rows live in *_legacy (up to {boundary:%Y-%m-%d})."
+        ))
+        # Django still cascades order deletes to their items, but SQL run by
+        # hand no longer does: check with `order_partitions orphans`.
+        self.stdout.write("Order items have no database FK to their order; `order_partitions orphans` finds strays.")
+
+    def _swap(self, cursor, table, boundary):
+        legacy = f"{table}_legacy"
+
+        cursor.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid)
+            FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = to_regclass(%s) AND NOT x.indisprimary AND i.relname <> %s
+            """,
+            [table, f"{table}_id_created_uniq"],
+        )
+        indexes = cursor.fetchall()
+
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'f')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        primary_key = next(name for name, kind, _ in constraints if kind == "p")
+        foreign_keys = [(name, definition) for name, kind, definition in constraints if kind == "f"]
+
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {q(table)}")
+        next_id = cursor.fetchone()[0]
+
+        # Free the original names for the new parent
+        cursor.execute(f"ALTER TABLE {q(table)} RENAME TO {q(legacy)}")
+        # A partition's primary key must match the parent's (id, created_at);
+        # promote the unique index built above instead of keeping (id)
+        cursor.execute(f"ALTER TABLE {q(legacy)} DROP CONSTRAINT {q(primary_key)}")
+        cursor.execute(
+            f"ALTER TABLE {q(legacy)} ADD CONSTRAINT {q(legacy + '_pkey')} "
+            f"PRIMARY KEY USING INDEX {q(table + '_id_created_uniq')}"
+        )
+        for name, _ in indexes:
+            cursor.execute(f"ALTER INDEX {q(name)} RENAME TO {q(name[:56] + '_legacy')}")
+        cursor.execute(f"ALTER TABLE {q(legacy)} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+
+        cursor.execute(f"CREATE TABLE {q(table)} (LIKE {q(legacy)} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)")
+        sequence = f"{table}_id_seq"
+        cursor.execute(f"CREATE SEQUENCE {q(sequence)} AS bigint START WITH {int(next_id)} OWNED BY {q(table)}.id")
+        cursor.execute(f"ALTER TABLE {q(table)} ALTER COLUMN id SET DEFAULT nextval(%s)", [sequence])
+        cursor.execute(f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(table + '_pkey')} PRIMARY KEY (id, created_at)")
+
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {q(table)} ADD CONSTRAINT {q(name)} {definition}")
+        for _, definition in indexes:
+            # Captured before the rename, so it already targets the new parent;
+            # ATTACH adopts the matching *_legacy index instead of rebuilding it.
+            cursor.execute(definition)
+
+        cursor.execute(f"ALTER TABLE {q(table)} ATTACH PARTITION {q(legacy)} FOR VALUES FROM (MINVALUE) TO (%s)", [boundary])
+        self._create_default(cursor, table)
+
+    def _create_default(self, cursor, table):
+        # Safety net if `ensure` ever falls behind; should stay empty
+        cursor.execute(f"CREATE TABLE {q(table + '_default')} PARTITION OF {q(table)} DEFAULT")
+
+    # ------------------------------------------------------------------
+    # ensure
+    # ------------------------------------------------------------------
+    def ensure(self, months_ahead):
+        this_month = month_start(timezone.now())
+        last_month = add_months(this_month, months_ahead)
+
+        with connection.cursor() as cursor:
+            for table in TABLES:
+                if not self._is_partitioned(cursor, table):
+                    raise CommandError(f"{table} is not partitioned yet; run `order_partitions convert` first.")
+
+                legacy_end = dict(self._partitions(cursor, table)).get(f"{table}_legacy")
+                month = max(this_month, legacy_end) if legacy_end else this_month
+
+                while month <= last_month:
+                    name = f"{table}_p{month:%Y%m}"
+                    cursor.execute(
+                        f"CREATE TABLE IF NOT EXISTS {q(name)} PARTITION OF {q(table)} FOR VALUES FROM (%s) TO (%s)",
+                        [month, add_months(month, 1)],
+                    )
+                    month = add_months(month, 1)
+
+                cursor.execute(f"SELECT COUNT(*) FROM {q(table + '_default')}")
+                stray = cursor.fetchone()[0]
+                if stray:
+                    self.stderr.write(f"⚠️ {stray} row(s) in {table}_default; move them before creating their month.")
+
+        self.stdout.write(self.style.SUCCESS(f"Partitions ready through {last_month:%Y-%m}."))
+
+    # ------------------------------------------------------------------
+    # archive
+    # ------------------------------------------------------------------
+    def archive(self, older_than_months, concurrently, drop):
+        cutoff = add_months(month_start(timezone.now()), -older_than_months)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {q(ARCHIVE_SCHEMA)}")
+
+            for table in TABLES:
+                # Monthly partitions, and the pre-conversion *_legacy one once all of it is old enough
+                due = [
+                    name for name, upper in sorted(self._partitions(cursor, table))
+                    if re.fullmatch(rf"{table}_(p\d{{6}}|legacy)", name) and upper is not None and upper <= cutoff
+                ]
+                if not due:
+                    continue
+
+                # PostgreSQL refuses DETACH ... CONCURRENTLY while a default partition exists
+                without_default = concurrently and self._drop_default(cursor, table)
+                try:
+                    for name in due:
+                        self._archive_partition(cursor, table, name, concurrently, drop)
+                finally:
+                    if without_default:
+                        with transaction.atomic():
+                            cursor.execute("SET LOCAL lock_timeout = '5s'")
+                            self._create_default(cursor, table)
+
+    def _drop_default(self, cursor, table):
+        """Drop the (empty) default partition; False when there is none."""
+        default = f"{table}_default"
+        if default not in dict(self._partitions(cursor, table)):
+            return False
+
+        with transaction.atomic():
+            cursor.execute("SET LOCAL lock_timeout = '5s'")
+            cursor.execute(f"LOCK TABLE {q(table)} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(f"SELECT COUNT(*) FROM {q(default)}")
+            stray = cursor.fetchone()[0]
+            if stray:
+                raise CommandError(
+                    f"{stray} row(s) in {default}; move them before archiving --concurrently."
+                )
+            cursor.execute(f"DROP TABLE {q(default)}")
+        return True
+
+    def _archive_partition(self, cursor, table, name, concurrently, drop):
+        detach = f"ALTER TABLE {q(table)} DETACH PARTITION {q(name)}"
+        cursor.execute(detach + (" CONCURRENTLY" if concurrently else ""))
+
+        if drop:
+            cursor.execute(f"DROP TABLE {q(name)}")
+            self.stdout.write(f"Dropped {name}")
+        else:
+            cursor.execute(f"ALTER TABLE {q(name)} SET SCHEMA {q(ARCHIVE_SCHEMA)}")
+            self.stdout.write(f"Archived {name} -> {ARCHIVE_SCHEMA}.{name}")
+
+    # ------------------------------------------------------------------
+    # explain
+    # ------------------------------------------------------------------
+    def explain(self):
+        this_month = month_start(timezone.now())
+        user_id = Order.objects.values_list("user_id", flat=True).first()
+        newest_first = ("-created_at", "-id")
+
+        plans = {
+            "Customer order list, first page (Merge Append, LIMIT stops early)":
+                Order.objects.filter(user_id=user_id).order_by(*newest_first)[:20],
+            "Customer order list, later page (cursor bound prunes newer months)":
+                Order.objects.filter(user_id=user_id, created_at__lt=this_month).order_by(*newest_first)[:20],
+            "Admin list filtered to last month (prunes to one or two partitions)":
+                Order.objects.filter(status="processing", created_at__gte=add_months(this_month, -1)).order_by(*newest_first)[:20],
+        }
+        for title, queryset in plans.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain())
+            self.stdout.write("")
+
+    # ------------------------------------------------------------------
+    # orphans
+    # ------------------------------------------------------------------
+    def orphans(self, delete, batch_size):
+        # orders_orderitem.order_id has no FK constraint (a partitioned
+        # orders_order can't back one on id alone), so only the ORM cascade
+        # keeps items from outliving their order
+        orders, items = q(Order._meta.db_table), q(OrderItem._meta.db_table)
+        orphaned = f"SELECT i.id FROM {items} AS i WHERE NOT EXISTS (SELECT 1 FROM {orders} AS o WHERE o.id = i.order_id)"
+
+        with connection.cursor() as cursor:
+            if not delete:
+                cursor.execute(f"SELECT COUNT(*) FROM ({orphaned}) AS orphans")
+                count = cursor.fetchone()[0]
+                style = self.style.WARNING if count else self.style.SUCCESS
+                self.stdout.write(style(f"{count} order item(s) without an order."))
+                return
+
+            deleted = 0
+            while True:
+                cursor.execute(f"DELETE FROM {items} WHERE id IN ({orphaned} LIMIT %s)", [batch_size])
+                deleted += cursor.rowcount
+                if cursor.rowcount < batch_size:
+                    break
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} order item(s) without an order."))
@@ -0,0 +1,52 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from orders.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete Idempotency-Key records older than the retention window "
+        "(IDEMPOTENCY_KEY_RETENTION_HOURS; schedule it hourly)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours", type=int, default=settings.IDEMPOTENCY_KEY_RETENTION_HOURS,
+            help="Delete keys created more than this many hours ago.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000, help="Keys deleted per statement.")
+        parser.add_argument("--sleep", type=float, default=0.0, help="Pause between batches, in seconds.")
+
+    def handle(self, *args, **options):
+        table = connection.ops.quote_name(IdempotencyKey._meta.db_table)
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        started = time.monotonic()
+        deleted = 0
+
+        while True:
+            # Short statements on the created_at index; a stale in-progress
+            # key taken over meanwhile gets a new created_at and is kept
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    DELETE FROM {table} WHERE id IN (
+                        SELECT id FROM {table} WHERE created_at < %s LIMIT %s
+                    ) AND created_at < %s
+                    """,
+                    [cutoff, options["batch_size"], cutoff],
+                )
+                batch = cursor.rowcount
+            deleted += batch
+            if batch < options["batch_size"]:
+                break
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"Purged {deleted} idempotency key(s) in {elapsed:.1f}s"))
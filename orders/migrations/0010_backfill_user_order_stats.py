@@ -0,0 +1,35 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:00
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_order_stats(apps, schema_editor):
+    User = apps.get_model('Accounts', 'User')
+    Order = apps.get_model('orders', 'Order')
+
+    per_user = Order.objects.filter(user=OuterRef('pk')).order_by().values('user')
+    live = per_user.exclude(status='cancelled')
+
+    User.objects.update(
+        order_count=Coalesce(Subquery(live.annotate(n=Count('id')).values('n')), Value(0)),
+        lifetime_value=Coalesce(
+            Subquery(live.annotate(total=Sum('total_price')).values('total')),
+            Value(0), output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        # Cancelled orders don't count, as in record_customer_cancellations
+        last_order_at=Subquery(live.annotate(last=Max('created_at')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_sales_rollups'),
+        ('Accounts', '0004_user_order_stats_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_user_order_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0011_alter_order_user'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentintentrecord',
+            name='amount',
+            field=models.PositiveBigIntegerField(),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.9 on 2026-10-19 10:00
+
+from django.db import migrations
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    # rebuild() is raw SQL over the order and rollup tables, so it reads the
+    # same schema here as at runtime
+    from orders.rollups import rebuild
+
+    rebuild()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0012_alter_paymentintentrecord_amount'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop),
+    ]
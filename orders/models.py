@@ -1,5 +1,9 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from cloudinary.models import CloudinaryField
 from products.models import Product
 
 class Order(models.Model):
@@ -11,7 +15,9 @@ class Order(models.Model):
         ('cancelled', 'Cancelled'),
     )
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders')
+    # Indexed by order_user_created_idx (user, created_at) below; a separate
+    # user_id index would only duplicate its leading column
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='orders', db_index=False)
     full_name = models.CharField(max_length=100)
     address = models.TextField()
     city = models.CharField(max_length=100)
@@ -25,14 +31,122 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Admin filters (see orders/filters.py) and newest-first pagination
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+            models.Index(fields=['created_at', 'id'], name='order_created_id_idx'),
+            models.Index(Upper('city'), 'created_at', name='order_city_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.email}"
 
 class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # No database FK: orders_order may be range-partitioned, and a partitioned
+    # table can't back a foreign key on `id` alone (see `order_partitions`).
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items', db_constraint=False)
+    # Kept for reference only; order history renders from the snapshot below
+    product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=1)
 
+    # Product snapshot taken at purchase (unaffected by later edits/deletes)
+    product_name = models.CharField(max_length=255, blank=True)
+    product_brand = models.CharField(max_length=50, blank=True)
+    product_category = models.CharField(max_length=10, blank=True)
+    product_image = CloudinaryField("image", blank=True, null=True)
+
+    # Copy of order.created_at: the partition key, keeps items in their order's month
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name}"
+
+
+class IdempotencyKey(models.Model):
+    """First response for an (user, Idempotency-Key) pair, replayed on retries."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key_per_user'),
+        ]
+        indexes = [
+            # Supports `manage.py purge_idempotency_keys`
+            models.Index(fields=['created_at'], name='orders_idem_created_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.endpoint})"
+
+
+class PaymentIntentRecord(models.Model):
+    """The user's open Stripe PaymentIntent and the cart it was priced for."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='payment_intent')
+    intent_id = models.CharField(max_length=255)
+    client_secret = models.CharField(max_length=255)
+    cart_fingerprint = models.CharField(max_length=64)
+    amount = models.PositiveBigIntegerField()  # in paise; bigint, as int32 tops out at ₹2.1 crore
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.intent_id} for {self.user}"
+
+
+class StripeEvent(models.Model):
+    """Verified Stripe webhook event, stored once per Stripe event id."""
+    event_id = models.CharField(max_length=255, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.type} ({self.event_id})"
+
+
+# ==========================================
+# Sales rollups (maintained by orders/rollups.py)
+# ==========================================
+class DailyOrderRollup(models.Model):
+    """Orders and revenue per day and status."""
+    day = models.DateField()
+    status = models.CharField(max_length=20)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='unique_order_rollup_day_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders}"
+
+
+class DailySalesRollup(models.Model):
+    """Orders, units and revenue per day, brand, category and status (from order items)."""
+    day = models.DateField()
+    brand = models.CharField(max_length=50)
+    category = models.CharField(max_length=10)
+    status = models.CharField(max_length=20)
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'brand', 'category', 'status'], name='unique_sales_rollup_key'),
+        ]
+
     def __str__(self):
-        return f"{self.quantity} x {self.product.name}"
\ No newline at end of file
+        return f"{self.day} {self.brand}/{self.category} {self.status}: {self.units}"
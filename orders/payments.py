@@ -0,0 +1,141 @@
+# orders/payments.py
+import hashlib
+from datetime import timedelta
+
+import stripe
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.db.models import CharField, F, Sum, Value
+from django.db.models.functions import Cast, Concat
+from django.utils import timezone
+
+import outbound
+from cart.models import CartItem
+from .models import PaymentIntentRecord
+
+# Stripe failures that mean "the provider is struggling", not "bad request"
+STRIPE_ERRORS = (stripe.APIConnectionError, stripe.APIError, stripe.RateLimitError)
+
+# PaymentIntent statuses that can still take a new amount and be confirmed
+REUSABLE_STATUSES = {'requires_payment_method', 'requires_confirmation', 'requires_action'}
+
+
+def cart_totals(user):
+    """
+    Total and fingerprint of the user's cart in one aggregate query.
+
+    The fingerprint covers every (product, quantity, current price), so it
+    changes whenever the amount to charge could change.
+    """
+    line = Concat(
+        Cast('product_id', CharField()), Value(':'),
+        Cast('quantity', CharField()), Value(':'),
+        Cast('product__price', CharField()),
+        output_field=CharField(),
+    )
+    result = CartItem.objects.filter(cart__user=user).aggregate(
+        total=Sum(F('product__price') * F('quantity')),
+        lines=StringAgg(line, delimiter=',', ordering='product_id'),
+    )
+    if result['total'] is None:
+        return None, None
+    return result['total'], hashlib.sha256(result['lines'].encode()).hexdigest()
+
+
+def get_or_create_intent(user, amount, fingerprint, idempotency_key=None):
+    """
+    Return ``(intent_id, client_secret)`` for this cart, reusing the user's
+    open PaymentIntent where possible:
+
+    * same cart, recently priced -> reuse it with no Stripe call
+    * cart changed               -> PaymentIntent.modify the open intent
+    * no usable intent           -> PaymentIntent.create
+    """
+    record = PaymentIntentRecord.objects.filter(user=user).first()
+    reuse_window = timedelta(seconds=settings.PAYMENT_INTENT_REUSE_SECONDS)
+
+    if record and record.cart_fingerprint == fingerprint and record.updated_at > timezone.now() - reuse_window:
+        return record.intent_id, record.client_secret
+
+    intent = None
+    if record:
+        try:
+            intent = outbound.call(
+                'stripe',
+                lambda: stripe.PaymentIntent.modify(record.intent_id, amount=amount),
+                errors=STRIPE_ERRORS,
+            )
+        except stripe.InvalidRequestError:
+            intent = None  # Paid, cancelled or gone: start a new one
+        if intent is not None and intent['status'] not in REUSABLE_STATUSES:
+            intent = None
+
+    if intent is None:
+        options = {'idempotency_key': idempotency_key} if idempotency_key else {}
+        intent = outbound.call(
+            'stripe',
+            lambda: stripe.PaymentIntent.create(
+                amount=amount,
+                currency='inr',
+                metadata={'user_id': user.id},
+                **options
+            ),
+            errors=STRIPE_ERRORS,
+        )
+
+    PaymentIntentRecord.objects.update_or_create(
+        user=user,
+        defaults={
+            'intent_id': intent['id'],
+            'client_secret': intent['client_secret'],
+            'cart_fingerprint': fingerprint,
+            'amount': amount,
+        },
+    )
+    return intent['id'], intent['client_secret']
+
+
+async def aget_or_create_intent(user, amount, fingerprint, idempotency_key=None):
+    """Async ``get_or_create_intent`` (Stripe's ``*_async`` calls over httpx)."""
+    record = await PaymentIntentRecord.objects.filter(user=user).afirst()
+    reuse_window = timedelta(seconds=settings.PAYMENT_INTENT_REUSE_SECONDS)
+
+    if record and record.cart_fingerprint == fingerprint and record.updated_at > timezone.now() - reuse_window:
+        return record.intent_id, record.client_secret
+
+    intent = None
+    if record:
+        try:
+            intent = await outbound.acall(
+                'stripe',
+                lambda: stripe.PaymentIntent.modify_async(record.intent_id, amount=amount),
+                errors=STRIPE_ERRORS,
+            )
+        except stripe.InvalidRequestError:
+            intent = None  # Paid, cancelled or gone: start a new one
+        if intent is not None and intent['status'] not in REUSABLE_STATUSES:
+            intent = None
+
+    if intent is None:
+        options = {'idempotency_key': idempotency_key} if idempotency_key else {}
+        intent = await outbound.acall(
+            'stripe',
+            lambda: stripe.PaymentIntent.create_async(
+                amount=amount,
+                currency='inr',
+                metadata={'user_id': user.id},
+                **options
+            ),
+            errors=STRIPE_ERRORS,
+        )
+
+    await PaymentIntentRecord.objects.aupdate_or_create(
+        user=user,
+        defaults={
+            'intent_id': intent['id'],
+            'client_secret': intent['client_secret'],
+            'cart_fingerprint': fingerprint,
+            'amount': amount,
+        },
+    )
+    return intent['id'], intent['client_secret']
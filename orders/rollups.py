@@ -0,0 +1,213 @@
+# orders/rollups.py
+"""
+Daily sales rollups for the admin dashboard.
+
+``DailyOrderRollup`` (day x status) and ``DailySalesRollup`` (day x brand x
+category x status) are kept current with signed deltas: checkout adds the
+new order under its status, a status change moves it from the previous
+status to the new one. Each call is one ``INSERT ... ON CONFLICT DO UPDATE``
+per table, run in the caller's transaction, so the rollups commit (or roll
+back) together with the order change.
+
+The same two paths keep each customer's ``order_count``,
+``lifetime_value`` and ``last_order_at`` on the user row current.
+
+Anything that bypasses those paths (admin deletes, user deletion) is fixed
+by ``manage.py rebuild_sales_rollups``.
+"""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import DailyOrderRollup, DailySalesRollup, Order, OrderItem
+
+User = get_user_model()
+
+# `deltas` must yield (order_id, status, sign) rows.
+ORDER_ROLLUP_SQL = """
+WITH d AS ({deltas})
+INSERT INTO {order_rollup} AS r (day, status, orders, revenue)
+SELECT (o.created_at AT TIME ZONE %(tz)s)::date, d.status, SUM(d.sign), SUM(d.sign * o.total_price)
+FROM d JOIN {orders} AS o ON o.id = d.order_id
+GROUP BY 1, 2
+ORDER BY 1, 2
+ON CONFLICT (day, status) DO UPDATE
+SET orders = r.orders + EXCLUDED.orders,
+    revenue = r.revenue + EXCLUDED.revenue
+"""
+
+SALES_ROLLUP_SQL = """
+WITH d AS ({deltas})
+INSERT INTO {sales_rollup} AS r (day, brand, category, status, orders, units, revenue)
+SELECT x.day, x.brand, x.category, d.status, SUM(d.sign), SUM(d.sign * x.units), SUM(d.sign * x.revenue)
+FROM d JOIN (
+    SELECT order_id,
+           (created_at AT TIME ZONE %(tz)s)::date AS day,
+           product_brand AS brand,
+           product_category AS category,
+           SUM(quantity) AS units,
+           SUM(price * quantity) AS revenue
+    FROM {items}
+    WHERE order_id IN (SELECT order_id FROM d)
+    GROUP BY 1, 2, 3, 4
+) AS x ON x.order_id = d.order_id
+GROUP BY 1, 2, 3, 4
+ORDER BY 1, 2, 3, 4
+ON CONFLICT (day, brand, category, status) DO UPDATE
+SET orders = r.orders + EXCLUDED.orders,
+    units = r.units + EXCLUDED.units,
+    revenue = r.revenue + EXCLUDED.revenue
+"""
+
+DELTAS_SQL = (
+    "SELECT order_id, status, sign "
+    "FROM unnest(%(ids)s::bigint[], %(statuses)s::varchar[], %(signs)s::int[]) AS u(order_id, status, sign)"
+)
+
+
+def _tables():
+    quote = connection.ops.quote_name
+    return {
+        'orders': quote(Order._meta.db_table),
+        'items': quote(OrderItem._meta.db_table),
+        'order_rollup': quote(DailyOrderRollup._meta.db_table),
+        'sales_rollup': quote(DailySalesRollup._meta.db_table),
+    }
+
+
+def _apply(deltas, params):
+    tables = _tables()
+    params = {'tz': settings.TIME_ZONE, **params}
+    with connection.cursor() as cursor:
+        cursor.execute(ORDER_ROLLUP_SQL.format(deltas=deltas, **tables), params)
+        cursor.execute(SALES_ROLLUP_SQL.format(deltas=deltas, **tables), params)
+
+
+def _apply_deltas(rows):
+    """rows: iterable of (order_id, status, +1/-1)."""
+    rows = list(rows)
+    if not rows:
+        return
+    ids, statuses, signs = (list(column) for column in zip(*rows))
+    _apply(DELTAS_SQL, {'ids': ids, 'statuses': statuses, 'signs': signs})
+
+
+def record_new_orders(order_ids, status='pending'):
+    """Count freshly created orders (after their items are written)."""
+    _apply_deltas((order_id, status, 1) for order_id in order_ids)
+
+
+def record_status_changes(transitioned, new_status):
+    """Move orders from their previous status to ``new_status``; takes ``transition_orders`` rows."""
+    _apply_deltas(
+        row
+        for order_id, _, previous in transitioned
+        for row in ((order_id, previous, -1), (order_id, new_status, 1))
+    )
+
+
+# ------------------------------------------------------------------
+# Per-customer aggregates (User.order_count / lifetime_value / last_order_at)
+# ------------------------------------------------------------------
+def record_customer_order(order):
+    User.objects.filter(pk=order.user_id).update(
+        order_count=F('order_count') + 1,
+        lifetime_value=F('lifetime_value') + order.total_price,
+        last_order_at=order.created_at,
+    )
+
+
+def record_customer_cancellations(order_ids):
+    """Take cancelled orders back out of their owners' count, lifetime value and last order date."""
+    if not order_ids:
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            UPDATE {quote(User._meta.db_table)} AS u
+            SET order_count = GREATEST(u.order_count - c.orders, 0),
+                lifetime_value = u.lifetime_value - c.total,
+                -- The latest order still standing (order_user_created_idx, newest first)
+                last_order_at = (
+                    SELECT MAX(o.created_at) FROM {quote(Order._meta.db_table)} AS o
+                    WHERE o.user_id = u.id AND o.status <> 'cancelled'
+                )
+            FROM (
+                SELECT user_id, COUNT(*) AS orders, SUM(total_price) AS total
+                FROM {quote(Order._meta.db_table)}
+                WHERE id = ANY(%s)
+                GROUP BY user_id
+            ) AS c
+            WHERE u.id = c.user_id
+            """,
+            [list(order_ids)],
+        )
+
+
+def rebuild(since=None):
+    """
+    Recompute the rollups from the orders, for days from ``since`` (a date)
+    onwards or for everything. Returns the total order count now rolled up.
+    """
+    tables = _tables()
+    params = {'tz': settings.TIME_ZONE, 'since': since, 'since_at': None}
+    created_filter = ""
+    if since:
+        params['since_at'] = timezone.make_aware(datetime.combine(since, time.min))
+        created_filter = "WHERE created_at >= %(since_at)s"
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Checkouts/status changes wait here instead of adding deltas to
+            # rows we're about to rewrite; they apply theirs after we commit.
+            cursor.execute(
+                f"LOCK TABLE {tables['order_rollup']}, {tables['sales_rollup']} IN EXCLUSIVE MODE"
+            )
+            cursor.execute(f"DELETE FROM {tables['order_rollup']} WHERE %(since)s IS NULL OR day >= %(since)s", params)
+            cursor.execute(f"DELETE FROM {tables['sales_rollup']} WHERE %(since)s IS NULL OR day >= %(since)s", params)
+
+            deltas = f"SELECT id AS order_id, status, 1 AS sign FROM {tables['orders']} {created_filter}"
+            cursor.execute(ORDER_ROLLUP_SQL.format(deltas=deltas, **tables), params)
+            cursor.execute(SALES_ROLLUP_SQL.format(deltas=deltas, **tables), params)
+
+            cursor.execute(f"SELECT COALESCE(SUM(orders), 0) FROM {tables['order_rollup']}")
+            return cursor.fetchone()[0]
+
+
+# Dimensions the series endpoint can break revenue down by
+BREAKDOWNS = ('brand', 'category', 'status')
+
+
+def sales_series(start, end, statuses=None, breakdown='brand'):
+    """
+    Daily totals between ``start`` and ``end`` (dates, inclusive), read from
+    the rollups only: ``{'days': [...], 'breakdown': [...]}``.
+    """
+    orders = DailyOrderRollup.objects.filter(day__range=(start, end))
+    sales = DailySalesRollup.objects.filter(day__range=(start, end))
+    if statuses:
+        orders = orders.filter(status__in=statuses)
+        sales = sales.filter(status__in=statuses)
+
+    days = (
+        orders.values('day')
+        .annotate(orders=Sum('orders'), revenue=Sum('revenue'))
+        .order_by('day')
+    )
+    lines = (
+        sales.values('day', breakdown)
+        .annotate(orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('day', breakdown)
+    )
+    return {'days': list(days), 'breakdown': list(lines)}
+
+
+def totals():
+    """All-time order count and revenue (every status), from the rollups."""
+    result = DailyOrderRollup.objects.aggregate(orders=Sum('orders'), revenue=Sum('revenue'))
+    return result['orders'] or 0, result['revenue'] or 0
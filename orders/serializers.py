@@ -1,13 +1,22 @@
 from rest_framework import serializers
 from .models import Order, OrderItem
-from products.serializers import ProductSerializer
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    # Built from the purchase-time snapshot, never from the live product
+    product = serializers.SerializerMethodField()
+
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'price', 'quantity']
 
+    def get_product(self, obj):
+        return {
+            'id': obj.product_id,
+            'name': obj.product_name,
+            'brand': obj.product_brand,
+            'image': obj.product_image.url if obj.product_image else None,
+        }
+
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
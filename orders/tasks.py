@@ -0,0 +1,97 @@
+# orders/tasks.py
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.queue import register
+from .models import Order, PaymentIntentRecord, StripeEvent
+from .transitions import transition_orders
+
+HANDLED_EVENTS = (
+    'payment_intent.succeeded', 'payment_intent.payment_failed', 'payment_intent.canceled', 'charge.refunded',
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _objects(events, event_type):
+    return [e.payload['data']['object'] for e in events if e.type == event_type]
+
+
+def _intent_id(obj):
+    # Charges point at their PaymentIntent; intents are the object itself
+    return obj['payment_intent'] if obj['object'] == 'charge' else obj['id']
+
+
+def _apply_payment_succeeded(events):
+    """Move paid orders to processing; returns the events that matched no order yet."""
+    succeeded = [e for e in events if e.type == 'payment_intent.succeeded']
+    if not succeeded:
+        return []
+    intent_ids = [e.payload['data']['object']['id'] for e in succeeded]
+    matched = set(Order.objects.filter(payment_id__in=intent_ids).values_list('payment_id', flat=True))
+    order_ids = Order.objects.filter(payment_id__in=matched, status='pending').values_list('id', flat=True)
+    transition_orders(list(order_ids), 'processing')
+    PaymentIntentRecord.objects.filter(intent_id__in=matched).delete()
+
+    # Stripe can report the payment before checkout has committed the order
+    return [e for e in succeeded if e.payload['data']['object']['id'] not in matched]
+
+
+def _cancel_orders_for(events, event_type):
+    objects = _objects(events, event_type)
+    if event_type == 'charge.refunded':
+        # Partial refunds leave the order as it is
+        objects = [charge for charge in objects if charge.get('refunded')]
+
+    intent_ids = [_intent_id(obj) for obj in objects if _intent_id(obj)]
+    if not intent_ids:
+        return
+
+    order_ids = Order.objects.filter(payment_id__in=intent_ids).values_list('id', flat=True)
+    _, rejected = transition_orders(list(order_ids), 'cancelled')
+    for order_id, current in rejected.items():
+        if current != 'cancelled':
+            logger.warning("%s: order #%s is %s, left unchanged", event_type, order_id, current)
+
+
+def _record_payment_failures(events):
+    # A decline leaves the PaymentIntent open and the customer can retry it
+    # (another card, 3DS); the order is only cancelled once Stripe cancels
+    # the intent. The failure itself stays on record in StripeEvent.
+    for intent in _objects(events, 'payment_intent.payment_failed'):
+        error = intent.get('last_payment_error') or {}
+        logger.warning(
+            "Payment failed for %s: %s", intent['id'], error.get('decline_code') or error.get('code') or 'unknown',
+        )
+
+
+@register('stripe_event')
+def process_stripe_events(jobs):
+    """
+    Apply a batch of stored Stripe events to orders in one transaction.
+
+    A payment that matches no order yet stays unprocessed and its job fails,
+    so the worker retries it once checkout has committed.
+    """
+    event_ids = [job.payload['event'] for job in jobs]
+    events = list(
+        StripeEvent.objects.filter(id__in=event_ids, processed_at__isnull=True)
+        .order_by('id')
+    )
+
+    with transaction.atomic():
+        waiting = _apply_payment_succeeded(events)
+        _record_payment_failures(events)
+        _cancel_orders_for(events, 'payment_intent.canceled')
+        _cancel_orders_for(events, 'charge.refunded')
+
+        done = [e.id for e in events if e not in waiting]
+        StripeEvent.objects.filter(id__in=done).update(processed_at=timezone.now())
+
+    waiting = {e.id: e.payload['data']['object']['id'] for e in waiting}
+    return {
+        job.id: f"No order for {waiting[job.payload['event']]} yet"
+        for job in jobs if job.payload['event'] in waiting
+    }
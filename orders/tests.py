@@ -1,3 +1,929 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import importlib
+import io
+import hmac
+import json
+import threading
+import time
+import tracemalloc
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import cloudinary
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.core.management import CommandError, call_command
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from cart.models import Cart, CartItem
+from jobs.models import Job
+from products.models import Product
+from jobs.worker import run_batch
+from .async_views import AsyncCreatePaymentIntentView
+from .checkout import place_order
+from .consumers import CLOSE_UNAUTHORIZED
+from .events import LocalBroker, get_broker
+from .export import stream_csv, stream_jsonl
+from .management.commands import order_partitions
+from .filters import filter_admin_orders
+from .idempotency import IN_PROGRESS_TIMEOUT
+from .models import IdempotencyKey, Order, OrderItem, PaymentIntentRecord, StripeEvent
+from .rollups import rebuild, record_customer_order
+from .transitions import transition_orders
+from .views import CreateOrderView, CreatePaymentIntentView
+
+User = get_user_model()
+
+
+def make_order(user, lines=3, **fields):
+    order = Order.objects.create(
+        user=user, full_name='A', address='B', city=fields.pop('city', 'Kochi'), state='Kerala',
+        zip_code='682001', phone='9999999999', total_price=fields.pop('total_price', '300.00'), **fields,
+    )
+    OrderItem.objects.bulk_create(
+        OrderItem(order=order, price='100.00', quantity=1, product_name=f'Watch {n}',
+                  product_brand='Rolex', product_category='men', created_at=order.created_at)
+        for n in range(lines)
+    )
+    return order
+
+
+class OrderHistoryQueryCountTests(TestCase):
+    """A page costs the same two queries (orders, then their items) however big the history."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        self.admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        self.client = APIClient()
+
+    def assert_pages_cost(self, url, queries, pages):
+        for _ in range(pages):
+            with self.assertNumQueries(queries):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            url = response.data['next']
+        self.assertIsNone(url)
+
+    def test_customer_history(self):
+        for _ in range(45):
+            make_order(self.user, lines=5)
+        self.client.force_authenticate(self.user)
+        self.assert_pages_cost('/api/orders/my-orders/', 2, pages=3)
+
+    def test_customer_history_is_independent_of_line_count(self):
+        for _ in range(5):
+            make_order(self.user, lines=40)
+        self.client.force_authenticate(self.user)
+        self.assert_pages_cost('/api/orders/my-orders/', 2, pages=1)
+
+    def test_admin_list(self):
+        for _ in range(45):
+            make_order(self.user, lines=2)
+        self.client.force_authenticate(self.admin)
+        self.assert_pages_cost('/api/orders/admin/all/?status=pending&email=buyer@example.com', 2, pages=3)
+
+
+class PlaceOrderTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        self.cart = Cart.objects.create(user=self.user)
+        self.shipping = {'full_name': 'A', 'address': 'B', 'city': 'Kochi', 'state': 'Kerala',
+                         'zip_code': '682001', 'phone': '9999999999'}
+
+    def fill_cart(self, lines):
+        products = Product.objects.bulk_create(
+            Product(name=f'Watch {n}', price=f'{100 + n}.50', stock=10, category='men',
+                    brand='Rolex', image='products/sample')
+            for n in range(lines)
+        )
+        CartItem.objects.bulk_create(CartItem(cart=self.cart, product=product, quantity=2) for product in products)
+        return products
+
+    def test_total_matches_the_copied_lines(self):
+        self.fill_cart(3)
+        with transaction.atomic():
+            order = place_order(self.cart, self.shipping)
+
+        order.refresh_from_db()
+        self.assertEqual(order.total_price, Decimal('609.00'))  # (100.50 + 101.50 + 102.50) x 2
+        self.assertEqual(
+            list(order.items.order_by('id').values_list('product_name', 'quantity')),
+            [('Watch 0', 2), ('Watch 1', 2), ('Watch 2', 2)],
+        )
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_empty_cart_places_nothing(self):
+        with transaction.atomic():
+            self.assertIsNone(place_order(self.cart, self.shipping))
+        self.assertFalse(Order.objects.exists())
+
+    def test_statement_count_does_not_depend_on_cart_size(self):
+        self.fill_cart(1)
+        with transaction.atomic(), self.assertNumQueries(6):
+            place_order(self.cart, self.shipping)
+
+        self.fill_cart(60)
+        with transaction.atomic(), self.assertNumQueries(6):
+            place_order(self.cart, self.shipping)
+
+
+class OrderItemSnapshotTests(TestCase):
+    """Order history renders from the purchase-time snapshot, not the live product."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        self.product = Product.objects.create(
+            name='Submariner', price='100.00', stock=10, category='men', brand='Rolex', image='products/sample',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        config = cloudinary.config()
+        self.addCleanup(setattr, config, 'cloud_name', config.cloud_name)
+        config.cloud_name = config.cloud_name or 'test'
+
+    def test_line_survives_the_product_being_deleted(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        with transaction.atomic():
+            place_order(cart, {'full_name': 'A', 'address': 'B', 'city': 'Kochi', 'state': 'Kerala',
+                               'zip_code': '682001', 'phone': '9999999999'})
+        image_url = Product.objects.get(pk=self.product.pk).image.url
+
+        self.product.delete()
+
+        item = self.client.get('/api/orders/my-orders/').data['results'][0]['items'][0]
+        self.assertEqual(item['product'], {'id': None, 'name': 'Submariner', 'brand': 'Rolex', 'image': image_url})
+        self.assertEqual((item['price'], item['quantity']), ('100.00', 2))
+
+    def test_migration_backfills_the_snapshot(self):
+        migration = importlib.import_module('orders.migrations.0003_orderitem_product_snapshot')
+        order = make_order(self.user, lines=0)
+        item = OrderItem.objects.create(order=order, product=self.product, price='100.00', created_at=order.created_at)
+        orphan = OrderItem.objects.create(order=order, product=None, price='50.00', created_at=order.created_at)
+
+        migration.backfill_snapshots(apps, None)
+
+        item.refresh_from_db()
+        self.assertEqual((item.product_name, item.product_brand, str(item.product_image)),
+                         ('Submariner', 'Rolex', str(self.product.image)))
+        orphan.refresh_from_db()
+        self.assertEqual((orphan.product_name, orphan.product_image), ('', None))
+
+
+class SalesSeriesTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def test_rebuild_counts_orders_placed_before_the_rollups(self):
+        make_order(self.user, lines=2)
+        make_order(self.user, lines=1, status='shipped')
+        self.assertEqual(rebuild(), 2)
+
+        today = timezone.localdate().isoformat()
+        response = self.client.get(f'/api/orders/admin/stats/series/?start={today}&end={today}&breakdown=status')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['days'][0]['orders'], 2)
+
+    def test_impossible_dates_are_a_bad_request(self):
+        for query in ('start=2026-02-30', 'end=2026-13-01', 'start=yesterday'):
+            response = self.client.get(f'/api/orders/admin/stats/series/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+
+class ConfirmationEmailTests(TestCase):
+
+    def test_queued_for_users_without_a_first_name(self):
+        user = User.objects.create_user(email='noname@example.com', password='x')
+        order = Order.objects.create(user=user, full_name='A', address='B', city='C', state='D',
+                                     zip_code='1', phone='2', total_price='10.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CreateOrderView().send_confirmation_email(user, order)
+
+        bodies = list(Job.objects.filter(kind='email').order_by('id').values_list('payload__body', flat=True))
+        self.assertEqual(len(bodies), 2)
+        self.assertIn('Dear noname@example.com', bodies[0])
+
+
+class PaymentIntentRecordTests(TestCase):
+
+    def test_amount_holds_the_largest_order_total(self):
+        # Order.total_price allows up to 99,999,999.99 rupees
+        user = User.objects.create_user(email='buyer@example.com', password='x')
+        PaymentIntentRecord.objects.create(
+            user=user, intent_id='pi_1', client_secret='secret', cart_fingerprint='f', amount=9_999_999_999,
+        )
+        self.assertEqual(PaymentIntentRecord.objects.get(user=user).amount, 9_999_999_999)
+
+
+class PaymentIntentIdempotencyTests(TestCase):
+    """Idempotency-Key handling of the sync PaymentIntent view."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        product = Product.objects.create(
+            name='Submariner', price='100.00', stock=5, category='men', brand='Rolex', image='products/sample',
+        )
+        CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=product, quantity=2)
+        self.view = CreatePaymentIntentView.as_view(throttle_classes=[])
+
+    def post(self, key, body=None):
+        request = APIRequestFactory().post(
+            '/api/orders/create-payment-intent/', body or {}, format='json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+        force_authenticate(request, self.user)
+        return self.view(request)
+
+    def stripe(self, **options):
+        options.setdefault('return_value', ('pi_1', 'pi_1_secret'))
+        return mock.patch('orders.views.get_or_create_intent', **options)
+
+    def test_retry_is_replayed(self):
+        with self.stripe() as create:
+            first = self.post('checkout-1')
+            second = self.post('checkout-1')
+
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(second.data, {'clientSecret': 'pi_1_secret'})
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    def test_key_reused_for_another_request_is_refused(self):
+        with self.stripe() as create:
+            self.post('checkout-1')
+            response = self.post('checkout-1', {'coupon': 'X'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(create.call_count, 1)
+
+    def test_key_in_progress_is_a_conflict_until_it_goes_stale(self):
+        IdempotencyKey.objects.create(
+            user=self.user, key='checkout-1', endpoint='/api/orders/create-payment-intent/',
+            request_hash=hashlib.sha256(b'{}').hexdigest(),
+        )
+        with self.stripe() as create:
+            response = self.post('checkout-1')
+            self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+
+            IdempotencyKey.objects.filter(key='checkout-1').update(created_at=timezone.now() - IN_PROGRESS_TIMEOUT * 2)
+            self.assertEqual(self.post('checkout-1').status_code, 200)
+        self.assertEqual(create.call_count, 1)
+
+    def test_server_error_frees_the_key(self):
+        with self.stripe(side_effect=RuntimeError('stripe down')):
+            self.assertEqual(self.post('checkout-1').status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.filter(key='checkout-1').exists())
+
+        with self.stripe() as create:
+            self.assertEqual(self.post('checkout-1').status_code, 200)
+        self.assertEqual(create.call_count, 1)
+
+    def test_purge_removes_keys_past_retention(self):
+        with self.stripe():
+            self.post('old')
+            self.post('new')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timezone.timedelta(hours=25))
+
+        call_command('purge_idempotency_keys', '--hours=24', stdout=io.StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['new'])
+
+
+class PaymentIntentTransactionTests(TransactionTestCase):
+
+    def test_stripe_is_called_outside_any_transaction(self):
+        user = User.objects.create_user(email='buyer@example.com', password='x')
+        product = Product.objects.create(
+            name='Submariner', price='100.00', stock=5, category='men', brand='Rolex', image='products/sample',
+        )
+        CartItem.objects.create(cart=Cart.objects.create(user=user), product=product, quantity=1)
+        in_transaction = []
+
+        def create_intent(*args):
+            in_transaction.append(connection.in_atomic_block)
+            return 'pi_1', 'pi_1_secret'
+
+        request = APIRequestFactory().post(
+            '/api/orders/create-payment-intent/', {}, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1',
+        )
+        force_authenticate(request, user)
+        with mock.patch('orders.views.get_or_create_intent', side_effect=create_intent):
+            response = CreatePaymentIntentView.as_view(throttle_classes=[])(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(in_transaction, [False])
+        self.assertEqual(IdempotencyKey.objects.get(key='checkout-1').status_code, 200)
+
+
+class AsyncPaymentIntentIdempotencyTests(TestCase):
+    """The async PaymentIntent view replays Idempotency-Key retries like the sync one."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        product = Product.objects.create(
+            name='Submariner', price='100.00', stock=5, category='men', brand='Rolex', image='products/sample',
+        )
+        CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=product, quantity=2)
+        self.token = str(AccessToken.for_user(self.user))
+        self.view = AsyncCreatePaymentIntentView.as_view(throttle_classes=[])
+
+    async def post(self, key, body=None):
+        request = AsyncRequestFactory().post(
+            '/api/orders/create-payment-intent/', body or {}, content_type='application/json',
+            headers={'Authorization': f'Bearer {self.token}', 'Idempotency-Key': key},
+        )
+        return await self.view(request)
+
+    def stripe(self, **options):
+        options.setdefault('return_value', ('pi_1', 'pi_1_secret'))
+        return mock.patch('orders.async_views.aget_or_create_intent', new_callable=mock.AsyncMock, **options)
+
+    async def test_retry_is_replayed(self):
+        with self.stripe() as create:
+            first = await self.post('checkout-1')
+            second = await self.post('checkout-1')
+
+        self.assertEqual(create.await_count, 1)
+        self.assertEqual((first.status_code, second.status_code), (200, 200))
+        self.assertEqual(json.loads(second.content), {'clientSecret': 'pi_1_secret'})
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    async def test_key_reused_for_another_request_is_refused(self):
+        with self.stripe():
+            await self.post('checkout-1')
+            response = await self.post('checkout-1', {'coupon': 'X'})
+        self.assertEqual(response.status_code, 422)
+
+    async def test_key_in_progress_is_a_conflict_until_it_goes_stale(self):
+        await IdempotencyKey.objects.acreate(
+            user=self.user, key='checkout-1', endpoint='/api/orders/create-payment-intent/',
+            request_hash=hashlib.sha256(b'{}').hexdigest(),
+        )
+        with self.stripe() as create:
+            self.assertEqual((await self.post('checkout-1')).status_code, 409)
+
+            await IdempotencyKey.objects.filter(key='checkout-1').aupdate(
+                created_at=timezone.now() - IN_PROGRESS_TIMEOUT * 2,
+            )
+            self.assertEqual((await self.post('checkout-1')).status_code, 200)
+        self.assertEqual(create.await_count, 1)
+
+    async def test_server_error_frees_the_key(self):
+        with self.stripe(side_effect=RuntimeError('stripe down')):
+            self.assertEqual((await self.post('checkout-1')).status_code, 500)
+        self.assertFalse(await IdempotencyKey.objects.filter(key='checkout-1').aexists())
+
+        with self.stripe() as create:
+            self.assertEqual((await self.post('checkout-1')).status_code, 200)
+        self.assertEqual(create.await_count, 1)
+
+
+class OrderTransitionTests(TestCase):
+
+    def setUp(self):
+        self.customer = User.objects.create_user(email='buyer@example.com', password='x')
+        self.admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def update(self, order_id, new_status):
+        return self.client.patch(f'/api/orders/admin/update/{order_id}/', {'status': new_status}, format='json')
+
+    def bulk(self, ids, new_status='shipped'):
+        return self.client.post('/api/orders/admin/bulk-update/', {'ids': ids, 'status': new_status}, format='json')
+
+    def test_admin_can_move_an_open_order_to_any_status(self):
+        for current, new_status in (('pending', 'delivered'), ('shipped', 'cancelled'),
+                                    ('shipped', 'pending'), ('processing', 'processing')):
+            order = make_order(self.customer, lines=1, status=current)
+            response = self.update(order.id, new_status)
+            self.assertEqual(response.status_code, 200, (current, new_status))
+            self.assertEqual(response.data['status'], new_status)
+
+    def test_admin_cannot_reopen_a_final_order(self):
+        for current in ('delivered', 'cancelled'):
+            order = make_order(self.customer, lines=1, status=current)
+            response = self.update(order.id, 'pending')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], f'Cannot change status of a {current} order to pending.')
+            order.refresh_from_db()
+            self.assertEqual(order.status, current)
+
+    def test_admin_update_of_unknown_order_or_status(self):
+        self.assertEqual(self.update(999999, 'shipped').status_code, 404)
+        order = make_order(self.customer, lines=1)
+        self.assertEqual(self.update(order.id, 'lost').status_code, 400)
+        self.assertEqual(self.update(order.id, '').status_code, 400)
+
+    def test_customer_can_only_cancel_their_own_unshipped_orders(self):
+        self.client.force_authenticate(self.customer)
+        pending = make_order(self.customer, lines=1, status='pending')
+        shipped = make_order(self.customer, lines=1, status='shipped')
+        someone_elses = make_order(self.admin, lines=1, status='pending')
+
+        self.assertEqual(self.client.post(f'/api/orders/{pending.id}/cancel/').status_code, 200)
+        response = self.client.post(f'/api/orders/{shipped.id}/cancel/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Cannot cancel order that is already shipped')
+        self.assertEqual(self.client.post(f'/api/orders/{someone_elses.id}/cancel/').status_code, 404)
+
+        self.assertEqual(
+            dict(Order.objects.values_list('id', 'status')),
+            {pending.id: 'cancelled', shipped.id: 'shipped', someone_elses.id: 'pending'},
+        )
+
+    def test_bulk_update_reports_what_moved_and_what_did_not(self):
+        open_orders = [make_order(self.customer, lines=1, status=s) for s in ('pending', 'processing')]
+        delivered = make_order(self.customer, lines=1, status='delivered')
+        ids = [order.id for order in open_orders]
+
+        with self.assertNumQueries(6):  # one UPDATE for every id, however many
+            response = self.bulk(ids + [delivered.id, 999999, ids[0]])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(response.data['transitioned']), sorted(ids))
+        self.assertEqual(response.data['rejected'], [
+            {'id': delivered.id, 'error': 'Cannot change status of a delivered order to shipped.'},
+            {'id': 999999, 'error': 'Order not found'},
+        ])
+        self.assertEqual(set(Order.objects.filter(id__in=ids).values_list('status', flat=True)), {'shipped'})
+
+    def test_bulk_update_rejects_bad_input(self):
+        order = make_order(self.customer, lines=1)
+        for ids, new_status in (([], 'shipped'), ('1,2', 'shipped'), (['one'], 'shipped'),
+                                ([None], 'shipped'), ([order.id], 'lost'),
+                                (list(range(1, 1002)), 'shipped')):
+            self.assertEqual(self.bulk(ids, new_status).status_code, 400, (ids, new_status))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+
+
+class OrderEventsTests(TestCase):
+    """The /ws/orders/ feed: broker, socket auth, and publishing only what commits."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+
+    async def connect(self, token=None, path='/ws/orders/'):
+        from Horo_BackEnd.asgi import application
+
+        inbox, outbox = asyncio.Queue(), asyncio.Queue()
+        await inbox.put({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': path,
+                 'query_string': f'token={token}'.encode() if token else b''}
+        task = asyncio.ensure_future(application(scope, inbox.get, outbox.put))
+        return inbox, outbox, task
+
+    async def first_message(self, outbox):
+        return await asyncio.wait_for(outbox.get(), timeout=5)
+
+    async def test_broker_delivers_to_subscribers_of_that_user_only(self):
+        broker = LocalBroker()
+        subscription = broker.subscribe(1)
+        other = broker.subscribe(2)
+        broker.publish(1, {'order_id': 7})
+        await asyncio.sleep(0)  # publish hands over through the loop
+
+        self.assertEqual(subscription[1].get_nowait(), {'order_id': 7})
+        self.assertTrue(other[1].empty())
+
+        broker.unsubscribe(1, subscription)
+        broker.publish(1, {'order_id': 8})
+        await asyncio.sleep(0)
+        self.assertTrue(subscription[1].empty())
+        self.assertNotIn(1, broker._subscribers)
+
+    async def test_bad_expired_or_blocked_tokens_close_the_socket(self):
+        expired = AccessToken.for_user(self.user)
+        expired.set_exp(lifetime=-timezone.timedelta(seconds=1))
+        blocked = await User.objects.acreate(email='blocked@example.com', is_blocked=True)
+
+        for token in (None, 'not-a-token', str(expired), str(AccessToken.for_user(blocked))):
+            _, outbox, task = await self.connect(token)
+            await task
+            self.assertEqual(await self.first_message(outbox),
+                             {'type': 'websocket.close', 'code': CLOSE_UNAUTHORIZED}, token)
+
+    async def test_unknown_path_is_closed(self):
+        _, outbox, task = await self.connect(path='/ws/nope/')
+        await task
+        self.assertEqual(await self.first_message(outbox), {'type': 'websocket.close', 'code': 4404})
+
+    async def test_status_changes_reach_the_customers_socket(self):
+        inbox, outbox, task = await self.connect(str(AccessToken.for_user(self.user)))
+        self.assertEqual(await self.first_message(outbox), {'type': 'websocket.accept'})
+        for _ in range(100):  # the consumer subscribes right after the accept
+            if self.user.id in get_broker()._subscribers:
+                break
+            await asyncio.sleep(0)
+
+        event = {'type': 'order.status', 'order_id': 42, 'status': 'shipped', 'previous': 'processing'}
+        get_broker().publish(self.user.id, event)
+        get_broker().publish(self.user.id + 1, {**event, 'order_id': 43})
+        message = await self.first_message(outbox)
+        self.assertEqual((message['type'], json.loads(message['text'])), ('websocket.send', event))
+
+        await inbox.put({'type': 'websocket.disconnect'})
+        await task
+        self.assertNotIn(self.user.id, get_broker()._subscribers)
+        self.assertTrue(outbox.empty())
+
+    def test_transitions_publish_only_once_committed(self):
+        order = make_order(self.user, lines=1, status='pending')
+        with mock.patch('orders.events.get_broker') as broker:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        transition_orders([order.id], 'cancelled')
+                        raise RuntimeError('rolled back')
+                except RuntimeError:
+                    pass
+            broker.return_value.publish.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                transition_orders([order.id], 'shipped')
+            broker.return_value.publish.assert_not_called()  # still in the transaction
+
+            for callback in callbacks:
+                callback()
+        broker.return_value.publish.assert_called_once_with(self.user.id, {
+            'type': 'order.status', 'order_id': order.id, 'status': 'shipped', 'previous': 'pending',
+        })
+
+
+class ConcurrentTransitionTests(TransactionTestCase):
+
+    def test_racing_changes_to_one_order_apply_exactly_once(self):
+        customer = User.objects.create_user(email='buyer@example.com', password='x')
+        order = make_order(customer, lines=1, status='pending')
+        barrier = threading.Barrier(8)
+        results = []
+
+        def change(new_status):
+            try:
+                barrier.wait()
+                results.append((new_status, transition_orders([order.id], new_status)))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=change, args=(new_status,))
+                   for new_status in ('cancelled', 'delivered') * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        winners = [new_status for new_status, (transitioned, _) in results if transitioned]
+        self.assertEqual(len(winners), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, winners[0])
+        for new_status, (transitioned, rejected) in results:
+            if not transitioned:
+                self.assertEqual(rejected, {order.id: winners[0]})
+
+
+class CustomerCancellationTests(TestCase):
+    """Cancelling orders takes them back out of the customer's aggregates."""
+
+    def test_last_order_at_falls_back_to_the_latest_standing_order(self):
+        user = User.objects.create_user(email='buyer@example.com', password='x')
+        older, newer = make_order(user, status='pending'), make_order(user, status='pending')
+        Order.objects.filter(pk=older.pk).update(created_at=timezone.now() - timezone.timedelta(days=3))
+        older.refresh_from_db()
+        for order in (older, newer):
+            record_customer_order(order)
+
+        transition_orders([newer.id], 'cancelled')
+        user.refresh_from_db()
+        self.assertEqual((user.order_count, user.lifetime_value, user.last_order_at),
+                         (1, Decimal('300.00'), older.created_at))
+
+        transition_orders([older.id], 'cancelled')
+        user.refresh_from_db()
+        self.assertEqual((user.order_count, user.lifetime_value, user.last_order_at), (0, Decimal('0.00'), None))
+
+
+    def test_backfill_skips_cancelled_orders(self):
+        user = User.objects.create_user(email='buyer@example.com', password='x')
+        older, newer = make_order(user, status='delivered'), make_order(user, status='cancelled')
+        Order.objects.filter(pk=older.pk).update(created_at=timezone.now() - timezone.timedelta(days=3))
+        older.refresh_from_db()
+
+        migration = importlib.import_module('orders.migrations.0010_backfill_user_order_stats')
+        migration.backfill_user_order_stats(apps, None)
+        user.refresh_from_db()
+        self.assertEqual((user.order_count, user.lifetime_value, user.last_order_at),
+                         (1, older.total_price, older.created_at))
+
+
+class AdminOrderIndexPlanTests(TestCase):
+    """EXPLAIN the admin list filters against a seeded million-order table."""
+
+    ORDERS = 1_000_000
+    CUSTOMERS = 5_000
+
+    @classmethod
+    def setUpTestData(cls):
+        quote = connection.ops.quote_name
+        users, orders = quote(User._meta.db_table), quote(Order._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {users} (password, email, first_name, last_name, is_blocked, is_active,
+                                     is_staff, is_superuser, created_at, updated_at, order_count, lifetime_value)
+                SELECT '!', 'customer' || n || '@example.com', '', '', false, true, false, false, now(), now(), 0, 0
+                FROM generate_series(1, %s) AS n
+                """,
+                [cls.CUSTOMERS],
+            )
+            # Two years of orders; most are delivered, a few percent still open
+            cursor.execute(
+                f"""
+                INSERT INTO {orders} (user_id, full_name, address, city, state, zip_code, phone,
+                                      total_price, status, created_at)
+                SELECT u.ids[1 + n %% array_length(u.ids, 1)], 'Customer', 'Street', c.cities[1 + n %% 50], 'State',
+                       '682001', '9999999999', (n %% 500000) + 100,
+                       CASE WHEN n %% 100 = 0 THEN 'processing' WHEN n %% 100 = 1 THEN 'pending'
+                            WHEN n %% 100 < 5 THEN 'cancelled' WHEN n %% 100 < 10 THEN 'shipped' ELSE 'delivered' END,
+                       now() - (n * interval '63 seconds')
+                FROM generate_series(1, %s) AS n,
+                     (SELECT array_agg(id) AS ids FROM {users}) AS u,
+                     (SELECT array_agg('City ' || g) AS cities FROM generate_series(1, 50) AS g) AS c
+                """,
+                [cls.ORDERS],
+            )
+            cursor.execute(f"ANALYZE {users}")
+            cursor.execute(f"ANALYZE {orders}")
+
+    def plan(self, **params):
+        queryset = filter_admin_orders(Order.objects.all(), params).order_by('-created_at', '-id')[:20]
+        return queryset.explain()
+
+    def test_status_and_date_range(self):
+        week_ago = (timezone.now() - timezone.timedelta(days=7)).isoformat()
+        self.assertIn('order_status_created_idx', self.plan(status='processing', created_after=week_ago))
+
+    def test_customer(self):
+        self.assertIn('order_user_created_idx', self.plan(email='customer42@example.com'))
+
+    def test_city(self):
+        self.assertIn('order_city_created_idx', self.plan(city='city 7'))
+
+    def test_newest_first_page(self):
+        self.assertIn('order_created_id_idx', self.plan())
+
+
+class OrderExportTests(TestCase):
+    """The export streams in chunks: query count and memory follow the chunk size, not the order count."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        self.admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+
+    def seed(self, count, lines=2):
+        orders = Order.objects.bulk_create(
+            Order(user=self.user, full_name='A', address='B', city='Kochi', state='Kerala',
+                  zip_code='682001', phone='9999999999', total_price='200.00')
+            for _ in range(count)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, price='100.00', quantity=1, product_name=f'Watch {n}',
+                      product_brand='Rolex', product_category='men', created_at=order.created_at)
+            for order in orders for n in range(lines)
+        )
+
+    def peak_memory(self, stream):
+        tracemalloc.start()
+        try:
+            rows = sum(1 for _ in stream)
+            return rows, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    def test_memory_does_not_grow_with_order_count(self):
+        # Both runs span several 200-order chunks, so the first isn't flattered by a partial one
+        self.seed(1_000)
+        rows, small = self.peak_memory(stream_csv(Order.objects.order_by('-created_at', '-id'), chunk_size=200))
+        self.assertEqual(rows, 1 + 2_000)
+
+        self.seed(19_000)
+        rows, large = self.peak_memory(stream_csv(Order.objects.order_by('-created_at', '-id'), chunk_size=200))
+        self.assertEqual(rows, 1 + 40_000)
+        # 20x the orders; the peak should stay about where it was
+        self.assertLess(large, small * 1.5, (small, large))
+
+    def test_items_are_fetched_once_per_chunk(self):
+        self.seed(250)
+        with self.assertNumQueries(1 + 3):  # the order cursor, then one item query per 100-order chunk
+            lines = list(stream_jsonl(Order.objects.order_by('id'), chunk_size=100))
+        self.assertEqual(len(lines), 250)
+
+    def test_endpoint_applies_the_admin_filters(self):
+        self.seed(3)
+        make_order(self.user, lines=1, status='shipped')
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        response = client.get('/api/orders/admin/export/csv/?status=shipped')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('shipped', lines[1])
+
+
+WEBHOOK_SECRET = 'whsec_test'
+
+
+def stripe_event(event_id, event_type, obj):
+    """Webhook body in Stripe's shape, trimmed to the fields the handlers read."""
+    return {
+        'id': event_id, 'object': 'event', 'api_version': '2024-06-20', 'created': 1760868000,
+        'livemode': False, 'pending_webhooks': 1, 'type': event_type, 'data': {'object': obj},
+    }
+
+
+def payment_intent(intent_id, status, **fields):
+    return {'id': intent_id, 'object': 'payment_intent', 'amount': 30000, 'currency': 'inr',
+            'status': status, 'metadata': {}, **fields}
+
+
+def charge(intent_id, refunded):
+    return {'id': 'ch_1', 'object': 'charge', 'amount': 30000, 'amount_refunded': 30000 if refunded else 100,
+            'payment_intent': intent_id, 'refunded': refunded}
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', password='x')
+        self.client = APIClient()
+
+    def deliver(self, event):
+        body = json.dumps(event)
+        timestamp = int(time.time())
+        signature = hmac.new(WEBHOOK_SECRET.encode(), f'{timestamp}.{body}'.encode(), hashlib.sha256).hexdigest()
+        return self.client.post('/api/orders/webhooks/stripe/', body, content_type='application/json',
+                                HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={signature}')
+
+    def run_jobs(self):
+        # Retries are scheduled with a backoff; make them due now
+        Job.objects.filter(status='queued').update(run_after=timezone.now())
+        return run_batch()
+
+    def test_bad_signature_is_rejected(self):
+        body = json.dumps(stripe_event('evt_1', 'payment_intent.succeeded', payment_intent('pi_1', 'succeeded')))
+        response = self.client.post('/api/orders/webhooks/stripe/', body, content_type='application/json',
+                                    HTTP_STRIPE_SIGNATURE='t=1,v1=bad')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StripeEvent.objects.exists())
+
+    def test_redelivery_is_queued_once(self):
+        event = stripe_event('evt_1', 'payment_intent.succeeded', payment_intent('pi_1', 'succeeded'))
+        self.deliver(event)
+        self.deliver(event)
+        self.assertEqual(StripeEvent.objects.count(), 1)
+        self.assertEqual(Job.objects.filter(kind='stripe_event').count(), 1)
+
+    def test_success_moves_the_order_to_processing(self):
+        order = make_order(self.user, payment_id='pi_1')
+        self.deliver(stripe_event('evt_1', 'payment_intent.succeeded', payment_intent('pi_1', 'succeeded')))
+        self.assertEqual(self.run_jobs(), (1, 0))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'processing')
+        self.assertIsNotNone(StripeEvent.objects.get().processed_at)
+
+    def test_success_before_checkout_commits_is_retried(self):
+        self.deliver(stripe_event('evt_1', 'payment_intent.succeeded', payment_intent('pi_1', 'succeeded')))
+        self.assertEqual(self.run_jobs(), (0, 1))
+        self.assertIsNone(StripeEvent.objects.get().processed_at)
+        self.assertIn('pi_1', Job.objects.get().last_error)
+
+        order = make_order(self.user, payment_id='pi_1')
+        self.assertEqual(self.run_jobs(), (1, 0))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'processing')
+        self.assertIsNotNone(StripeEvent.objects.get().processed_at)
+
+    def test_failed_payment_leaves_the_order_open(self):
+        order = make_order(self.user, payment_id='pi_1')
+        failed = payment_intent('pi_1', 'requires_payment_method', last_payment_error={'decline_code': 'insufficient_funds'})
+        self.deliver(stripe_event('evt_1', 'payment_intent.payment_failed', failed))
+        with self.assertLogs('orders.tasks', 'WARNING'):
+            self.assertEqual(self.run_jobs(), (1, 0))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'pending')
+        self.assertIsNotNone(StripeEvent.objects.get().processed_at)
+
+        # The customer retries with another card
+        self.deliver(stripe_event('evt_2', 'payment_intent.succeeded', payment_intent('pi_1', 'succeeded')))
+        self.run_jobs()
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'processing')
+
+    def test_canceled_intent_cancels_the_order(self):
+        order = make_order(self.user, payment_id='pi_1')
+        self.deliver(stripe_event('evt_1', 'payment_intent.canceled', payment_intent('pi_1', 'canceled')))
+        self.assertEqual(self.run_jobs(), (1, 0))
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+
+    def test_only_full_refunds_cancel(self):
+        partial = make_order(self.user, payment_id='pi_1')
+        full = make_order(self.user, payment_id='pi_2')
+        self.deliver(stripe_event('evt_1', 'charge.refunded', charge('pi_1', refunded=False)))
+        self.deliver(stripe_event('evt_2', 'charge.refunded', charge('pi_2', refunded=True)))
+        self.assertEqual(self.run_jobs(), (2, 0))
+
+        partial.refresh_from_db()
+        full.refresh_from_db()
+        self.assertEqual((partial.status, full.status), ('pending', 'cancelled'))
+
+
+class OrphanedItemTests(TestCase):
+    """order_id has no database FK; `order_partitions orphans` finds and removes strays."""
+
+    def test_orphans_are_counted_then_deleted(self):
+        order = make_order(User.objects.create_user(email='buyer@example.com', password='x'), lines=2)
+        OrderItem.objects.create(order_id=order.id + 1000, price='10.00', product_name='Stray')
+
+        out = io.StringIO()
+        call_command('order_partitions', 'orphans', stdout=out)
+        self.assertIn('1 order item(s) without an order', out.getvalue())
+
+        call_command('order_partitions', 'orphans', '--delete', '--batch-size=1', stdout=io.StringIO())
+        self.assertEqual(list(OrderItem.objects.values_list('order_id', flat=True)), [order.id, order.id])
+
+
+class OrderPartitionArchiveTests(TransactionTestCase):
+    """`order_partitions` against a scratch table, so the real order tables stay as they are."""
+
+    TABLE = 'partition_scratch'
+
+    def setUp(self):
+        self.addCleanup(self.drop_scratch)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE {self.TABLE} (id bigint GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY, "
+                f"created_at timestamptz NOT NULL, note text)"
+            )
+            cursor.execute(f"CREATE INDEX {self.TABLE}_created ON {self.TABLE} (created_at)")
+            cursor.execute(
+                f"INSERT INTO {self.TABLE} (created_at) "
+                f"SELECT now() - n * interval '1 day' FROM generate_series(1, 100) AS n"
+            )
+        patcher = mock.patch.object(order_partitions, 'TABLES', [self.TABLE])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        call_command('order_partitions', 'convert', stdout=io.StringIO())
+
+    def drop_scratch(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TABLE} CASCADE")
+            cursor.execute(f"DROP SCHEMA IF EXISTS {order_partitions.ARCHIVE_SCHEMA} CASCADE")
+
+    def partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(%s)", [self.TABLE],
+            )
+            return {name for name, in cursor.fetchall()}
+
+    def archive(self, *args):
+        # -1: everything that ends by next month, i.e. the legacy partition
+        call_command('order_partitions', 'archive', '--older-than-months=-1', *args, stdout=io.StringIO())
+
+    def test_concurrent_archive_of_the_legacy_partition(self):
+        self.archive('--concurrently')
+
+        partitions = self.partitions()
+        self.assertNotIn(f'{self.TABLE}_legacy', partitions)
+        self.assertIn(f'{self.TABLE}_default', partitions)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {order_partitions.ARCHIVE_SCHEMA}.{self.TABLE}_legacy")
+            self.assertEqual(cursor.fetchone()[0], 100)
+            cursor.execute(f"SELECT COUNT(*) FROM {self.TABLE}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_concurrent_archive_refuses_while_the_default_partition_has_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.TABLE} (created_at) VALUES (now() + interval '5 years')")
+
+        with self.assertRaises(CommandError):
+            self.archive('--concurrently')
+        self.assertIn(f'{self.TABLE}_legacy', self.partitions())
+
+    def test_plain_archive_keeps_the_default_partition(self):
+        self.archive('--drop')
+        partitions = self.partitions()
+        self.assertNotIn(f'{self.TABLE}_legacy', partitions)
+        self.assertIn(f'{self.TABLE}_default', partitions)
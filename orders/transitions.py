@@ -0,0 +1,96 @@
+# orders/transitions.py
+"""
+Order status state machine.
+
+Every status change (admin single/bulk update, customer cancel) goes through
+``transition_orders``, which applies it with one conditional UPDATE. Rows
+that are not in an allowed "from" status when the statement runs are left
+untouched and reported back, so concurrent admin/customer changes cannot
+overwrite each other.
+"""
+from django.db import connection, transaction
+
+from .events import publish_status_changes
+from .models import Order
+from .rollups import record_customer_cancellations, record_status_changes
+
+# Delivered and cancelled are final; an open order can be moved to any status
+OPEN_STATUSES = ('pending', 'processing', 'shipped')
+
+# new status -> statuses it may be reached from (admins and Stripe events)
+TRANSITIONS = {
+    'pending': OPEN_STATUSES,
+    'processing': OPEN_STATUSES,
+    'shipped': OPEN_STATUSES,
+    'delivered': OPEN_STATUSES,
+    'cancelled': OPEN_STATUSES,
+}
+
+# Customers can only cancel an order that hasn't shipped yet
+CUSTOMER_CANCELLABLE = ('pending', 'processing')
+
+
+def transition_orders(order_ids, new_status, user=None, from_statuses=None):
+    """
+    Move ``order_ids`` to ``new_status`` where the transition table allows it
+    (or only from ``from_statuses``, when given).
+
+    Returns ``(transitioned, rejected)``:
+      transitioned: list of ``(order_id, user_id, previous_status)``
+      rejected: ``{order_id: current_status}``, or ``None`` when the order
+                does not exist (or isn't owned by ``user``)
+    """
+    if new_status not in TRANSITIONS:
+        raise ValueError(f"Unknown status: {new_status}")
+
+    ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+    if not ids:
+        return [], {}
+
+    table = connection.ops.quote_name(Order._meta.db_table)
+    if from_statuses is None:
+        from_statuses = TRANSITIONS[new_status]
+    params = [new_status, ids, list(from_statuses)]
+    owner_clause = ""
+    if user is not None:
+        owner_clause = "AND user_id = %s"
+        params.append(user.pk)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # The sub-select locks the matching rows and remembers their old
+            # status; Postgres re-checks its WHERE after waiting on a lock.
+            cursor.execute(
+                f"""
+                UPDATE {table} AS o
+                SET status = %s
+                FROM (
+                    SELECT id, status FROM {table}
+                    WHERE id = ANY(%s) AND status = ANY(%s) {owner_clause}
+                    FOR UPDATE
+                ) AS prev
+                WHERE o.id = prev.id
+                RETURNING o.id, o.user_id, prev.status
+                """,
+                params,
+            )
+            transitioned = cursor.fetchall()
+
+        # Dashboard rollups move with the order, in the same transaction
+        record_status_changes(transitioned, new_status)
+        if new_status == 'cancelled':
+            record_customer_cancellations([row[0] for row in transitioned])
+
+        # Live updates for the customers' open order pages
+        publish_status_changes(transitioned, new_status)
+
+        done = {row[0] for row in transitioned}
+        remaining = [order_id for order_id in ids if order_id not in done]
+        rejected = dict.fromkeys(remaining)
+        if remaining:
+            current = Order.objects.filter(id__in=remaining)
+            if user is not None:
+                current = current.filter(user=user)
+            rejected.update(current.values_list('id', 'status'))
+
+    return transitioned, rejected
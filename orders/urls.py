@@ -1,12 +1,26 @@
+from django.conf import settings
 from django.urls import path
-from .views import CreateOrderView, OrderListView, CreatePaymentIntentView,AdminOrderUpdateView,AdminOrderListView,CancelOrderView
+from django.views.decorators.csrf import csrf_exempt
+from .async_views import AsyncCreatePaymentIntentView
+from .views import CreateOrderView, OrderListView, CreatePaymentIntentView,AdminOrderUpdateView,AdminOrderBulkUpdateView,AdminOrderListView,AdminOrderExportView,CancelOrderView,StripeWebhookView,AdminSalesSeriesView
+
+# ASGI deployments serve the Stripe-bound view natively async (orders/async_views.py)
+if settings.ASYNC_OUTBOUND_VIEWS:
+    payment_intent_view = csrf_exempt(AsyncCreatePaymentIntentView.as_view())
+else:
+    payment_intent_view = CreatePaymentIntentView.as_view()
 
 urlpatterns = [
-    path('create-payment-intent/', CreatePaymentIntentView.as_view()),
+    path('create-payment-intent/', payment_intent_view),
     path('create/', CreateOrderView.as_view()),
     path('my-orders/', OrderListView.as_view()),
     
     path('admin/all/', AdminOrderListView.as_view(), name='admin-orders-list'),
+    path('admin/export/<str:fmt>/', AdminOrderExportView.as_view(), name='admin-orders-export'),
     path('admin/update/<int:pk>/', AdminOrderUpdateView.as_view(), name='admin-order-update'),
+    path('admin/bulk-update/', AdminOrderBulkUpdateView.as_view(), name='admin-order-bulk-update'),
+    path('admin/stats/series/', AdminSalesSeriesView.as_view(), name='admin-sales-series'),
     path('<int:pk>/cancel/', CancelOrderView.as_view(), name='user-cancel-order'),
+
+    path('webhooks/stripe/', StripeWebhookView.as_view(), name='stripe-webhook'),
 ]
\ No newline at end of file
@@ -1,41 +1,82 @@
+import json
+import logging
+from datetime import timedelta
+
 import stripe
 from django.conf import settings
-from django.core.mail import send_mail
 from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import permissions, generics, status
-from rest_framework.permissions import IsAdminUser
-
-from .models import Order, OrderItem
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser
+
+from .export import stream_csv, stream_jsonl
+from .checkout import place_order
+from .filters import STATUSES, filter_admin_orders
+from .idempotency import HEADER as IDEMPOTENCY_HEADER, idempotent
+from .models import Order, PaymentIntentRecord, StripeEvent
+from .pagination import OrderCursorPagination
+from .rollups import BREAKDOWNS, sales_series
+from .payments import cart_totals, get_or_create_intent
 from .serializers import OrderSerializer
+from .tasks import HANDLED_EVENTS
+from .transitions import CUSTOMER_CANCELLABLE, TRANSITIONS, transition_orders
+import outbound
+from Accounts.throttling import IPThrottle, UserThrottle
 from cart.models import Cart
+from cart.stores import get_cart_store
+from jobs.queue import enqueue
+from jobs.tasks import enqueue_email
+
+logger = logging.getLogger(__name__)
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
+# Pooled connections + explicit timeout (outbound/client.py); the *_async
+# calls made by orders/async_views.py go through httpx instead
+stripe.default_http_client = stripe.RequestsClient(
+    timeout=outbound.get_provider('stripe').timeout,
+    session=outbound.get_provider('stripe').session,
+    async_fallback_client=stripe.HTTPXClient(
+        timeout=outbound.get_provider('stripe').timeout,
+        allow_sync_methods=False,
+    ),
+)
+if settings.STRIPE_API_BASE:
+    stripe.api_base = settings.STRIPE_API_BASE
 
 # ==========================================
 # 1. CUSTOMER: Initialize Stripe Payment
 # ==========================================
 class CreatePaymentIntentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    # Every call can reach Stripe
+    throttle_classes = [UserThrottle, IPThrottle]
+    throttle_scope = 'payment_intent'
 
+    @idempotent
     def post(self, request):
         user = request.user
         try:
-            cart = Cart.objects.get(user=user)
-            if not cart.items.exists():
+            get_cart_store().flush(user)
+            total_amount, fingerprint = cart_totals(user)
+            if total_amount is None:
                 return Response({'error': 'Cart is empty'}, status=400)
-            
-            total_amount = sum(item.product.price * item.quantity for item in cart.items.all())
-            
-            intent = stripe.PaymentIntent.create(
-                amount=int(total_amount * 100), 
-                currency='inr', 
-                metadata={'user_id': user.id}
+
+            # Let Stripe dedupe too, in case our own response was lost
+            idempotency_key = None
+            if request.headers.get(IDEMPOTENCY_HEADER):
+                idempotency_key = f"{user.id}:{request.headers[IDEMPOTENCY_HEADER]}"
+
+            _, client_secret = get_or_create_intent(
+                user, int(total_amount * 100), fingerprint, idempotency_key
             )
 
-            return Response({'clientSecret': intent['client_secret']})
+            return Response({'clientSecret': client_secret})
             
         except Exception as e:
             return Response({'error': str(e)}, status=500)
@@ -46,65 +87,48 @@ class CreatePaymentIntentView(APIView):
 class CreateOrderView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent
     def post(self, request):
         user = request.user
         data = request.data
         
+        # Persist any cached cart before reading it
+        store = get_cart_store()
+        store.flush(user)
+
         # Safe get cart
         cart = get_object_or_404(Cart, user=user)
-        cart_items = cart.items.all()
-        
-        if not cart_items.exists():
-            return Response({"detail": "Cart is empty"}, status=400)
-
-        total_price = sum(item.product.price * item.quantity for item in cart_items)
 
         try:
             with transaction.atomic():
-                # Create Order
-                order = Order.objects.create(
-                    user=user,
-                    full_name=data.get('full_name'),
-                    address=data.get('address'),
-                    city=data.get('city'),
-                    state=data.get('state'),
-                    zip_code=data.get('zip_code'),
-                    phone=data.get('phone'),
-                    total_price=total_price,
-                    payment_id=data.get('payment_id')
-                )
-
-                # Move items
-                order_items = [
-                    OrderItem(
-                        order=order,
-                        product=item.product,
-                        price=item.product.price,
-                        quantity=item.quantity
-                    ) for item in cart_items
-                ]
-                OrderItem.objects.bulk_create(order_items)
-
-                # Clear Cart
-                cart_items.delete()
-
-                # Send Email (To User AND Admin)
+                # Create Order + copy the cart lines (set-based, see orders/checkout.py)
+                order = place_order(cart, data)
+                if order is None:
+                    return Response({"detail": "Cart is empty"}, status=400)
+
+                # Cart is emptied by place_order; drop the PaymentIntent priced for it
+                PaymentIntentRecord.objects.filter(user=user).delete()
+                transaction.on_commit(lambda: store.invalidate(user))
+
+                # Queue Email (To User AND Admin) once the order is committed
                 self.send_confirmation_email(user, order)
 
             serializer = OrderSerializer(order)
             return Response(serializer.data, status=201)
 
         except Exception as e:
-            print(f"Order Creation Error: {e}")
+            logger.exception("Order creation failed for user #%s", user.id)
             return Response({"detail": str(e)}, status=500)
 
     def send_confirmation_email(self, user, order):
+        # Runs inside the checkout transaction: only queue the emails here,
+        # `manage.py run_worker` sends them after commit.
         try:
             # --- 1. PREPARE DATA ---
             # Use Live URL
             dashboard_link = "https://horologiee.vercel.app/orders"
-            # Fix: Use first_name or username (user.name does not exist)
-            user_name = user.first_name if user.first_name else user.username
+            # Fall back to the email (the custom User model has no username)
+            user_name = user.first_name if user.first_name else user.email
 
             # --- 2. EMAIL TO CUSTOMER ---
             subject_user = f"CONFIRMED: Your Acquisition | Order #{order.id}"
@@ -126,14 +150,12 @@ Yours in Excellence,
 The Horologie Private Concierge
             """
 
-            send_mail(
+            enqueue_email(
                 subject_user,
                 message_user,
-                settings.DEFAULT_FROM_EMAIL,
                 [user.email], # Sends to Customer
-                fail_silently=True, 
+                on_commit=True,
             )
-            print(f"✅ Customer email sent to {user.email}")
 
             # --- 3. EMAIL TO ADMIN (YOU) ---
             subject_admin = f"💰 NEW SALE! Order #{order.id} - ₹{order.total_price}"
@@ -149,17 +171,15 @@ Check the admin panel:
 https://horologiee.vercel.app/manageorders
             """
 
-            send_mail(
+            enqueue_email(
                 subject_admin,
                 message_admin,
-                settings.DEFAULT_FROM_EMAIL,
                 ['fahismt777@gmail.com'], # <--- YOUR EMAIL ADDRESS
-                fail_silently=True, 
+                on_commit=True,
             )
-            print("✅ Admin notification sent!")
             
-        except Exception as e:
-            print(f"❌ Email failed: {str(e)}")
+        except Exception:
+            logger.exception("Confirmation emails for order #%s could not be queued", order.id)
 
 # ==========================================
 # 3. CUSTOMER: List My Orders
@@ -167,9 +187,15 @@ https://horologiee.vercel.app/manageorders
 class OrderListView(generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        # Two queries per page: orders, then their snapshot line items
+        return (
+            Order.objects.filter(user=self.request.user)
+            .prefetch_related('items')
+            .order_by('-created_at', '-id')
+        )
 
 # ==========================================
 # 4. ADMIN: List ALL Orders (Dashboard)
@@ -177,54 +203,192 @@ class OrderListView(generics.ListAPIView):
 class AdminOrderListView(generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAdminUser] 
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        return Order.objects.all().order_by('-created_at')
+        queryset = filter_admin_orders(Order.objects.all(), self.request.query_params)
+        return queryset.prefetch_related('items').order_by('-created_at', '-id')
 
 # ==========================================
-# 5. ADMIN: Update Order Status (With Locking)
+# 5. ADMIN: Export Orders (CSV / JSON Lines)
+# ==========================================
+class AdminOrderExportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    FORMATS = {
+        'csv': (stream_csv, 'text/csv'),
+        'jsonl': (stream_jsonl, 'application/x-ndjson'),
+    }
+
+    def get(self, request, fmt):
+        """Stream every order matching the admin list filters"""
+        if fmt not in self.FORMATS:
+            return Response({"error": "Format must be csv or jsonl"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Same filters as the admin list (?status=&created_after=&...)
+        queryset = filter_admin_orders(Order.objects.all(), request.query_params)
+        queryset = queryset.order_by('-created_at', '-id')
+
+        stream, content_type = self.FORMATS[fmt]
+        response = StreamingHttpResponse(stream(queryset), content_type=content_type)
+        filename = f"orders-{timezone.now():%Y%m%d-%H%M}.{fmt}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+# ==========================================
+# 6. ADMIN: Update Order Status (State Machine)
 # ==========================================
 class AdminOrderUpdateView(APIView):
     permission_classes = [IsAdminUser]
 
     def patch(self, request, pk):
-        order = get_object_or_404(Order, pk=pk)
         new_status = request.data.get('status')
         
         if not new_status:
             return Response({"error": "Status is required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # ✅ LOGIC: Prevent changing status if final
-        if order.status == 'delivered':
-            return Response({"error": "Cannot change status of a delivered order."}, status=400)
-        
-        if order.status == 'cancelled':
-             return Response({"error": "Cannot change status of a cancelled order."}, status=400)
+        if new_status not in TRANSITIONS:
+            return Response({"error": f"Invalid status: {new_status}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        order.status = new_status
-        order.save()
+        # ✅ LOGIC: Only allowed transitions are applied (see orders/transitions.py)
+        _, rejected = transition_orders([pk], new_status)
+
+        if pk in rejected:
+            if rejected[pk] is None:
+                return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+            return Response(
+                {"error": f"Cannot change status of a {rejected[pk]} order to {new_status}."},
+                status=400
+            )
+
+        order = Order.objects.prefetch_related('items').get(pk=pk)
         return Response(OrderSerializer(order).data)
 
 # ==========================================
-# 6. CUSTOMER: Cancel Order (New)
+# 7. ADMIN: Bulk Update Order Status
+# ==========================================
+class AdminOrderBulkUpdateView(APIView):
+    permission_classes = [IsAdminUser]
+    MAX_ORDERS = 1000
+
+    def post(self, request):
+        ids = request.data.get('ids')
+        new_status = request.data.get('status')
+
+        if not isinstance(ids, list) or not ids:
+            return Response({"error": "ids must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(ids) > self.MAX_ORDERS:
+            return Response({"error": f"At most {self.MAX_ORDERS} orders per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if new_status not in TRANSITIONS:
+            return Response({"error": f"Invalid status: {new_status}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            transitioned, rejected = transition_orders(ids, new_status)
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "status": new_status,
+            "transitioned": [order_id for order_id, _, _ in transitioned],
+            "rejected": [
+                {
+                    "id": order_id,
+                    "error": "Order not found" if current is None
+                    else f"Cannot change status of a {current} order to {new_status}.",
+                }
+                for order_id, current in rejected.items()
+            ],
+        })
+
+# ==========================================
+# 8. CUSTOMER: Cancel Order (New)
 # ==========================================
 class CancelOrderView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, pk):
         # Ensure users can only cancel THEIR OWN orders
-        order = get_object_or_404(Order, pk=pk, user=request.user)
+        _, rejected = transition_orders([pk], 'cancelled', user=request.user, from_statuses=CUSTOMER_CANCELLABLE)
 
         # ✅ Check eligibility
-        if order.status in ['shipped', 'delivered', 'cancelled']:
+        if pk in rejected:
+            if rejected[pk] is None:
+                return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
             return Response(
-                {"error": f"Cannot cancel order that is already {order.status}"}, 
+                {"error": f"Cannot cancel order that is already {rejected[pk]}"}, 
                 status=400
             )
-
-        order.status = 'cancelled'
-        order.save()
         
         # Optional: Add refund logic here if payment was made
         
-        return Response(OrderSerializer(order).data)
\ No newline at end of file
+        order = Order.objects.prefetch_related('items').get(pk=pk)
+        return Response(OrderSerializer(order).data)
+
+# ==========================================
+# 9. STRIPE: Webhook Receiver
+# ==========================================
+class StripeWebhookView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        """Verify, store once, acknowledge; `run_worker` applies it to orders"""
+        try:
+            stripe.Webhook.construct_event(
+                request.body,
+                request.headers.get('Stripe-Signature'),
+                settings.STRIPE_WEBHOOK_SECRET,
+            )
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response({"error": "Invalid payload or signature"}, status=status.HTTP_400_BAD_REQUEST)
+
+        payload = json.loads(request.body)
+        if payload['type'] not in HANDLED_EVENTS:
+            return Response({"received": True})
+
+        with transaction.atomic():
+            event, created = StripeEvent.objects.get_or_create(
+                event_id=payload['id'],
+                defaults={'type': payload['type'], 'payload': payload},
+            )
+            # Stripe redelivers events; only the first copy is queued
+            if created:
+                enqueue('stripe_event', {'event': event.id})
+
+        return Response({"received": True})
+# ==========================================
+# 10. ADMIN: Sales Time Series (Dashboard Charts)
+# ==========================================
+class AdminSalesSeriesView(APIView):
+    permission_classes = [IsAdminUser]
+    max_days = 366
+
+    def get(self, request):
+        """?start=2026-01-01&end=2026-01-31&status=processing,shipped&breakdown=brand"""
+        params = request.query_params
+        today = timezone.localdate()
+
+        try:
+            # parse_date returns None for a bad format and raises for a bad day (2026-02-30)
+            end = parse_date(params['end']) if params.get('end') else today
+            start = parse_date(params['start']) if params.get('start') else (end or today) - timedelta(days=29)
+        except ValueError:
+            start = end = None
+        if start is None or end is None:
+            raise ValidationError({"detail": "start/end must be dates like 2026-01-31."})
+        if start > end or (end - start).days >= self.max_days:
+            raise ValidationError({"detail": f"Pick a range of 1 to {self.max_days} days."})
+
+        breakdown = params.get('breakdown', 'brand')
+        if breakdown not in BREAKDOWNS:
+            raise ValidationError({"breakdown": f"One of: {', '.join(BREAKDOWNS)}"})
+
+        statuses = [s.strip() for s in params.get('status', '').split(',') if s.strip()]
+        unknown = set(statuses) - STATUSES
+        if unknown:
+            raise ValidationError({"status": f"Unknown status: {', '.join(sorted(unknown))}"})
+
+        series = sales_series(start, end, statuses, breakdown)
+        return Response({"start": start, "end": end, "breakdown_by": breakdown, **series})
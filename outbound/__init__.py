@@ -0,0 +1,21 @@
+from .client import (
+    NETWORK_ERRORS,
+    BulkheadFullError,
+    CircuitOpenError,
+    OutboundError,
+    acall,
+    call,
+    get_provider,
+    metrics,
+)
+
+__all__ = [
+    "NETWORK_ERRORS",
+    "BulkheadFullError",
+    "CircuitOpenError",
+    "OutboundError",
+    "acall",
+    "call",
+    "get_provider",
+    "metrics",
+]
@@ -0,0 +1,304 @@
+# outbound/client.py
+"""
+Guard rails for calls to third-party services (Stripe, Cloudinary, SMTP, Google).
+
+Every provider gets, per process:
+  * a pooled ``requests.Session`` with a default timeout
+  * retries with exponential backoff and full jitter
+  * a circuit breaker that fails fast after repeated errors
+  * a bulkhead capping concurrent calls, so one slow provider can't tie up
+    every worker thread
+  * latency / error counters for the admin metrics endpoint
+
+Async views use ``Provider.acall`` with ``Provider.async_client()`` (a
+pooled ``httpx.AsyncClient`` per event loop) and get the same breaker,
+bulkhead and metrics.
+
+Configure providers in ``settings.OUTBOUND_PROVIDERS``.
+"""
+import asyncio
+import random
+import threading
+import time
+import weakref
+from collections import deque
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+DEFAULTS = {
+    'timeout': 10.0,            # seconds, per attempt
+    'retries': 0,               # extra attempts after the first
+    'backoff': 0.2,             # base delay in seconds for retries
+    'max_concurrent': 10,       # bulkhead size
+    'acquire_timeout': 1.0,     # wait this long for a bulkhead slot
+    'failure_threshold': 5,     # consecutive failures that open the breaker
+    'reset_timeout': 30.0,      # seconds before a half-open probe
+    'pool_size': 10,            # HTTP connections kept per host
+}
+
+# Exceptions that count against a provider when no specific list is given
+NETWORK_ERRORS = (requests.RequestException, httpx.TransportError, OSError, TimeoutError)
+
+
+class OutboundError(Exception):
+    pass
+
+
+class CircuitOpenError(OutboundError):
+    pass
+
+
+class BulkheadFullError(OutboundError):
+    pass
+
+
+PROBE = 'probe'
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """False to reject; ``PROBE`` when this call is the half-open probe."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probing:
+                # Let exactly one request through to test the provider
+                self._probing = True
+                return PROBE
+            return False
+
+    def release(self):
+        """End a probe that recorded no outcome (rejected, or a non-provider error)."""
+        with self._lock:
+            if self.state == 'half_open':
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+
+class Metrics:
+    def __init__(self, window=500):
+        self.calls = 0
+        self.errors = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self.calls += 1
+            self.errors += int(error)
+            self.latencies.append(seconds)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            calls, errors, rejected = self.calls, self.errors, self.rejected
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1)
+
+        return {
+            'calls': calls,
+            'errors': errors,
+            'rejected': rejected,
+            'error_rate': round(errors / calls, 4) if calls else 0.0,
+            'p50_ms': percentile(0.50),
+            'p95_ms': percentile(0.95),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else None,
+        }
+
+
+class Provider:
+    def __init__(self, name, **config):
+        self.name = name
+        self.config = {**DEFAULTS, **config}
+        self.timeout = self.config['timeout']
+        self.breaker = CircuitBreaker(self.config['failure_threshold'], self.config['reset_timeout'])
+        self.bulkhead = threading.BoundedSemaphore(self.config['max_concurrent'])
+        self.metrics = Metrics()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def session(self):
+        """Shared keep-alive session; pass ``timeout=provider.timeout`` on each call."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.config['pool_size'],
+                        pool_maxsize=self.config['pool_size'],
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def async_client(self):
+        """Shared ``httpx.AsyncClient`` for the running event loop (timeout preset)."""
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_keepalive_connections=self.config['pool_size']),
+            )
+            self._async_clients[loop] = client
+        return client
+
+    def call(self, fn, errors=NETWORK_ERRORS, retries=None, ignore=()):
+        """
+        Run ``fn()`` under this provider's breaker and bulkhead.
+
+        Only exceptions in ``errors`` are retried and count as provider
+        failures; anything else (bad input, declined cards) passes straight
+        through. ``ignore`` carves client-side errors (4xx) out of ``errors``.
+        """
+        retries = self.config['retries'] if retries is None else retries
+
+        permit = self.breaker.allow()
+        if not permit:
+            self.metrics.reject()
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+        try:
+            if not self.bulkhead.acquire(timeout=self.config['acquire_timeout']):
+                self.metrics.reject()
+                raise BulkheadFullError(f"Too many concurrent {self.name} calls")
+
+            try:
+                attempt = 0
+                while True:
+                    started = time.monotonic()
+                    try:
+                        result = fn()
+                    except ignore:
+                        raise
+                    except errors:
+                        self.metrics.record(time.monotonic() - started, error=True)
+                        self.breaker.record_failure()
+                        if attempt >= retries or self.breaker.state != 'closed':
+                            raise
+                        # Full jitter: spread retries out instead of hammering in sync
+                        time.sleep(random.uniform(0, self.config['backoff'] * 2 ** attempt))
+                        attempt += 1
+                        continue
+
+                    self.metrics.record(time.monotonic() - started)
+                    self.breaker.record_success()
+                    return result
+            finally:
+                self.bulkhead.release()
+        finally:
+            if permit is PROBE:
+                self.breaker.release()
+
+    async def acall(self, fn, errors=NETWORK_ERRORS, retries=None, ignore=()):
+        """
+        Async ``call``: ``fn()`` returns an awaitable.
+
+        The event loop must never block, so a full bulkhead rejects at once
+        instead of waiting ``acquire_timeout`` for a slot.
+        """
+        retries = self.config['retries'] if retries is None else retries
+
+        permit = self.breaker.allow()
+        if not permit:
+            self.metrics.reject()
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+        try:
+            if not self.bulkhead.acquire(blocking=False):
+                self.metrics.reject()
+                raise BulkheadFullError(f"Too many concurrent {self.name} calls")
+
+            try:
+                attempt = 0
+                while True:
+                    started = time.monotonic()
+                    try:
+                        result = await fn()
+                    except ignore:
+                        raise
+                    except errors:
+                        self.metrics.record(time.monotonic() - started, error=True)
+                        self.breaker.record_failure()
+                        if attempt >= retries or self.breaker.state != 'closed':
+                            raise
+                        await asyncio.sleep(random.uniform(0, self.config['backoff'] * 2 ** attempt))
+                        attempt += 1
+                        continue
+
+                    self.metrics.record(time.monotonic() - started)
+                    self.breaker.record_success()
+                    return result
+            finally:
+                self.bulkhead.release()
+        finally:
+            if permit is PROBE:
+                self.breaker.release()
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name):
+    if name not in _providers:
+        with _providers_lock:
+            if name not in _providers:
+                config = getattr(settings, 'OUTBOUND_PROVIDERS', {}).get(name, {})
+                _providers[name] = Provider(name, **config)
+    return _providers[name]
+
+
+def call(name, fn, errors=NETWORK_ERRORS, retries=None, ignore=()):
+    return get_provider(name).call(fn, errors=errors, retries=retries, ignore=ignore)
+
+
+async def acall(name, fn, errors=NETWORK_ERRORS, retries=None, ignore=()):
+    return await get_provider(name).acall(fn, errors=errors, retries=retries, ignore=ignore)
+
+
+def metrics():
+    for name in getattr(settings, 'OUTBOUND_PROVIDERS', {}):
+        get_provider(name)
+    return {
+        name: {**provider.metrics.snapshot(), 'circuit': provider.breaker.state}
+        for name, provider in sorted(_providers.items())
+    }
@@ -0,0 +1,176 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.test import SimpleTestCase
+
+from .client import BulkheadFullError, CircuitOpenError, NETWORK_ERRORS, Provider
+
+
+class FakeProvider(BaseHTTPRequestHandler):
+    """Answers every GET with ``server.status`` after ``server.delay`` seconds."""
+
+    def do_GET(self):
+        self.server.hits += 1
+        time.sleep(self.server.delay)
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # clients hang up on slow answers on purpose
+
+
+class FakeServerTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakeServer(('127.0.0.1', 0), FakeProvider)
+        self.server.hits, self.server.delay, self.server.status = 0, 0, 200
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def provider(self, **config):
+        config = {'timeout': 0.2, 'failure_threshold': 2, 'reset_timeout': 0.2, 'backoff': 0, **config}
+        return Provider('fake', **config)
+
+    def get(self, provider):
+        def fetch():
+            response = provider.session.get(self.url, timeout=provider.timeout)
+            response.raise_for_status()
+            return response.status_code
+        return provider.call(fetch)
+
+
+class CircuitBreakerTests(FakeServerTestCase):
+
+    def test_timeouts_open_the_circuit(self):
+        provider = self.provider()
+        self.server.delay = 0.5
+
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                self.get(provider)
+        with self.assertRaises(CircuitOpenError):
+            self.get(provider)
+
+        self.assertEqual(self.server.hits, 2)
+        self.assertEqual(provider.breaker.state, 'open')
+        self.assertEqual(provider.metrics.snapshot()['rejected'], 1)
+
+    def test_probe_closes_the_circuit_once_the_provider_recovers(self):
+        provider = self.provider()
+        self.server.delay = 0.5
+        for _ in range(2):
+            with self.assertRaises(requests.Timeout):
+                self.get(provider)
+
+        self.server.delay = 0
+        time.sleep(0.25)
+        self.assertEqual(self.get(provider), 200)
+        self.assertEqual(provider.breaker.state, 'closed')
+
+    def test_retries_stop_once_the_circuit_opens(self):
+        provider = self.provider(retries=5)
+        self.server.delay = 0.5
+        with self.assertRaises(requests.Timeout):
+            self.get(provider)
+        self.assertEqual(self.server.hits, 2)
+
+    def test_probe_is_released_after_a_non_provider_error(self):
+        provider = self.provider()
+        provider.breaker.state, provider.breaker.opened_at = 'open', 0.0
+
+        def bad_input():
+            raise ValueError('declined')
+
+        with self.assertRaises(ValueError):
+            provider.call(bad_input)
+        # The next request may probe instead of finding the circuit stuck half-open
+        self.assertEqual(self.get(provider), 200)
+        self.assertEqual(provider.breaker.state, 'closed')
+
+    def test_probe_is_released_when_the_bulkhead_rejects_it(self):
+        provider = self.provider(max_concurrent=1, acquire_timeout=0)
+        provider.breaker.state, provider.breaker.opened_at = 'open', 0.0
+
+        provider.bulkhead.acquire()
+        with self.assertRaises(BulkheadFullError):
+            self.get(provider)
+        provider.bulkhead.release()
+
+        self.assertEqual(self.get(provider), 200)
+
+    def test_ignored_errors_do_not_count(self):
+        provider = self.provider()
+        self.server.status = 404
+
+        for _ in range(3):
+            with self.assertRaises(requests.HTTPError):
+                provider.call(
+                    lambda: provider.session.get(self.url, timeout=provider.timeout).raise_for_status(),
+                    ignore=(requests.HTTPError,),
+                )
+        self.assertEqual(provider.breaker.state, 'closed')
+        self.assertEqual(provider.metrics.snapshot()['errors'], 0)
+
+
+class BulkheadTests(FakeServerTestCase):
+
+    def test_slow_provider_only_ties_up_its_own_slots(self):
+        provider = self.provider(timeout=2, max_concurrent=2, acquire_timeout=0.05)
+        self.server.delay = 0.3
+        results = []
+
+        def worker():
+            try:
+                results.append(self.get(provider))
+            except BulkheadFullError:
+                results.append('rejected')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results, key=str), [200, 200, 'rejected', 'rejected'])
+        self.assertEqual(self.server.hits, 2)
+
+
+class AsyncCallTests(FakeServerTestCase):
+
+    def test_acall_times_out_and_opens_the_circuit(self):
+        provider = self.provider()
+        self.server.delay = 0.5
+
+        async def fetch():
+            response = await provider.async_client().get(self.url)
+            return response.status_code
+
+        async def scenario():
+            outcomes = []
+            for _ in range(3):
+                try:
+                    outcomes.append(await provider.acall(fetch))
+                except CircuitOpenError:
+                    outcomes.append('open')
+                except NETWORK_ERRORS:
+                    outcomes.append('timeout')
+            await provider.async_client().aclose()
+            return outcomes
+
+        self.assertEqual(asyncio.run(scenario()), ['timeout', 'timeout', 'open'])
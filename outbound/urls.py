@@ -0,0 +1,6 @@
+from django.urls import path
+from .views import OutboundMetricsView
+
+urlpatterns = [
+    path('metrics/', OutboundMetricsView.as_view(), name='outbound-metrics'),
+]
@@ -0,0 +1,16 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import metrics
+
+
+# ==========================================
+# ADMIN: Outbound Provider Metrics
+# ==========================================
+class OutboundMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """Latency / error counters for this worker process"""
+        return Response(metrics())
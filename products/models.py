@@ -1,5 +1,9 @@
 from django.db import models
 from cloudinary.models import CloudinaryField
+import outbound
+
+# Cap uploads (products/views.py, or CloudinaryField.pre_save) at the provider timeout
+UPLOAD_TIMEOUT = outbound.get_provider('cloudinary').timeout
 
 class Product(models.Model):
     CATEGORY_CHOICES = (
@@ -30,7 +34,7 @@ class Product(models.Model):
     )
 
     # Main Image
-    image = CloudinaryField("image", folder="products")
+    image = CloudinaryField("image", folder="products", timeout=UPLOAD_TIMEOUT)
     video = models.URLField(max_length=2000, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -40,7 +44,7 @@ class Product(models.Model):
 # Gallery Images (No changes)
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name='gallery', on_delete=models.CASCADE)
-    image = CloudinaryField("image", folder="products")
+    image = CloudinaryField("image", folder="products", timeout=UPLOAD_TIMEOUT)
 
     def __str__(self):
         return f"{self.product.name} Image"
\ No newline at end of file
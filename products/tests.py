@@ -1,3 +1,97 @@
+import io
+from unittest import mock
+
+import cloudinary
+from cloudinary import CloudinaryResource, exceptions as cloudinary_exceptions
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from PIL import Image
+from rest_framework.test import APIClient
+
+import outbound
+from .models import Product, ProductImage
+
+User = get_user_model()
+
+
+def png(name='gallery.png'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+def uploaded(public_id):
+    """What uploader.upload_resource returns for a successful upload."""
+    return lambda *args, **options: CloudinaryResource(public_id, format='png', type='upload', resource_type='image')
+
+
+class GalleryUploadTests(TestCase):
+    """Cloudinary failures answer 400/503 instead of a 500."""
+
+    def setUp(self):
+        admin = User.objects.create_user(email='admin@example.com', password='x', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.product = Product.objects.create(
+            name='Submariner', price='100.00', stock=5, category='men', brand='Rolex', image='products/sample',
+        )
+        self.provider = outbound.get_provider('cloudinary')
+        self.addCleanup(self.provider.breaker.record_success)
+
+        # Responses render image URLs, which need a cloud name
+        config = cloudinary.config()
+        self.addCleanup(setattr, config, 'cloud_name', config.cloud_name)
+        config.cloud_name = config.cloud_name or 'test'
+
+    def patch(self, upload, data=None):
+        data = data if data is not None else {'gallery_images': png()}
+        with mock.patch('cloudinary.uploader.upload_resource', side_effect=upload) as uploader:
+            response = self.client.patch(f'/api/products/{self.product.id}/', data, format='multipart')
+        return response, uploader
+
+    def test_upload_uses_the_provider_timeout(self):
+        response, uploader = self.patch(uploaded('products/gallery'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(uploader.call_args.kwargs['timeout'], self.provider.timeout)
+        self.assertEqual(ProductImage.objects.get().image.public_id, 'products/gallery')
+
+    def test_rejected_upload_is_a_bad_request(self):
+        response, _ = self.patch(cloudinary_exceptions.BadRequest('Invalid image file'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.provider.breaker.failures, 0)
+
+    def test_provider_failure_is_unavailable(self):
+        response, _ = self.patch(cloudinary_exceptions.Error('Connection reset'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.provider.breaker.failures, 1)
+
+    def test_open_circuit_is_unavailable(self):
+        for _ in range(self.provider.breaker.failure_threshold):
+            self.provider.breaker.record_failure()
+        response, uploader = self.patch(AssertionError('should not be called'))
+        self.assertEqual(response.status_code, 503)
+        uploader.assert_not_called()
+
+    def test_failed_gallery_upload_saves_nothing(self):
+        response, _ = self.patch(cloudinary_exceptions.Error('Connection reset'),
+                                 {'name': 'Renamed', 'gallery_images': png()})
+        self.assertEqual(response.status_code, 503)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.name, 'Submariner')
+        self.assertFalse(ProductImage.objects.exists())
+
+    def test_saves_without_files_skip_the_breaker(self):
+        for _ in range(self.provider.breaker.failure_threshold):
+            self.provider.breaker.record_failure()
+        response, uploader = self.patch(AssertionError('should not be called'), {'name': 'Renamed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'Renamed')
+        uploader.assert_not_called()
 
-# Create your tests here.
+    def test_new_main_image_is_uploaded_before_the_save(self):
+        response, uploader = self.patch(uploaded('products/main'), {'image': png('main.png')})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(uploader.call_args.kwargs['folder'], 'products')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image.public_id, 'products/main')
@@ -1,10 +1,75 @@
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework.parsers import MultiPartParser, FormParser
+import outbound
+from cloudinary import exceptions as cloudinary_exceptions, uploader
 from .models import Product, ProductImage
 from .serializers import ProductSerializer
 
+# Transport failures surface as Cloudinary's base Error; 4xx answers mean the
+# upload itself was refused and say nothing about Cloudinary's health.
+CLOUDINARY_ERRORS = (cloudinary_exceptions.Error,) + outbound.NETWORK_ERRORS
+CLOUDINARY_REJECTED = (
+    cloudinary_exceptions.BadRequest,
+    cloudinary_exceptions.AuthorizationRequired,
+    cloudinary_exceptions.NotAllowed,
+    cloudinary_exceptions.NotFound,
+    cloudinary_exceptions.AlreadyExists,
+)
+
+
+def upload_to_cloudinary(field, file):
+    """
+    Upload ``file`` with the options of ``field`` (a CloudinaryField), as its
+    pre_save would, under the Cloudinary breaker/bulkhead. Returns the
+    CloudinaryResource to store in the field.
+    """
+    options = {"type": field.type, "resource_type": field.resource_type, **field.options}
+    if hasattr(file, 'seekable') and file.seekable():
+        file.seek(0)
+    return outbound.call(
+        'cloudinary', lambda: uploader.upload_resource(file, **options),
+        errors=CLOUDINARY_ERRORS, ignore=CLOUDINARY_REJECTED,
+    )
+
+
+def save_with_gallery(serializer, request):
+    """
+    Upload any new main/gallery images, then save the product and gallery rows.
+
+    Only the uploads go through the breaker, and they all finish before the
+    database is touched, so a refused or failed upload saves nothing.
+    Returns ``(product, None)``, or ``(None, error response)`` when Cloudinary
+    refuses an upload or is unavailable.
+    """
+    image = serializer.validated_data.get('image')
+    uploaded = {}
+    try:
+        if isinstance(image, UploadedFile):
+            uploaded['image'] = upload_to_cloudinary(Product._meta.get_field('image'), image)
+        gallery = [
+            upload_to_cloudinary(ProductImage._meta.get_field('image'), file)
+            for file in request.FILES.getlist('gallery_images')
+        ]
+    except CLOUDINARY_REJECTED as e:
+        return None, Response(
+            {"error": "Image upload was rejected", "details": str(e)},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except (*CLOUDINARY_ERRORS, outbound.OutboundError):
+        return None, Response(
+            {"error": "Image uploads are temporarily unavailable"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+    with transaction.atomic():
+        product = serializer.save(**uploaded)
+        ProductImage.objects.bulk_create(ProductImage(product=product, image=resource) for resource in gallery)
+    return product, None
+
 # ==========================================
 # 1. List All Products & Create New Product
 # ==========================================
@@ -25,12 +90,10 @@ class ProductListCreateView(APIView):
 
         serializer = ProductSerializer(data=request.data)
         if serializer.is_valid():
-            product = serializer.save()
-            
-            # Handle Multiple Gallery Images
-            gallery_files = request.FILES.getlist('gallery_images')
-            for file in gallery_files:
-                ProductImage.objects.create(product=product, image=file)
+            # Main image + multiple gallery images
+            product, error = save_with_gallery(serializer, request)
+            if error:
+                return error
 
             return Response(ProductSerializer(product).data, status=status.HTTP_201_CREATED)
             
@@ -71,12 +134,10 @@ class ProductDetailView(APIView):
 
         serializer = ProductSerializer(product, data=request.data)
         if serializer.is_valid():
-            product = serializer.save()
-
-            # Add NEW gallery images
-            gallery_files = request.FILES.getlist('gallery_images')
-            for file in gallery_files:
-                ProductImage.objects.create(product=product, image=file)
+            # Also adds NEW gallery images
+            product, error = save_with_gallery(serializer, request)
+            if error:
+                return error
 
             return Response(ProductSerializer(product).data)
             
@@ -95,12 +156,10 @@ class ProductDetailView(APIView):
         # partial=True allows updating specific fields (like Brand) without sending everything
         serializer = ProductSerializer(product, data=request.data, partial=True)
         if serializer.is_valid():
-            product = serializer.save()
-
-            # Add NEW gallery images (if any)
-            gallery_files = request.FILES.getlist('gallery_images')
-            for file in gallery_files:
-                ProductImage.objects.create(product=product, image=file)
+            # Also adds NEW gallery images (if any)
+            product, error = save_with_gallery(serializer, request)
+            if error:
+                return error
 
             return Response(ProductSerializer(product).data)
             